@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import os
+import sys
+
+from .conversion import run_conversion_benchmark
+from .load import LoadTestConfig, run_load_test
+from .projection import run_projection_benchmark
+from .selection import run_selection_benchmark
+from .stats import (
+    compare_reports,
+    current_commit,
+    load_report,
+    print_report,
+    save_report,
+)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def parse_args() -> argparse.Namespace:
+    """Parses command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Load tests for the REST and WebSocket API.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the load test.")
+    defaults = LoadTestConfig()
+    run.add_argument("--host", default=defaults.host)
+    run.add_argument("--port", type=int, default=defaults.port)
+    run.add_argument(
+        "--external-server",
+        action="store_true",
+        help="Target an already running server instead of starting main.app.",
+    )
+    run.add_argument("--lobby-users", type=int, default=defaults.lobby_users)
+    run.add_argument("--rooms", type=int, default=defaults.rooms)
+    run.add_argument("--players", type=int, default=defaults.players)
+    run.add_argument("--cycles", type=int, default=defaults.cycles)
+    run.add_argument("--readers", type=int, default=defaults.readers)
+    run.add_argument("--timeout", type=float, default=defaults.timeout)
+    run.add_argument("--seed", type=int, default=defaults.seed)
+    run.add_argument(
+        "--output", help="Report path, defaults to benchmarks/results/<commit>.json."
+    )
+
+    conversion = commands.add_parser(
+        "conversion", help="Compare per-item and batch price conversion."
+    )
+    conversion.add_argument("--items", type=int, default=1000)
+    conversion.add_argument("--repeat", type=int, default=50)
+    conversion.add_argument("--seed", type=int, default=42)
+    conversion.add_argument("--output", help="Optional report path.")
+
+    selection = commands.add_parser(
+        "selection", help="Compare sorting and single-pass loser selection."
+    )
+    selection.add_argument("--bets", type=int, default=5000)
+    selection.add_argument("--users", type=int, default=2000)
+    selection.add_argument("--repeat", type=int, default=50)
+    selection.add_argument("--seed", type=int, default=42)
+    selection.add_argument("--output", help="Optional report path.")
+
+    projection = commands.add_parser(
+        "projection", help="Compare ORM and JSON projection reads of list endpoints."
+    )
+    projection.add_argument("--users", type=int, default=20)
+    projection.add_argument("--games", type=int, default=500)
+    projection.add_argument("--repeat", type=int, default=20)
+    projection.add_argument("--seed", type=int, default=42)
+    projection.add_argument("--output", help="Optional report path.")
+
+    compare = commands.add_parser("compare", help="Compare two reports.")
+    compare.add_argument("base")
+    compare.add_argument("head")
+    compare.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="Allowed slowdown in percent before a change counts as a regression.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    """Entry point of the benchmark CLI."""
+    args = parse_args()
+
+    if args.command == "compare":
+        regressions = compare_reports(
+            load_report(args.base), load_report(args.head), args.threshold
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+
+    if args.command == "conversion":
+        report = asyncio.run(
+            run_conversion_benchmark(args.items, args.repeat, args.seed)
+        )
+        print_report(report)
+        print(f"total {report['totals']['decimal']} CZK")
+        print(f"float total before {report['totals']['float_before']} CZK")
+        if args.output:
+            save_report(report, args.output)
+        return 1 if report["operations"]["convert_batch"]["errors"] else 0
+
+    if args.command == "selection":
+        report = asyncio.run(
+            run_selection_benchmark(args.bets, args.users, args.repeat, args.seed)
+        )
+        print_report(report)
+        if args.output:
+            save_report(report, args.output)
+        return 0
+
+    if args.command == "projection":
+        report = asyncio.run(
+            run_projection_benchmark(args.users, args.games, args.repeat, args.seed)
+        )
+        print_report(report)
+        if args.output:
+            save_report(report, args.output)
+        operations = report["operations"]
+        return (
+            1
+            if operations["history_projection"]["errors"]
+            or operations["users_projection"]["errors"]
+            else 0
+        )
+
+    config = LoadTestConfig(
+        host=args.host,
+        port=args.port,
+        start_server=not args.external_server,
+        lobby_users=args.lobby_users,
+        rooms=args.rooms,
+        players=args.players,
+        cycles=args.cycles,
+        readers=args.readers,
+        timeout=args.timeout,
+        seed=args.seed,
+    )
+    report = asyncio.run(run_load_test(config))
+    print_report(report)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{current_commit()}.json")
+    save_report(report, output)
+    print(f"Report saved to {output}")
+    return 0
+
+
+sys.exit(main())
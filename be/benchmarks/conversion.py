@@ -0,0 +1,62 @@
+from decimal import Decimal
+import random
+import time
+
+from dependencies.enums import Currency
+from rates.providers import DEFAULT_RATES
+from websocket.helpers import CurrencyConverter
+from websocket.models import ConvertedPrice, Price
+
+from .stats import LatencyRecorder, build_report, resource_usage
+
+
+def generate_prices(items: int, rng: random.Random) -> list[Price]:
+    """Generates prices with two decimal places in random currencies."""
+    return [
+        Price(
+            price=Decimal(rng.randint(100, 100_000)) / 100,
+            currency=rng.choice([currency.value for currency in Currency]),
+            user_id=f"user-{index}",
+        )
+        for index in range(items)
+    ]
+
+
+def float_total(prices: list[Price]) -> float:
+    """Total computed with floats and no rounding, as before Decimal was used."""
+    return sum(
+        float(price.price) * DEFAULT_RATES.get(price.currency, 1.0) for price in prices
+    )
+
+
+async def run_conversion_benchmark(items: int, repeat: int, seed: int) -> dict:
+    """Times per-item and batch conversion of the same prices."""
+    prices = generate_prices(items, random.Random(seed))
+    converter = CurrencyConverter(DEFAULT_RATES)
+    recorder = LatencyRecorder()
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        converted = [converter.convert_to_czk(price) for price in prices]
+        per_item_total = await ConvertedPrice.calculate_totals(converted)
+        recorder.record("convert_per_item", time.perf_counter() - start)
+
+        start = time.perf_counter()
+        _, batch_total = converter.convert_all(prices)
+        recorder.record("convert_batch", time.perf_counter() - start)
+
+        if batch_total != per_item_total:
+            recorder.record_error("convert_batch")
+    recorder.finish()
+
+    return build_report(
+        recorder,
+        {"items": items, "repeat": repeat, "seed": seed},
+        resource_usage(),
+        {
+            "totals": {
+                "decimal": str(batch_total),
+                "float_before": repr(float_total(prices)),
+            }
+        },
+    )
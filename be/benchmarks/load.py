@@ -0,0 +1,457 @@
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from typing import Optional
+
+import httpx
+from pydantic import BaseModel
+import redis.asyncio as redis
+import uvicorn
+import websockets
+
+from .stats import LatencyRecorder, build_report, resource_usage
+
+WARM_CACHE_REQUESTS = 20
+PONG = json.dumps({"type": "pong"})
+
+
+class LoadTestConfig(BaseModel):
+    """Parameters of a load test run."""
+
+    host: str = "127.0.0.1"
+    port: int = 8001
+    start_server: bool = True
+    lobby_users: int = 200
+    rooms: int = 10
+    players: int = 5
+    cycles: int = 5
+    readers: int = 20
+    timeout: float = 10.0
+    seed: int = 42
+
+    @property
+    def http_url(self) -> str:
+        """Base URL of the REST API."""
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def ws_url(self) -> str:
+        """Base URL of the WebSocket endpoints."""
+        return f"ws://{self.host}:{self.port}"
+
+
+class Player:
+    """WebSocket client of one user in a room."""
+
+    def __init__(self, config: LoadTestConfig, room_id: str, user_id: str) -> None:
+        self.config = config
+        self.room_id = room_id
+        self.user_id = user_id
+        self.websocket: Optional[websockets.WebSocketClientProtocol] = None
+        self.reader: Optional[asyncio.Task] = None
+        self.waiters: dict[tuple[str, str], asyncio.Future] = {}
+
+    async def connect(self) -> None:
+        """Connects to the room socket and waits for the own join event."""
+        waiter = self.expect("join", self.user_id)
+        self.websocket = await websockets.connect(
+            f"{self.config.ws_url}/ws/room/{self.room_id}/{self.user_id}"
+        )
+        self.reader = asyncio.create_task(self._read())
+        await asyncio.wait_for(waiter, self.config.timeout)
+
+    def expect(self, event_type: str, user_id: str) -> asyncio.Future:
+        """Returns a future resolved by the next matching broadcast."""
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[(event_type, user_id)] = future
+        return future
+
+    async def send_and_wait(self, event: dict, reply_type: str) -> float:
+        """Sends an event and returns the time until its broadcast came back."""
+        assert self.websocket is not None
+        waiter = self.expect(reply_type, self.user_id)
+        start = time.perf_counter()
+        await self.websocket.send(json.dumps({"user_id": self.user_id, **event}))
+        await asyncio.wait_for(waiter, self.config.timeout)
+        return time.perf_counter() - start
+
+    async def close(self) -> None:
+        """Closes the socket."""
+        if self.websocket is not None:
+            await self.websocket.close()
+        if self.reader is not None:
+            self.reader.cancel()
+
+    async def _read(self) -> None:
+        assert self.websocket is not None
+        async for raw in self.websocket:
+            data = json.loads(raw)
+            if data.get("type") == "ping":
+                await self.websocket.send(PONG)
+                continue
+            future = self.waiters.pop((data.get("type"), data.get("user_id")), None)
+            if future is not None and not future.done():
+                future.set_result(data)
+
+
+async def timed(recorder: LatencyRecorder, operation: str, coroutine) -> bool:
+    """Awaits a coroutine and records its duration or failure."""
+    start = time.perf_counter()
+    try:
+        result = await coroutine
+    except (
+        asyncio.TimeoutError,
+        OSError,
+        httpx.HTTPError,
+        websockets.WebSocketException,
+    ):
+        recorder.record_error(operation)
+        return False
+    if isinstance(result, httpx.Response) and result.is_error:
+        recorder.record_error(operation)
+        return False
+    recorder.record(operation, time.perf_counter() - start)
+    return True
+
+
+async def answer_pings(websocket: websockets.WebSocketClientProtocol) -> None:
+    """Reads a lobby socket and answers keepalive pings, as browsers do."""
+    try:
+        async for raw in websocket:
+            if json.loads(raw).get("type") == "ping":
+                await websocket.send(PONG)
+    except websockets.ConnectionClosed:
+        pass
+
+
+async def connect_lobby(
+    config: LoadTestConfig, recorder: LatencyRecorder, user_id: str
+) -> Optional[websockets.WebSocketClientProtocol]:
+    """Connects a user to the lobby socket, which also creates the user."""
+    start = time.perf_counter()
+    try:
+        websocket = await websockets.connect(f"{config.ws_url}/ws/rooms/{user_id}")
+    except (OSError, websockets.WebSocketException):
+        recorder.record_error("ws_lobby_connect")
+        return None
+    recorder.record("ws_lobby_connect", time.perf_counter() - start)
+    return websocket
+
+
+async def setup_room(
+    client: httpx.AsyncClient, recorder: LatencyRecorder, user_ids: list[str]
+) -> Optional[str]:
+    """Creates a room owned by the first user and approves all other users."""
+    admin_id = user_ids[0]
+    name = f"lt-{uuid.uuid4().hex[:10]}"
+
+    for _ in range(10):
+        response = await client.post("/rooms", json={"name": name, "user_id": admin_id})
+        if response.status_code != 400:
+            break
+        # The lobby socket creates the user right after the handshake.
+        await asyncio.sleep(0.1)
+    if response.is_error:
+        recorder.record_error("http_create_room")
+        return None
+
+    rooms = (await client.get("/rooms")).json()
+    room_id = next(room["id"] for room in rooms if room["name"] == name)
+
+    for user_id in user_ids[1:]:
+        await timed(
+            recorder,
+            "http_join_room",
+            client.post(f"/rooms/{room_id}/join", params={"user_id": user_id}),
+        )
+        await timed(
+            recorder,
+            "http_moderate",
+            client.post(
+                f"/rooms/{room_id}/users/moderate",
+                params={
+                    "user_id": user_id,
+                    "status": "approve",
+                    "admin_user_id": admin_id,
+                },
+            ),
+        )
+    return room_id
+
+
+async def play_cycle(
+    players: list[Player], recorder: LatencyRecorder, rng: random.Random
+) -> None:
+    """Runs one game from start to evaluation."""
+    admin = players[0]
+    start = time.perf_counter()
+    await timed(
+        recorder,
+        "ws_game_start",
+        admin.send_and_wait({"type": "game_start"}, "game_start"),
+    )
+    await asyncio.gather(
+        *(
+            timed(
+                recorder,
+                "ws_set_price",
+                player.send_and_wait(
+                    {
+                        "type": "set_price",
+                        "price": round(rng.uniform(100, 400), 2),
+                        "currency": rng.choice(["czk", "eur", "usd"]),
+                    },
+                    "set_price",
+                ),
+            )
+            for player in players
+        )
+    )
+    await asyncio.gather(
+        *(
+            timed(
+                recorder,
+                "ws_set_bet",
+                player.send_and_wait(
+                    {"type": "set_bet", "bet": rng.randint(1, 10000)}, "set_bet"
+                ),
+            )
+            for player in players
+        )
+    )
+
+    fanout = [player.expect("result", admin.user_id) for player in players[1:]]
+    if await timed(
+        recorder, "ws_evaluate", admin.send_and_wait({"type": "evaluate"}, "result")
+    ):
+        await timed(
+            recorder,
+            "ws_result_fanout",
+            asyncio.wait_for(asyncio.gather(*fanout), admin.config.timeout),
+        )
+        recorder.record("game_cycle", time.perf_counter() - start)
+
+
+async def run_room(
+    client: httpx.AsyncClient,
+    config: LoadTestConfig,
+    recorder: LatencyRecorder,
+    user_ids: list[str],
+    rng: random.Random,
+) -> Optional[str]:
+    """Sets up a room and plays the configured number of games in it."""
+    room_id = await setup_room(client, recorder, user_ids)
+    if room_id is None:
+        return None
+
+    players = [Player(config, room_id, user_id) for user_id in user_ids]
+    for player in players:
+        await timed(recorder, "ws_room_connect", player.connect())
+
+    for _ in range(config.cycles):
+        await play_cycle(players, recorder, rng)
+
+    await asyncio.gather(*(player.close() for player in players))
+    return room_id
+
+
+async def run_reader(
+    client: httpx.AsyncClient,
+    recorder: LatencyRecorder,
+    rooms: list[tuple[str, str]],
+    stop: asyncio.Event,
+    rng: random.Random,
+) -> None:
+    """Polls the read endpoints the way the front end does until stopped."""
+    while not stop.is_set():
+        if not rooms:
+            await timed(recorder, "http_get_rooms", client.get("/rooms"))
+            await asyncio.sleep(0.01)
+            continue
+        room_id, user_id = rng.choice(rooms)
+        operation = rng.choice(("rooms", "history", "users"))
+        if operation == "rooms":
+            await timed(recorder, "http_get_rooms", client.get("/rooms"))
+        elif operation == "history":
+            await timed(
+                recorder, "http_get_history", client.get(f"/rooms/{room_id}/history")
+            )
+        else:
+            await timed(
+                recorder,
+                "http_get_users",
+                client.get(f"/rooms/{room_id}/users", params={"user_id": user_id}),
+            )
+
+
+async def pool_checkouts(client: httpx.AsyncClient) -> Optional[float]:
+    """Returns the connections checked out of the primary pool so far."""
+    try:
+        response = await client.get("/metrics")
+    except httpx.HTTPError:
+        return None
+    if response.is_error:
+        return None
+    for line in response.text.splitlines():
+        if line.startswith('db_pool_checkouts_total{pool="primary"}'):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+async def check_warm_cache(
+    client: httpx.AsyncClient, recorder: LatencyRecorder, room: tuple[str, str]
+) -> Optional[float]:
+    """Counts the pool checkouts of cached reads, a warm cache should need none."""
+    room_id, user_id = room
+    reads: tuple[tuple[str, dict], ...] = (
+        ("/rooms", {}),
+        (f"/rooms/{room_id}/users", {"user_id": user_id}),
+    )
+    for path, params in reads:
+        await client.get(path, params=params)
+
+    before = await pool_checkouts(client)
+    for _ in range(WARM_CACHE_REQUESTS):
+        for path, params in reads:
+            await timed(recorder, "http_warm_cache", client.get(path, params=params))
+    after = await pool_checkouts(client)
+
+    if before is None or after is None:
+        return None
+    if after > before:
+        recorder.record_error("http_warm_cache")
+    return after - before
+
+
+async def redis_memory() -> Optional[int]:
+    """Returns the memory used by Redis in bytes."""
+    client = redis.Redis(host="localhost", port=6379)
+    try:
+        info = await client.info("memory")
+        return info["used_memory"]
+    except redis.RedisError:
+        return None
+    finally:
+        await client.aclose()
+
+
+async def start_server(config: LoadTestConfig) -> tuple[uvicorn.Server, asyncio.Task]:
+    """Starts the FastAPI app from main.py in the current event loop."""
+    # Keep per-call application logs from dominating the measurement.
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Never depend on the network for exchange rates.
+    os.environ.setdefault("RATES_PROVIDER", "static")
+    from main import app  # pylint: disable=import-outside-toplevel
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host=config.host, port=config.port, log_level="warning")
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+def assign_users(config: LoadTestConfig) -> tuple[list[str], list[list[str]]]:
+    """Generates lobby users and splits the first ones into rooms."""
+    user_ids = [
+        str(uuid.uuid4())
+        for _ in range(max(config.lobby_users, config.rooms * config.players))
+    ]
+    room_user_ids = [
+        user_ids[index * config.players : (index + 1) * config.players]
+        for index in range(config.rooms)
+    ]
+    return user_ids, room_user_ids
+
+
+async def run_scenarios(
+    config: LoadTestConfig,
+    recorder: LatencyRecorder,
+    room_user_ids: list[list[str]],
+    rng: random.Random,
+) -> Optional[float]:
+    """Plays games in all rooms while readers poll the REST API.
+
+    Returns the pool checkouts of reads served from a warm cache afterwards.
+    """
+    async with httpx.AsyncClient(
+        base_url=config.http_url,
+        timeout=config.timeout,
+        limits=httpx.Limits(max_connections=config.readers + config.rooms),
+    ) as client:
+        stop = asyncio.Event()
+        known_rooms: list[tuple[str, str]] = []
+        readers = [
+            asyncio.create_task(run_reader(client, recorder, known_rooms, stop, rng))
+            for _ in range(config.readers)
+        ]
+
+        async def room_task(members: list[str]) -> None:
+            room_id = await run_room(client, config, recorder, members, rng)
+            if room_id is not None:
+                known_rooms.append((room_id, members[0]))
+
+        await asyncio.gather(*(room_task(members) for members in room_user_ids))
+        stop.set()
+        await asyncio.gather(*readers)
+
+        if not known_rooms:
+            return None
+        return await check_warm_cache(client, recorder, known_rooms[0])
+
+
+async def stop_server(server: uvicorn.Server, task: asyncio.Task) -> None:
+    """Shuts down a server started by start_server."""
+    server.should_exit = True
+    await task
+
+
+async def run_load_test(config: LoadTestConfig) -> dict:
+    """Runs all scenarios and returns the report."""
+    rng = random.Random(config.seed)
+    server = await start_server(config) if config.start_server else None
+
+    redis_memory_before = await redis_memory()
+    recorder = LatencyRecorder()
+    user_ids, room_user_ids = assign_users(config)
+
+    lobby = await asyncio.gather(
+        *(connect_lobby(config, recorder, user_id) for user_id in user_ids)
+    )
+    readers = [
+        asyncio.create_task(answer_pings(websocket))
+        for websocket in lobby
+        if websocket is not None
+    ]
+    warm_cache_checkouts = await run_scenarios(config, recorder, room_user_ids, rng)
+    recorder.finish()
+    await asyncio.gather(
+        *(websocket.close() for websocket in lobby if websocket is not None)
+    )
+    await asyncio.gather(*readers)
+
+    resources = resource_usage()
+    redis_memory_after = await redis_memory()
+    if redis_memory_before is not None and redis_memory_after is not None:
+        resources["redis_memory_delta_kb"] = round(
+            (redis_memory_after - redis_memory_before) / 1024, 1
+        )
+
+    if server is not None:
+        await stop_server(*server)
+
+    return build_report(
+        recorder,
+        config.model_dump(),
+        resources,
+        {
+            "in_process_server": config.start_server,
+            "warm_cache_checkouts": warm_cache_checkouts,
+        },
+    )
@@ -0,0 +1,175 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import random
+import time
+import uuid
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from database import SessionLocal, init_db
+from database.models import Game, GamePrice, Room, RoomUser, User
+from dependencies.enums import ApprovalStatus, Currency
+from dependencies.projections import (
+    GAMES_ADAPTER,
+    ROOM_USERS_ADAPTER,
+    build_game_history_query,
+    build_room_users_query,
+    fetch_json,
+)
+from schemas import GameResponse, RoomUserResponse
+
+from .stats import LatencyRecorder, build_report, resource_usage
+
+
+async def seed_room(
+    session: AsyncSession, users: int, games: int, rng: random.Random
+) -> tuple[str, list[str]]:
+    """Creates a room with approved users and games priced by all of them."""
+    user_ids = [f"bench-{uuid.uuid4()}" for _ in range(users)]
+    room_id = str(uuid.uuid4())
+    now = datetime.now(tz=timezone.utc)
+    await session.execute(insert(User), [{"id": user_id} for user_id in user_ids])
+    session.add(Room(id=room_id, name=room_id[:15], created_by=user_ids[0]))
+    await session.flush()
+    # The creator joins as admin on insert of the room.
+    await session.execute(
+        insert(RoomUser),
+        [
+            {
+                "room_id": room_id,
+                "user_id": user_id,
+                "is_admin": False,
+                "status": ApprovalStatus.APPROVED,
+                "created_at": now + timedelta(microseconds=index),
+            }
+            for index, user_id in enumerate(user_ids[1:])
+        ],
+    )
+    game_rows, price_rows = [], []
+    for index in range(games):
+        game_id = str(uuid.uuid4())
+        # Distinct timestamps keep the order of both read paths the same.
+        played_at = now - timedelta(minutes=games - index)
+        game_rows.append(
+            {
+                "id": game_id,
+                "room_id": room_id,
+                "loser": rng.choice(user_ids),
+                "price": Decimal(rng.randint(100, 100_000)) / 100,
+                "created_at": played_at,
+            }
+        )
+        for user_index, user_id in enumerate(user_ids):
+            currency = rng.choice(list(Currency))
+            price_rows.append(
+                {
+                    "game_id": game_id,
+                    "user_id": user_id,
+                    "price": Decimal(rng.randint(100, 10_000)) / 100,
+                    "currency": currency,
+                    "conversion_rate": (
+                        None if currency == Currency.CZK else Decimal("25.35")
+                    ),
+                    "price_in_czk": Decimal(rng.randint(100, 100_000)) / 100,
+                    "created_at": played_at + timedelta(microseconds=user_index),
+                }
+            )
+    await session.execute(insert(Game), game_rows)
+    await session.execute(insert(GamePrice), price_rows)
+    await session.commit()
+    return room_id, user_ids
+
+
+async def drop_room(session: AsyncSession, room_id: str, user_ids: list[str]) -> None:
+    """Deletes everything seed_room created."""
+    game_ids = select(Game.id).where(Game.room_id == room_id)
+    await session.execute(delete(GamePrice).where(GamePrice.game_id.in_(game_ids)))
+    await session.execute(delete(Game).where(Game.room_id == room_id))
+    await session.execute(delete(RoomUser).where(RoomUser.room_id == room_id))
+    await session.execute(delete(Room).where(Room.id == room_id))
+    await session.execute(delete(User).where(User.id.in_(user_ids)))
+    await session.commit()
+
+
+async def orm_game_history(
+    session: AsyncSession, room_id: str, from_date: datetime
+) -> list[GameResponse]:
+    """History read as before, hydrating games and prices."""
+    result = await session.execute(
+        select(Game)
+        .options(selectinload(Game.prices.and_(GamePrice.created_at >= from_date)))
+        .filter(Game.room_id == room_id, Game.created_at >= from_date)
+        .order_by(Game.created_at)
+    )
+    return [GameResponse.from_game_obj(game) for game in result.scalars().all()]
+
+
+async def orm_room_users(session: AsyncSession, room_id: str) -> list[RoomUserResponse]:
+    """Users read as before, hydrating room users."""
+    result = await session.execute(
+        select(RoomUser).filter_by(room_id=room_id).order_by(RoomUser.created_at)
+    )
+    return [
+        RoomUserResponse(
+            user_id=user.user_id,
+            is_admin=user.is_admin,
+            status=user.status.name,
+            created_at=user.created_at.isoformat(),
+        )
+        for user in result.scalars().all()
+    ]
+
+
+async def run_projection_benchmark(
+    users: int, games: int, repeat: int, seed: int
+) -> dict:
+    """Times ORM and JSON projection reads of the history and users of a room."""
+    await init_db()
+    recorder = LatencyRecorder()
+    from_date = datetime.now(tz=timezone.utc) - timedelta(days=30)
+
+    async with SessionLocal() as session:
+        room_id, user_ids = await seed_room(session, users, games, random.Random(seed))
+    try:
+        for _ in range(repeat):
+            # Fresh sessions, so the identity map of one run does not help the next.
+            async with SessionLocal() as session:
+                start = time.perf_counter()
+                orm_history = await orm_game_history(session, room_id, from_date)
+                recorder.record("history_orm", time.perf_counter() - start)
+            async with SessionLocal() as session:
+                start = time.perf_counter()
+                history = GAMES_ADAPTER.validate_json(
+                    await fetch_json(
+                        session, build_game_history_query(room_id, from_date, None)
+                    )
+                )
+                recorder.record("history_projection", time.perf_counter() - start)
+            if history != orm_history:
+                recorder.record_error("history_projection")
+
+            async with SessionLocal() as session:
+                start = time.perf_counter()
+                orm_users = await orm_room_users(session, room_id)
+                recorder.record("users_orm", time.perf_counter() - start)
+            async with SessionLocal() as session:
+                start = time.perf_counter()
+                room_users = ROOM_USERS_ADAPTER.validate_json(
+                    await fetch_json(session, build_room_users_query(room_id, False))
+                )
+                recorder.record("users_projection", time.perf_counter() - start)
+            if room_users != orm_users:
+                recorder.record_error("users_projection")
+        recorder.finish()
+    finally:
+        async with SessionLocal() as session:
+            await drop_room(session, room_id, user_ids)
+
+    return build_report(
+        recorder,
+        {"users": users, "games": games, "repeat": repeat, "seed": seed},
+        resource_usage(),
+        {"rows": {"games": games, "prices": games * users}},
+    )
@@ -0,0 +1,55 @@
+import random
+import time
+
+from websocket.helpers import GameEvaluator
+from websocket.models import Bet
+
+from .stats import LatencyRecorder, build_report, resource_usage
+
+
+def generate_bets(bets: int, users: int, rng: random.Random) -> list[Bet]:
+    """Generates bets of ``users`` users, most of whom bet several times."""
+    return [
+        Bet(bet=rng.randint(1, 10000), user_id=f"user-{rng.randrange(users)}")
+        for _ in range(bets)
+    ]
+
+
+def sorted_selection(bets: list[Bet], random_number: int) -> Bet:
+    """Selection as done before, sorting every bet including repeated ones."""
+    furthest_bets = sorted(
+        bets, key=lambda bet: abs(bet.bet - random_number), reverse=True
+    )
+    max_distance = abs(furthest_bets[0].bet - random_number)
+    candidates = [
+        bet for bet in furthest_bets if abs(bet.bet - random_number) == max_distance
+    ]
+    return random.choice(candidates)
+
+
+async def run_selection_benchmark(
+    bets: int, users: int, repeat: int, seed: int
+) -> dict:
+    """Times the sorting and the single-pass loser selection on the same bets."""
+    rng = random.Random(seed)
+    recorder = LatencyRecorder()
+
+    for _ in range(repeat):
+        room_bets = generate_bets(bets, users, rng)
+        random_number = rng.randint(1, 10000)
+
+        start = time.perf_counter()
+        sorted_selection(room_bets, random_number)
+        recorder.record("select_sorted", time.perf_counter() - start)
+
+        start = time.perf_counter()
+        GameEvaluator.calculate_furthest_from_number(room_bets, random_number, rng)
+        recorder.record("select_linear", time.perf_counter() - start)
+    recorder.finish()
+
+    return build_report(
+        recorder,
+        {"bets": bets, "users": users, "repeat": repeat, "seed": seed},
+        resource_usage(),
+        {},
+    )
@@ -0,0 +1,154 @@
+import json
+import math
+import resource
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Returns the nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+class LatencyRecorder:
+    """Collects latencies and errors per operation name."""
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+
+    def record(self, operation: str, seconds: float) -> None:
+        """Records a successful operation."""
+        self.samples.setdefault(operation, []).append(seconds)
+
+    def record_error(self, operation: str) -> None:
+        """Records a failed operation."""
+        self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def finish(self) -> None:
+        """Marks the end of the measured window."""
+        self.finished_at = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        """Length of the measured window in seconds."""
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    def summary(self) -> dict:
+        """Returns latency percentiles and throughput per operation."""
+        operations = {}
+        for operation in sorted(set(self.samples) | set(self.errors)):
+            values = sorted(self.samples.get(operation, []))
+            operations[operation] = {
+                "count": len(values),
+                "errors": self.errors.get(operation, 0),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+                "p90_ms": round(percentile(values, 0.90) * 1000, 3),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+                "throughput_per_s": round(len(values) / self.elapsed, 3),
+            }
+        return operations
+
+
+def resource_usage() -> dict:
+    """Returns CPU time and peak memory of the current process."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "cpu_user_s": round(usage.ru_utime, 3),
+        "cpu_system_s": round(usage.ru_stime, 3),
+        "max_rss_mb": round(usage.ru_maxrss / 1024, 1),
+    }
+
+
+def current_commit() -> str:
+    """Returns the short hash of the checked out commit."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def build_report(
+    recorder: LatencyRecorder, config: dict, resources: dict, extra: dict
+) -> dict:
+    """Builds the JSON report of a benchmark run."""
+    return {
+        "commit": current_commit(),
+        "timestamp": datetime.now(tz=timezone.utc).isoformat(),
+        "duration_s": round(recorder.elapsed, 3),
+        "config": config,
+        "operations": recorder.summary(),
+        "resources": resources,
+        **extra,
+    }
+
+
+def print_report(report: dict) -> None:
+    """Prints a report as a table."""
+    print(f"commit {report['commit']}  duration {report['duration_s']}s")
+    print(
+        f"{'operation':<28}{'count':>8}{'errors':>8}{'p50 ms':>10}"
+        f"{'p99 ms':>10}{'max ms':>10}{'ops/s':>10}"
+    )
+    for operation, stats in report["operations"].items():
+        print(
+            f"{operation:<28}{stats['count']:>8}{stats['errors']:>8}"
+            f"{stats['p50_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>10}"
+            f"{stats['throughput_per_s']:>10}"
+        )
+    for key, value in report["resources"].items():
+        print(f"{key:<28}{value}")
+
+
+def compare_reports(base: dict, head: dict, threshold: float) -> list[str]:
+    """Compares two reports and returns the detected regressions.
+
+    An operation regresses when its p50 or p99 latency grows, or its
+    throughput drops, by more than ``threshold`` percent.
+    """
+    regressions = []
+    print(f"{'operation':<28}{'metric':<18}{'base':>10}{'head':>10}{'change':>10}")
+    for operation, head_stats in head["operations"].items():
+        base_stats = base["operations"].get(operation)
+        if base_stats is None:
+            continue
+        for metric, higher_is_worse in (
+            ("p50_ms", True),
+            ("p99_ms", True),
+            ("throughput_per_s", False),
+        ):
+            before, after = base_stats[metric], head_stats[metric]
+            if not before:
+                continue
+            change = (after - before) / before * 100
+            print(f"{operation:<28}{metric:<18}{before:>10}{after:>10}{change:>+9.1f}%")
+            worse = change if higher_is_worse else -change
+            if worse > threshold:
+                regressions.append(f"{operation} {metric} {change:+.1f}%")
+    return regressions
+
+
+def load_report(path: str) -> dict:
+    """Loads a report from a JSON file."""
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_report(report: dict, path: str) -> None:
+    """Saves a report to a JSON file."""
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
@@ -1 +1,2 @@
 from .engine import *
+from .replicas import get_read_session, replica_router
@@ -0,0 +1,41 @@
+import argparse
+import asyncio
+
+from settings import settings
+from .engine import engine
+from .partitions import archive_partitions, ensure_partitions
+
+
+def parse_args() -> argparse.Namespace:
+    """Parses command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m database",
+        description="Maintenance of the partitioned game tables.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("partitions", help="Create the upcoming monthly partitions.")
+
+    archive = commands.add_parser("archive", help="Archive old monthly partitions.")
+    archive.add_argument(
+        "--older-than-months", type=int, default=settings.ARCHIVE_AFTER_MONTHS or 12
+    )
+    archive.add_argument(
+        "--target", choices=("schema", "parquet"), default=settings.ARCHIVE_TARGET
+    )
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Runs the selected maintenance command in one transaction."""
+    async with engine.begin() as conn:
+        if args.command == "partitions":
+            await ensure_partitions(conn)
+        else:
+            archived = await archive_partitions(
+                conn, args.older_than_months, args.target
+            )
+            print(f"Archived {len(archived)} partitions: {', '.join(archived)}")
+    await engine.dispose()
+
+
+asyncio.run(run(parse_args()))
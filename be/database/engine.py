@@ -1,12 +1,24 @@
-import logging
-from typing import Any, AsyncGenerator
+import time
+from typing import Any, AsyncGenerator, Awaitable, Callable, Optional, cast
 
 from databases import Database
 import redis.asyncio as redis
-from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.engine.default import DefaultExecutionContext
+from sqlalchemy.ext.asyncio import (
+    async_sessionmaker,
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+)
 
+from observability import get_logger, tracer
+from observability.metrics import db_pool_checkouts, db_query_duration
 from settings import settings
 from .base_model import Base
+from .memory import MemoryRedis
+from .migrations import run_migrations
 
 
 DATABASE_URL = (
@@ -17,13 +29,71 @@ database = Database(DATABASE_URL)
 engine = create_async_engine(DATABASE_URL)
 SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession)
 
-logger = logging.getLogger("uvicorn.error")
+logger = get_logger("database")
+memory_redis = MemoryRedis(settings.MEMORY_BACKEND_MAX_KEYS)
+
+
+def get_statement_operation(context: DefaultExecutionContext) -> str:
+    """Returns the kind of an executed statement used as a metrics label."""
+    if context.isinsert:
+        return "insert"
+    if context.isupdate:
+        return "update"
+    if context.isdelete:
+        return "delete"
+    return "select"
+
+
+def before_cursor_execute(  # pylint: disable=too-many-arguments
+    conn: Connection, _cursor, _statement, _parameters, context, _executemany
+) -> None:
+    """Stores the start time and span of a statement on the connection."""
+    span = tracer.span("db.execute", operation=get_statement_operation(context))
+    conn.info.setdefault("query_start", []).append((time.perf_counter(), span))
+
+
+def after_cursor_execute(  # pylint: disable=too-many-arguments
+    conn: Connection, _cursor, _statement, _parameters, context, _executemany
+) -> None:
+    """Records the duration of a statement."""
+    start, span = conn.info["query_start"].pop()
+    db_query_duration.labels(get_statement_operation(context)).observe(
+        time.perf_counter() - start
+    )
+    span.finish()
+
+
+def instrument_engine(async_engine: AsyncEngine, name: str) -> None:
+    """Records the statements of an engine and the checkouts of its pool."""
+    event.listen(
+        async_engine.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    event.listen(async_engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+    checkouts = db_pool_checkouts.labels(name)
+
+    def on_checkout(*_) -> None:
+        checkouts.inc()
+
+    event.listen(async_engine.sync_engine.pool, "checkout", on_checkout)
+
+
+instrument_engine(engine, "primary")
+
+
+def create_redis() -> redis.Redis:
+    """Returns a client of the backend configured by ``STORAGE_BACKEND``."""
+    match settings.STORAGE_BACKEND:
+        case "memory":
+            # Implements the subset of commands the application uses.
+            return cast(redis.Redis, memory_redis)
+        case _:
+            return redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
 
 
 async def get_redis() -> AsyncGenerator[redis.Redis, Any]:
     """Yields an asyncrhonous redis session."""
-    logger.info("Getting redis session.")
-    pool = redis.StrictRedis(host="localhost", port=6379, db=0)
+    logger.debug("Getting redis session.")
+    pool = create_redis()
     try:
         yield pool
     finally:
@@ -37,17 +107,56 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
     Yields:
         AsyncSession: The database session for interacting with the DB.
     """
-    logger.info("Getting db session.")
+    logger.debug("Getting db session.")
     async with SessionLocal() as session:
         yield session
 
 
+class LazySession:
+    """Database session that is only opened once a query needs it.
+
+    Dependencies that can answer from Redis take this instead of a session,
+    so a cache hit never checks a connection out of the pool.
+    """
+
+    def __init__(self, factory: Callable[[], Awaitable[AsyncSession]]) -> None:
+        self.factory = factory
+        self.session: Optional[AsyncSession] = None
+
+    async def get(self) -> AsyncSession:
+        """Returns the session, opening it on first use."""
+        if self.session is None:
+            self.session = await self.factory()
+        return self.session
+
+    async def close(self) -> None:
+        """Closes the session if it was opened."""
+        if self.session is not None:
+            await self.session.close()
+
+
+async def open_session() -> AsyncSession:
+    """Opens a session of the primary."""
+    logger.debug("Getting db session.")
+    return SessionLocal()
+
+
+async def get_lazy_session() -> AsyncGenerator[LazySession, None]:
+    """Yields a session of the primary that is opened on first use."""
+    lazy_session = LazySession(open_session)
+    try:
+        yield lazy_session
+    finally:
+        await lazy_session.close()
+
+
 async def init_db() -> None:
     """Initialize the database by connecting and creating all tables."""
     logger.info("Initializing database.")
     await database.connect()
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await run_migrations(conn)
 
 
 async def disconnect_db() -> None:
@@ -0,0 +1,345 @@
+import asyncio
+from collections import OrderedDict
+import itertools
+import time
+from typing import Any, Callable, Optional, Union
+
+from redis.exceptions import ResponseError, WatchError
+
+from observability.metrics import memory_backend_evictions
+
+Value = Union[bytes, list[bytes], dict[bytes, bytes]]
+
+
+def encode(value: Any) -> bytes:
+    """Encodes a value the way redis-py sends it, so it reads back the same."""
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return repr(value).encode("utf-8")
+
+
+def key_name(name: Union[str, bytes]) -> str:
+    """Returns a key as text."""
+    return name.decode("utf-8") if isinstance(name, bytes) else name
+
+
+def list_slice(length: int, start: int, end: int) -> slice:
+    """Converts an inclusive Redis range with negative indexes to a slice."""
+    if start < 0:
+        start = max(length + start, 0)
+    if end < 0:
+        end = length + end
+    return slice(start, max(end + 1, start))
+
+
+class MemoryPubSub:
+    """Subscriptions of one reader, fed directly by publishes of the process."""
+
+    def __init__(self, client: "MemoryRedis") -> None:
+        self.client = client
+        self.channels: set[str] = set()
+        self.messages: asyncio.Queue[dict] = asyncio.Queue()
+
+    async def subscribe(self, *channels: str) -> None:
+        """Starts delivering messages of the channels."""
+        self.channels.update(channels)
+        self.client.subscribers.add(self)
+
+    async def unsubscribe(self, *channels: str) -> None:
+        """Stops delivering messages of the channels, of all when none is given."""
+        self.channels.difference_update(channels or set(self.channels))
+
+    async def ping(self, message: Any) -> None:
+        """Queues a pong behind the messages delivered so far."""
+        self.messages.put_nowait(
+            {"type": "pong", "pattern": None, "channel": None, "data": encode(message)}
+        )
+
+    async def get_message(
+        self,
+        ignore_subscribe_messages: bool = False,  # pylint: disable=unused-argument
+        timeout: Optional[float] = 0.0,
+    ) -> Optional[dict]:
+        """Returns the next message, waiting up to ``timeout`` or forever on None."""
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self) -> None:
+        """Stops receiving messages."""
+        self.channels.clear()
+        self.client.subscribers.discard(self)
+
+
+class MemoryPipeline:
+    """Queues commands and runs them in order without yielding in between.
+
+    Nothing else runs on the event loop meanwhile, so every pipeline behaves
+    like a transaction. After ``watch`` commands run right away until
+    ``multi``, and ``execute`` raises WatchError when a watched key changed.
+    """
+
+    def __init__(self, client: "MemoryRedis") -> None:
+        self.client = client
+        self.commands: list[tuple[str, tuple, dict]] = []
+        self.watched: dict[str, int] = {}
+        self.immediate = False
+
+    async def __aenter__(self) -> "MemoryPipeline":
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.reset()
+
+    async def watch(self, *names: str) -> None:
+        """Remembers the versions of keys and runs commands right away."""
+        for name in names:
+            self.watched[key_name(name)] = self.client.versions.get(key_name(name), 0)
+        self.immediate = True
+
+    def multi(self) -> None:
+        """Starts queueing commands again."""
+        self.immediate = False
+
+    async def reset(self) -> None:
+        """Forgets queued commands and watched keys."""
+        self.commands = []
+        self.watched = {}
+        self.immediate = False
+
+    def __getattr__(self, command: str) -> Callable:
+        method = getattr(self.client, command)
+        if self.immediate:
+            return method
+
+        def queue(*args, **kwargs) -> "MemoryPipeline":
+            self.commands.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        """Runs the queued commands and returns their replies."""
+        commands, watched = self.commands, self.watched
+        await self.reset()
+        if any(
+            self.client.versions.get(key, 0) != version
+            for key, version in watched.items()
+        ):
+            raise WatchError("Watched variable changed.")
+        replies: list = []
+        for command, args, kwargs in commands:
+            try:
+                replies.append(await getattr(self.client, command)(*args, **kwargs))
+            except ResponseError as exc:
+                if raise_on_error:
+                    raise
+                replies.append(exc)
+        return replies
+
+
+class MemoryRedis:  # pylint: disable=too-many-public-methods
+    """In-process stand-in for the Redis commands used by the application.
+
+    Keys expire lazily when they are read and the least recently used keys
+    are evicted once there are more than ``max_keys``. Values are returned
+    as bytes, like redis-py does. Published messages go straight to the
+    subscribers in this process, so it only suits a single worker.
+    """
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max_keys
+        self.data: OrderedDict[str, Value] = OrderedDict()
+        self.deadlines: dict[str, float] = {}
+        # A new number on every change of a key, compared by watching pipelines.
+        self.versions: dict[str, int] = {}
+        self.changes = itertools.count(1)
+        self.subscribers: set[MemoryPubSub] = set()
+
+    def _read(self, name: Union[str, bytes], kind: type) -> Any:
+        key = key_name(name)
+        deadline = self.deadlines.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._remove(key)
+            memory_backend_evictions.labels("expired").inc()
+            return None
+        value = self.data.get(key)
+        if value is None:
+            return None
+        if not isinstance(value, kind):
+            raise ResponseError(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        self.data.move_to_end(key)
+        return value
+
+    def _write(self, name: Union[str, bytes], value: Value) -> None:
+        key = key_name(name)
+        self.versions[key] = next(self.changes)
+        self.data[key] = value
+        self.data.move_to_end(key)
+        now = time.monotonic()
+        while len(self.data) > self.max_keys:
+            oldest = next(iter(self.data))
+            deadline = self.deadlines.get(oldest)
+            self._remove(oldest)
+            memory_backend_evictions.labels(
+                "expired" if deadline is not None and deadline <= now else "lru"
+            ).inc()
+
+    def _remove(self, key: str) -> bool:
+        self.versions.pop(key, None)
+        self.deadlines.pop(key, None)
+        return self.data.pop(key, None) is not None
+
+    def pipeline(
+        self, transaction: bool = True  # pylint: disable=unused-argument
+    ) -> MemoryPipeline:
+        """Returns a pipeline running its commands back to back."""
+        return MemoryPipeline(self)
+
+    def pubsub(self) -> MemoryPubSub:
+        """Returns a new subscriber."""
+        return MemoryPubSub(self)
+
+    async def publish(self, channel: str, message: Any) -> int:
+        """Delivers a message to the subscribers of a channel."""
+        receivers = [
+            subscriber
+            for subscriber in self.subscribers
+            if key_name(channel) in subscriber.channels
+        ]
+        for subscriber in receivers:
+            subscriber.messages.put_nowait(
+                {
+                    "type": "message",
+                    "pattern": None,
+                    "channel": encode(channel),
+                    "data": encode(message),
+                }
+            )
+        return len(receivers)
+
+    async def get(self, name: str) -> Optional[bytes]:
+        """Returns the value of a key."""
+        return self._read(name, bytes)
+
+    async def mget(self, keys: list[str]) -> list[Optional[bytes]]:
+        """Returns the values of several keys."""
+        return [self._read(key, bytes) for key in keys]
+
+    async def set(
+        self, name: str, value: Any, ex: Optional[int] = None, nx: bool = False
+    ) -> Optional[bool]:
+        """Sets the value of a key, with ``nx`` only when it does not exist."""
+        if nx and await self.exists(name):
+            return None
+        self.deadlines.pop(key_name(name), None)
+        self._write(name, encode(value))
+        if ex is not None:
+            await self.expire(name, ex)
+        return True
+
+    async def incr(self, name: str, amount: int = 1) -> int:
+        """Increments the integer value of a key."""
+        value = int(self._read(name, bytes) or 0) + amount
+        self._write(name, encode(value))
+        return value
+
+    async def delete(self, *names: str) -> int:
+        """Deletes keys and returns how many existed."""
+        return sum(self._remove(key_name(name)) for name in names)
+
+    async def exists(self, *names: str) -> int:
+        """Returns how many of the keys exist."""
+        return sum(self._read(name, object) is not None for name in names)
+
+    async def expire(self, name: str, time_seconds: int) -> bool:
+        """Sets the expiry of an existing key."""
+        if self._read(name, object) is None:
+            return False
+        self.deadlines[key_name(name)] = time.monotonic() + time_seconds
+        return True
+
+    async def ttl(self, name: str) -> int:
+        """Returns the seconds until a key expires, -1 without an expiry."""
+        if self._read(name, object) is None:
+            return -2
+        deadline = self.deadlines.get(key_name(name))
+        if deadline is None:
+            return -1
+        return max(round(deadline - time.monotonic()), 0)
+
+    async def rpush(self, name: str, *values: Any) -> int:
+        """Appends values to a list."""
+        items = self._read(name, list)
+        if items is None:
+            items = []
+        items.extend(encode(value) for value in values)
+        self._write(name, items)
+        return len(items)
+
+    async def ltrim(self, name: str, start: int, end: int) -> bool:
+        """Keeps only the given inclusive range of a list."""
+        items = self._read(name, list)
+        if items is not None:
+            items[:] = items[list_slice(len(items), start, end)]
+            if not items:
+                self._remove(key_name(name))
+        return True
+
+    async def lrange(self, name: str, start: int, end: int) -> list[bytes]:
+        """Returns the given inclusive range of a list."""
+        items = self._read(name, list) or []
+        return items[list_slice(len(items), start, end)]
+
+    async def hset(
+        self,
+        name: str,
+        key: Optional[str] = None,
+        value: Any = None,
+        mapping: Optional[dict] = None,
+    ) -> int:
+        """Sets fields of a hash and returns how many were added."""
+        fields = dict(mapping or {})
+        if key is not None:
+            fields[key] = value
+        items = self._read(name, dict)
+        if items is None:
+            items = {}
+        added = 0
+        for field, field_value in fields.items():
+            added += encode(field) not in items
+            items[encode(field)] = encode(field_value)
+        self._write(name, items)
+        return added
+
+    async def hsetnx(self, name: str, key: str, value: Any) -> bool:
+        """Sets a field of a hash unless it exists."""
+        items = self._read(name, dict)
+        if items is not None and encode(key) in items:
+            return False
+        return bool(await self.hset(name, key, value))
+
+    async def hincrby(self, name: str, key: str, amount: int = 1) -> int:
+        """Increments the integer value of a field of a hash."""
+        value = int(await self.hget(name, key) or 0) + amount
+        await self.hset(name, key, value)
+        return value
+
+    async def hget(self, name: str, key: str) -> Optional[bytes]:
+        """Returns the value of a field of a hash."""
+        return (self._read(name, dict) or {}).get(encode(key))
+
+    async def hgetall(self, name: str) -> dict[bytes, bytes]:
+        """Returns all fields of a hash."""
+        return dict(self._read(name, dict) or {})
+
+    async def close(self) -> None:
+        """Keeps the data, the client is shared by the whole process."""
+
+    async def aclose(self) -> None:
+        """Keeps the data, the client is shared by the whole process."""
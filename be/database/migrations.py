@@ -0,0 +1,48 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from observability import get_logger
+from settings import settings
+from .partitions import ensure_partitions, partition_game_tables
+
+logger = get_logger("database")
+
+# Columns that used to be created as double precision, with their new type.
+NUMERIC_COLUMNS = (
+    ("games", "price", "NUMERIC(12, 2)"),
+    ("game_prices", "price", "NUMERIC(12, 2)"),
+    ("game_prices", "conversion_rate", "NUMERIC(12, 6)"),
+    ("game_prices", "price_in_czk", "NUMERIC(12, 2)"),
+    ("room_user_stats", "total_paid_czk", "NUMERIC(12, 2)"),
+)
+
+
+async def migrate_numeric_columns(conn: AsyncConnection) -> None:
+    """Converts float money columns of tables created by older versions."""
+    result = await conn.execute(
+        text(
+            "SELECT table_name, column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() "
+            "AND data_type = 'double precision'"
+        )
+    )
+    float_columns = {(row.table_name, row.column_name) for row in result}
+
+    for table, column, column_type in NUMERIC_COLUMNS:
+        if (table, column) not in float_columns:
+            continue
+        logger.info("Converting %s.%s to %s.", table, column, column_type)
+        await conn.execute(
+            text(
+                f"ALTER TABLE {table} ALTER COLUMN {column} TYPE {column_type} "
+                f"USING {column}::{column_type}"
+            )
+        )
+
+
+async def run_migrations(conn: AsyncConnection) -> None:
+    """Brings tables created by older versions up to date with the models."""
+    await migrate_numeric_columns(conn)
+    if settings.DB_PARTITIONING_ENABLED:
+        await partition_game_tables(conn)
+        await ensure_partitions(conn)
@@ -1,19 +1,57 @@
 import uuid
 from datetime import datetime, timezone
-
-from sqlalchemy import ForeignKey, TIMESTAMP, String
+from decimal import Decimal
+
+from sqlalchemy import (
+    BigInteger,
+    ForeignKey,
+    ForeignKeyConstraint,
+    Identity,
+    Index,
+    Numeric,
+    PrimaryKeyConstraint,
+    TIMESTAMP,
+    String,
+    Text,
+    case,
+    func,
+    select,
+    text,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.engine import Connection
 from sqlalchemy.event import listen
-from sqlalchemy.orm import mapped_column, Mapped, Mapper, Session, relationship
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import (
+    mapped_column,
+    Mapped,
+    Mapper,
+    Session,
+    relationship,
+    selectinload,
+)
 
 
 from database.base_model import Base
-from database.engine import get_session
+from database.engine import SessionLocal
 from dependencies.enums import ApprovalStatus, Currency
-from websocket.models import ConvertedPrice
+from settings import settings
+from websocket.models import GameRecord
 
 # pylint: disable=missing-class-docstring, too-few-public-methods
 
+# Amounts in CZK with two decimal places and exchange rates with six.
+Money = Numeric(12, 2)
+Rate = Numeric(12, 6)
+# Partitioned tables need the partition key in their primary keys and can not
+# be referenced by foreign keys, see database.partitions.
+PARTITIONED = settings.DB_PARTITIONING_ENABLED
+# Serializes the stats backfill of concurrently starting workers.
+STATS_BACKFILL_LOCK_ID = 7_340_002
+# Serializes the jobs storing the same game, keyed by the hash of its id.
+GAME_LOCK_ID = 7_340_003
+
 
 class User(Base):
     __tablename__ = "users"
@@ -81,64 +119,235 @@ class RoomUser(Base):
 
 class Game(Base):
     __tablename__ = "games"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", *(["created_at"] if PARTITIONED else [])),
+    )
 
-    id: Mapped[str] = mapped_column(primary_key=True, default=lambda: str(uuid.uuid4()))
+    id: Mapped[str] = mapped_column(default=lambda: str(uuid.uuid4()))
     room_id: Mapped[str] = mapped_column(ForeignKey("rooms.id"), nullable=False)
     loser: Mapped[str] = mapped_column(ForeignKey("users.id"), nullable=False)
-    price: Mapped[float] = mapped_column(nullable=False)
+    price: Mapped[Decimal] = mapped_column(Money, nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         TIMESTAMP(timezone=True), default=lambda: datetime.now(tz=timezone.utc)
     )
 
     room: Mapped[Room] = relationship("Room", back_populates="games")
-    prices: Mapped[list["GamePrice"]] = relationship("GamePrice", back_populates="game")
+    prices: Mapped[list["GamePrice"]] = relationship(
+        "GamePrice",
+        back_populates="game",
+        primaryjoin="Game.id == foreign(GamePrice.game_id)",
+    )
     loser_user: Mapped[User] = relationship(
         "User", back_populates="lost_games", foreign_keys=[loser]
     )
 
     @classmethod
     async def create_game_with_prices(
-        cls,
-        room_id: str,
-        loser_id: str,
-        converted_prices: list[ConvertedPrice],
-        total_in_czk: float,
-    ) -> None:
-        """Creates a game and its associated prices asynchronously."""
-        async for session in get_session():
-            game = cls(room_id=room_id, loser=loser_id, price=total_in_czk)
-
-            session.add(game)
-            await session.flush()
-
-            for converted_price in converted_prices:
-                game_price = GamePrice(
-                    game_id=game.id,
-                    user_id=converted_price.user_id,
-                    price=converted_price.original_price,
-                    currency=converted_price.original_currency,
-                    conversion_rate=converted_price.conversion_rate,
-                    price_in_czk=converted_price.price_in_czk,
-                )
-                session.add(game_price)
+        cls, session: AsyncSession, record: GameRecord
+    ) -> bool:
+        """Adds a game, its prices and the stats of its players to a session.
+
+        Returns False without adding anything when the game is stored already,
+        as an evaluation taken over queues its game again under the same id.
+        """
+        await session.execute(
+            text("SELECT pg_advisory_xact_lock(:lock_id, hashtext(:game_id))"),
+            {"lock_id": GAME_LOCK_ID, "game_id": record.game_id},
+        )
+        stored = await session.scalar(select(cls.id).where(cls.id == record.game_id))
+        if stored is not None:
+            return False
+
+        game = cls(
+            id=record.game_id,
+            room_id=record.room_id,
+            loser=record.loser_id,
+            price=record.total_in_czk,
+            created_at=record.created_at,
+        )
 
-            await session.commit()
+        session.add(game)
+        await session.flush()
+
+        if record.prices:
+            await session.execute(
+                insert(GamePrice),
+                [
+                    {
+                        "game_id": game.id,
+                        "user_id": converted_price.user_id,
+                        "price": converted_price.original_price,
+                        "currency": converted_price.original_currency,
+                        "conversion_rate": converted_price.conversion_rate,
+                        "price_in_czk": converted_price.price_in_czk,
+                        # Keeps prices in the partition of their game.
+                        "created_at": game.created_at,
+                    }
+                    for converted_price in record.prices
+                ],
+            )
+
+        await RoomUserStats.record_game(
+            session,
+            game,
+            {price.user_id for price in record.prices} | {record.loser_id},
+        )
+        return True
 
 
 class GamePrice(Base):
     __tablename__ = "game_prices"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", *(["created_at"] if PARTITIONED else [])),
+        *([] if PARTITIONED else [ForeignKeyConstraint(["game_id"], ["games.id"])]),
+    )
 
-    id: Mapped[str] = mapped_column(primary_key=True, default=lambda: str(uuid.uuid4()))
-    game_id: Mapped[str] = mapped_column(ForeignKey("games.id"), nullable=False)
+    id: Mapped[str] = mapped_column(default=lambda: str(uuid.uuid4()))
+    game_id: Mapped[str] = mapped_column(nullable=False)
     user_id: Mapped[str] = mapped_column(ForeignKey("users.id"), nullable=False)
 
-    price: Mapped[float] = mapped_column(nullable=False)
+    price: Mapped[Decimal] = mapped_column(Money, nullable=False)
     currency: Mapped[Currency] = mapped_column(nullable=False)
-    conversion_rate: Mapped[float] = mapped_column(nullable=True)
-    price_in_czk: Mapped[float] = mapped_column(nullable=False)
+    conversion_rate: Mapped[Decimal] = mapped_column(Rate, nullable=True)
+    price_in_czk: Mapped[Decimal] = mapped_column(Money, nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         TIMESTAMP(timezone=True), default=lambda: datetime.now(tz=timezone.utc)
     )
 
-    game: Mapped[Game] = relationship("Game", back_populates="prices")
+    game: Mapped[Game] = relationship(
+        "Game",
+        back_populates="prices",
+        primaryjoin="Game.id == foreign(GamePrice.game_id)",
+    )
     user: Mapped[User] = relationship("User", back_populates="game_prices")
+
+
+class RoomUserStats(Base):
+    __tablename__ = "room_user_stats"
+
+    room_id: Mapped[str] = mapped_column(ForeignKey("rooms.id"), primary_key=True)
+    user_id: Mapped[str] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    games_played: Mapped[int] = mapped_column(nullable=False, default=0)
+    losses: Mapped[int] = mapped_column(nullable=False, default=0)
+    total_paid_czk: Mapped[Decimal] = mapped_column(Money, nullable=False, default=0)
+    current_loss_streak: Mapped[int] = mapped_column(nullable=False, default=0)
+    longest_loss_streak: Mapped[int] = mapped_column(nullable=False, default=0)
+    last_played_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True))
+
+    @classmethod
+    async def record_game(
+        cls, session: AsyncSession, game: Game, participants: set[str]
+    ) -> None:
+        """Adds a game to the aggregates of its participants.
+
+        Runs as a single upsert in the session of the game insert, so the
+        aggregates commit or roll back together with the game.
+        """
+        rows = [
+            {
+                "room_id": game.room_id,
+                "user_id": user_id,
+                "games_played": 1,
+                "losses": int(user_id == game.loser),
+                "total_paid_czk": game.price if user_id == game.loser else 0,
+                "current_loss_streak": int(user_id == game.loser),
+                "longest_loss_streak": int(user_id == game.loser),
+                "last_played_at": game.created_at,
+            }
+            for user_id in participants
+        ]
+        statement = insert(cls).values(rows)
+        new_streak = case(
+            (statement.excluded.losses > 0, cls.current_loss_streak + 1),
+            else_=0,
+        )
+        await session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[cls.room_id, cls.user_id],
+                set_={
+                    "games_played": cls.games_played + 1,
+                    "losses": cls.losses + statement.excluded.losses,
+                    "total_paid_czk": cls.total_paid_czk
+                    + statement.excluded.total_paid_czk,
+                    "current_loss_streak": new_streak,
+                    "longest_loss_streak": func.greatest(
+                        cls.longest_loss_streak, new_streak
+                    ),
+                    "last_played_at": statement.excluded.last_played_at,
+                },
+            )
+        )
+
+    @classmethod
+    async def backfill(cls) -> None:
+        """Builds the aggregates from existing games when the table is empty.
+
+        Workers starting together wait for each other on an advisory lock and
+        check the table only once they hold it, so games are counted once.
+        """
+        async with SessionLocal() as session:
+            await session.execute(
+                text(f"SELECT pg_advisory_xact_lock({STATS_BACKFILL_LOCK_ID})")
+            )
+            has_stats = await session.scalar(select(cls.room_id).limit(1))
+            if has_stats is not None:
+                return
+
+            games = await session.stream_scalars(
+                select(Game)
+                .options(selectinload(Game.prices))
+                .order_by(Game.created_at)
+                .execution_options(yield_per=500)
+            )
+            async for game in games:
+                await cls.record_game(
+                    session,
+                    game,
+                    {price.user_id for price in game.prices} | {game.loser},
+                )
+            await session.commit()
+
+
+class RoomAction(Base):
+    __tablename__ = "room_actions"
+    __table_args__ = (
+        Index("ix_room_actions_room_id_created_at", "room_id", "created_at"),
+    )
+
+    # Keeps actions of the same timestamp in the order they were logged.
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    room_id: Mapped[str] = mapped_column(nullable=False)
+    user_id: Mapped[str] = mapped_column(nullable=False)
+    action: Mapped[str] = mapped_column(String(32), nullable=False)
+    message: Mapped[str] = mapped_column(Text, nullable=False)
+    extra: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False
+    )
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index(
+            "ix_jobs_due",
+            "run_after",
+            postgresql_where=text("failed_at IS NULL"),
+        ),
+    )
+
+    id: Mapped[str] = mapped_column(primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind: Mapped[str] = mapped_column(String(32), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    # Claimed jobs are pushed past their lease, so other workers skip them
+    # until the worker that claimed them dies.
+    run_after: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False
+    )
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    # Set once a job ran out of attempts, it is kept for inspection.
+    failed_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), default=lambda: datetime.now(tz=timezone.utc)
+    )
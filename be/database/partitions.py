@@ -0,0 +1,272 @@
+import asyncio
+from datetime import date, datetime, timezone
+import os
+import re
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from observability import get_logger
+from settings import settings
+
+try:
+    import pyarrow  # type: ignore
+    import pyarrow.parquet  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+logger = get_logger("database")
+
+PARTITIONED_TABLES = ("games", "game_prices")
+ARCHIVE_SCHEMA = "archive"
+PARTITION_NAME = re.compile(r"^(?P<table>\w+)_y(?P<year>\d{4})m(?P<month>\d{2})$")
+# Serializes partition DDL of concurrently starting workers.
+PARTITION_LOCK_ID = 7_340_001
+MAINTENANCE_INTERVAL_SECONDS = 24 * 3600
+PARQUET_BATCH_SIZE = 10_000
+
+
+def add_months(month: date, months: int) -> date:
+    """Returns the first day of the month ``months`` after ``month``."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_start(moment: datetime) -> date:
+    """Returns the first day of the month of a moment in UTC."""
+    moment = moment.astimezone(timezone.utc)
+    return date(moment.year, moment.month, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    """Returns the name of the partition of a table holding one month."""
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+async def is_partitioned(conn: AsyncConnection, table: str) -> bool:
+    """Returns whether a table of the current schema is partitioned."""
+    result = await conn.execute(
+        text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :table "
+            "AND c.relnamespace = current_schema()::regnamespace)"
+        ),
+        {"table": table},
+    )
+    return bool(result.scalar())
+
+
+async def create_partitions(conn: AsyncConnection, first: date, last: date) -> None:
+    """Creates the monthly partitions of both tables from ``first`` to ``last``."""
+    month = first
+    while month <= last:
+        for table in PARTITIONED_TABLES:
+            await conn.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} "
+                    f"PARTITION OF {table} FOR VALUES "
+                    f"FROM ('{month.isoformat()}') "
+                    f"TO ('{add_months(month, 1).isoformat()}')"
+                )
+            )
+        month = add_months(month, 1)
+
+
+async def ensure_partitions(conn: AsyncConnection) -> None:
+    """Creates partitions up to ``PARTITIONS_AHEAD_MONTHS`` in the future."""
+    await conn.execute(text(f"SELECT pg_advisory_xact_lock({PARTITION_LOCK_ID})"))
+    current = month_start(datetime.now(tz=timezone.utc))
+    await create_partitions(
+        conn, current, add_months(current, settings.PARTITIONS_AHEAD_MONTHS)
+    )
+
+
+async def partition_game_tables(conn: AsyncConnection) -> None:
+    """Converts games and game_prices into tables partitioned by month.
+
+    The primary keys become (id, created_at), as the partition key has to be
+    part of them, so game_prices can no longer reference games with a foreign
+    key. Prices get the created_at of their game so that both rows of a game
+    always land in the partitions of the same month.
+    """
+    await conn.execute(text(f"SELECT pg_advisory_xact_lock({PARTITION_LOCK_ID})"))
+    if await is_partitioned(conn, "games"):
+        return
+    logger.info("Partitioning games and game_prices by month.")
+
+    for table in PARTITIONED_TABLES:
+        await conn.execute(text(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned"))
+        await conn.execute(
+            text(
+                f"CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS) "
+                "PARTITION BY RANGE (created_at)"
+            )
+        )
+
+    oldest = (
+        await conn.execute(text("SELECT min(created_at) FROM games_unpartitioned"))
+    ).scalar()
+    current = month_start(datetime.now(tz=timezone.utc))
+    await create_partitions(
+        conn,
+        month_start(oldest) if oldest is not None else current,
+        add_months(current, settings.PARTITIONS_AHEAD_MONTHS),
+    )
+
+    for statement in (
+        "INSERT INTO games (id, room_id, loser, price, created_at) "
+        "SELECT id, room_id, loser, price, coalesce(created_at, now()) "
+        "FROM games_unpartitioned",
+        "INSERT INTO game_prices (id, game_id, user_id, price, currency, "
+        "conversion_rate, price_in_czk, created_at) "
+        "SELECT p.id, p.game_id, p.user_id, p.price, p.currency, "
+        "p.conversion_rate, p.price_in_czk, g.created_at "
+        "FROM game_prices_unpartitioned p "
+        "JOIN games g ON g.id = p.game_id",
+        "DROP TABLE game_prices_unpartitioned",
+        "DROP TABLE games_unpartitioned",
+        "ALTER TABLE games ALTER COLUMN created_at SET NOT NULL",
+        "ALTER TABLE game_prices ALTER COLUMN created_at SET NOT NULL",
+        "ALTER TABLE games ADD PRIMARY KEY (id, created_at)",
+        "ALTER TABLE game_prices ADD PRIMARY KEY (id, created_at)",
+        "ALTER TABLE games ADD FOREIGN KEY (room_id) REFERENCES rooms (id)",
+        "ALTER TABLE games ADD FOREIGN KEY (loser) REFERENCES users (id)",
+        "ALTER TABLE game_prices ADD FOREIGN KEY (user_id) REFERENCES users (id)",
+        "CREATE INDEX ix_games_room_id_created_at ON games (room_id, created_at)",
+        "CREATE INDEX ix_game_prices_game_id ON game_prices (game_id)",
+    ):
+        await conn.execute(text(statement))
+
+
+async def list_partitions(conn: AsyncConnection, table: str) -> list[tuple[str, date]]:
+    """Returns the monthly partitions attached to a table, oldest first."""
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table "
+            "AND p.relnamespace = current_schema()::regnamespace"
+        ),
+        {"table": table},
+    )
+    partitions = []
+    for (name,) in result:
+        match = PARTITION_NAME.match(name)
+        if match and match["table"] == table:
+            partitions.append((name, date(int(match["year"]), int(match["month"]), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+async def export_parquet(
+    conn: AsyncConnection, partition: str, directory: str
+) -> Optional[str]:
+    """Writes all rows of a partition into a zstd compressed Parquet file.
+
+    Returns the path of the file, or None when the partition has no rows and
+    no file was written.
+    """
+    if pyarrow is None:
+        raise RuntimeError("Archiving to Parquet requires the pyarrow package.")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{partition}.parquet")
+    result = await conn.stream(
+        text(f"SELECT * FROM {partition}").execution_options(
+            yield_per=PARQUET_BATCH_SIZE
+        )
+    )
+    writer: Optional[pyarrow.parquet.ParquetWriter] = None
+    try:
+        async for rows in result.partitions():
+            batch = pyarrow.table(
+                {key: list(values) for key, values in zip(result.keys(), zip(*rows))}
+            )
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(
+                    path, batch.schema, compression="zstd"
+                )
+            writer.write_table(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return None if writer is None else path
+
+
+async def archive_partitions(
+    conn: AsyncConnection, older_than_months: int, target: str
+) -> list[str]:
+    """Moves partitions older than the horizon out of the live tables.
+
+    The ``schema`` target detaches the partitions into the archive schema,
+    where they stay queryable. The ``parquet`` target writes them to
+    ``ARCHIVE_DIR`` and drops them, partitions without rows are left in place.
+    """
+    await conn.execute(text(f"SELECT pg_advisory_xact_lock({PARTITION_LOCK_ID})"))
+    cutoff = add_months(
+        month_start(datetime.now(tz=timezone.utc)), -max(older_than_months, 1)
+    )
+    if target == "schema":
+        await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+
+    archived = []
+    for table in PARTITIONED_TABLES:
+        for partition, month in await list_partitions(conn, table):
+            if month >= cutoff:
+                break
+            if target == "parquet":
+                path = await export_parquet(
+                    conn, partition, os.path.join(settings.ARCHIVE_DIR, table)
+                )
+                if path is None:
+                    logger.info("Skipped %s, it has no rows to archive.", partition)
+                    continue
+                await conn.execute(
+                    text(f"ALTER TABLE {table} DETACH PARTITION {partition}")
+                )
+                await conn.execute(text(f"DROP TABLE {partition}"))
+                logger.info("Archived %s to %s.", partition, path)
+            else:
+                await conn.execute(
+                    text(f"ALTER TABLE {table} DETACH PARTITION {partition}")
+                )
+                await conn.execute(
+                    text(f"ALTER TABLE {partition} SET SCHEMA {ARCHIVE_SCHEMA}")
+                )
+                logger.info("Archived %s to schema %s.", partition, ARCHIVE_SCHEMA)
+            archived.append(partition)
+    return archived
+
+
+class PartitionMaintenance:
+    """Creates upcoming partitions and archives old ones once a day."""
+
+    def __init__(self) -> None:
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self, engine: AsyncEngine) -> None:
+        """Starts the maintenance loop when partitioning is enabled."""
+        if settings.DB_PARTITIONING_ENABLED:
+            self.task = asyncio.create_task(self._run(engine))
+
+    async def stop(self) -> None:
+        """Stops the maintenance loop."""
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    async def _run(self, engine: AsyncEngine) -> None:
+        while True:
+            await asyncio.sleep(MAINTENANCE_INTERVAL_SECONDS)
+            async with engine.begin() as conn:
+                await ensure_partitions(conn)
+                if settings.ARCHIVE_AFTER_MONTHS > 0:
+                    await archive_partitions(
+                        conn, settings.ARCHIVE_AFTER_MONTHS, settings.ARCHIVE_TARGET
+                    )
+
+
+partition_maintenance = PartitionMaintenance()
@@ -0,0 +1,191 @@
+import asyncio
+import itertools
+from typing import AsyncGenerator, Optional
+
+from fastapi import Depends, Request
+import redis.asyncio as redis
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from observability import RedisCommand, get_logger
+from observability.metrics import db_read_routes, db_replica_lag
+from settings import settings
+from .engine import LazySession, get_lazy_session, get_redis, instrument_engine
+
+logger = get_logger("database")
+
+# Zero while the replica has replayed everything it received, otherwise the
+# age of the last replayed transaction. A primary reports no lag.
+LAG_QUERY = text(
+    "SELECT COALESCE(CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()"
+    " THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+    " END, 0)"
+)
+
+
+class Replica:  # pylint: disable=R0903
+    """Engine of one read replica and the lag measured by the last check."""
+
+    def __init__(self, url: str) -> None:
+        parsed = make_url(url)
+        self.name = f"{parsed.host}:{parsed.port or 5432}"
+        self.engine = create_async_engine(url, pool_pre_ping=True)
+        self.sessionmaker = async_sessionmaker(bind=self.engine, class_=AsyncSession)
+        # Unknown until the first check, so reads start on the primary.
+        self.lag: Optional[float] = None
+        instrument_engine(self.engine, self.name)
+
+    async def check(self) -> None:
+        """Measures the replication lag, a replica that fails is skipped."""
+        try:
+            async with self.engine.connect() as conn:
+                self.lag = float(
+                    await asyncio.wait_for(
+                        conn.scalar(LAG_QUERY),
+                        settings.DB_REPLICA_CHECK_INTERVAL_SECONDS,
+                    )
+                )
+        except (SQLAlchemyError, OSError, asyncio.TimeoutError) as exc:
+            if self.lag is not None:
+                logger.warning("Replica %s is unavailable: %s", self.name, exc)
+            self.lag = None
+            return
+        db_replica_lag.labels(self.name).set(self.lag)
+
+
+class ReplicaRouter:
+    """Routes read-only sessions to replicas that are close enough to the primary.
+
+    Healthy replicas are used round robin. Reads go to the primary when no
+    replica lags less than ``DB_REPLICA_MAX_LAG_SECONDS``, for requests that
+    are not GETs and for ``DB_READ_YOUR_WRITES_SECONDS`` after a user or room
+    was written, so a user always sees their own writes.
+    """
+
+    def __init__(self) -> None:
+        self.replicas = [Replica(url) for url in settings.DB_REPLICA_URLS]
+        self.turns = itertools.count()
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any replica is configured."""
+        return bool(self.replicas)
+
+    async def start(self) -> None:
+        """Checks the replicas once and keeps checking them in the background."""
+        if not self.enabled:
+            return
+        await self.check()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the checks and closes the replica connections."""
+        task, self.task = self.task, None
+        if task is not None:
+            task.cancel()
+        await asyncio.gather(
+            *(replica.engine.dispose() for replica in self.replicas),
+            *([task] if task is not None else []),
+            return_exceptions=True,
+        )
+
+    async def check(self) -> None:
+        """Measures the lag of every replica."""
+        await asyncio.gather(*(replica.check() for replica in self.replicas))
+
+    def choose(self) -> Optional[Replica]:
+        """Returns the next replica within the allowed lag, if there is one."""
+        healthy = [
+            replica
+            for replica in self.replicas
+            if replica.lag is not None
+            and replica.lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+        ]
+        if not healthy:
+            return None
+        return healthy[next(self.turns) % len(healthy)]
+
+    async def replica_for(
+        self, request: Request, redis_connection: redis.Redis
+    ) -> Optional[Replica]:
+        """Returns the replica a read-only request should use, None for the primary."""
+        if request.method != "GET":
+            db_read_routes.labels("primary", "write").inc()
+            return None
+        keys = self.sticky_keys(
+            request.query_params.get("user_id"), request.path_params.get("room_id")
+        )
+        with RedisCommand("exists"):
+            sticky = await redis_connection.exists(*keys)
+        if sticky:
+            db_read_routes.labels("primary", "sticky").inc()
+            return None
+        replica = self.choose()
+        if replica is None:
+            db_read_routes.labels("primary", "lagging").inc()
+            return None
+        db_read_routes.labels("replica", "healthy").inc()
+        return replica
+
+    async def stick(
+        self,
+        redis_connection: redis.Redis,
+        user_id: Optional[str] = None,
+        room_id: Optional[str] = None,
+    ) -> None:
+        """Sends reads of a user and a room to the primary after a write."""
+        if not self.enabled:
+            return
+        pipeline = redis_connection.pipeline(transaction=False)
+        for key in self.sticky_keys(user_id, room_id):
+            pipeline.set(key, 1, ex=settings.DB_READ_YOUR_WRITES_SECONDS)
+        with RedisCommand("set"):
+            await pipeline.execute()
+
+    @staticmethod
+    def sticky_keys(user_id: Optional[str], room_id: Optional[str]) -> list[str]:
+        """Returns the keys marking recent writes of a user and a room.
+
+        Without a room the key of the room list is used instead.
+        """
+        keys = [f"primary:room:{room_id}" if room_id else "primary:rooms"]
+        if user_id:
+            keys.append(f"primary:user:{user_id}")
+        return keys
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.DB_REPLICA_CHECK_INTERVAL_SECONDS)
+            await self.check()
+
+
+replica_router = ReplicaRouter()
+
+
+async def get_read_session(
+    request: Request,
+    primary: LazySession = Depends(get_lazy_session),
+    redis_connection: redis.Redis = Depends(get_redis),
+) -> AsyncGenerator[LazySession, None]:
+    """Yields a session for read-only queries, on a replica when possible.
+
+    The database is chosen when the session is first used. Reads served by
+    the primary share the primary session of the request.
+    """
+
+    async def open_read_session() -> AsyncSession:
+        replica = None
+        if replica_router.enabled:
+            replica = await replica_router.replica_for(request, redis_connection)
+        if replica is None:
+            return await primary.get()
+        return replica.sessionmaker()
+
+    lazy_session = LazySession(open_read_session)
+    try:
+        yield lazy_session
+    finally:
+        await lazy_session.close()
@@ -0,0 +1,165 @@
+import asyncio
+from collections import deque
+from contextlib import suppress
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import InterfaceError, OperationalError, SQLAlchemyError
+
+from database import SessionLocal
+from database.models import RoomAction
+from observability import get_logger
+from observability.metrics import room_actions_buffered, room_actions_written
+from settings import settings
+
+logger = get_logger("dependencies")
+
+# Errors after which the same batch may succeed once Postgres is back.
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)
+
+
+class ActionWriter:
+    """Copies room actions to Postgres behind the Redis action log.
+
+    Logging an action only appends it to a bounded buffer, so WebSocket
+    events do not wait for Postgres while it keeps up. A background task
+    writes the buffer with multi-row inserts once ``ACTIONS_WRITE_BATCH_SIZE``
+    actions are waiting or every ``ACTIONS_WRITE_INTERVAL_SECONDS``. When
+    ``ACTIONS_WRITE_BUFFER_SIZE`` actions are waiting, logging one waits up
+    to ``ACTIONS_WRITE_BACKPRESSURE_SECONDS`` for a batch to be written.
+    Failed batches go back to the front of the buffer and are retried with
+    an exponential backoff, and while Postgres is down the oldest actions
+    beyond the buffer size are dropped without waiting.
+    """
+
+    def __init__(self) -> None:
+        self.buffer: deque[dict] = deque()
+        self.wake = asyncio.Event()
+        self.space = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.failing = False
+        self.dropped = 0
+
+    def start(self) -> None:
+        """Starts the background writes."""
+        if settings.ACTIONS_WRITE_BEHIND_ENABLED:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the background writes and writes what is left once."""
+        task, self.task = self.task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        try:
+            await self.flush()
+        except TRANSIENT_ERRORS as exc:
+            logger.warning("Dropping %d room actions: %s", len(self.buffer), exc)
+
+    async def submit(self, room_id: str, action_log: dict) -> None:
+        """Queues a logged action, waiting a while when the buffer is full."""
+        if self.task is None:
+            return
+        extra = dict(action_log)
+        action = {
+            "room_id": room_id,
+            "user_id": extra.pop("user_id"),
+            "action": extra.pop("action"),
+            "message": extra.pop("message"),
+            "created_at": datetime.fromisoformat(extra.pop("timestamp")),
+            "extra": extra,
+        }
+        # Waiting only helps while batches are written, not during an outage.
+        if len(self.buffer) >= settings.ACTIONS_WRITE_BUFFER_SIZE and not self.failing:
+            self.space.clear()
+            self.wake.set()
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    self.space.wait(), settings.ACTIONS_WRITE_BACKPRESSURE_SECONDS
+                )
+        self.buffer.append(action)
+        self._trim()
+        if len(self.buffer) >= settings.ACTIONS_WRITE_BATCH_SIZE:
+            self.wake.set()
+
+    async def flush(self) -> int:
+        """Writes buffered actions in batches and returns how many were written.
+
+        A batch failing with a transient error is put back and the error is
+        raised, any other failing batch is dropped.
+        """
+        written = 0
+        while self.buffer:
+            batch = [
+                self.buffer.popleft()
+                for _ in range(min(len(self.buffer), settings.ACTIONS_WRITE_BATCH_SIZE))
+            ]
+            try:
+                async with SessionLocal() as session:
+                    await session.execute(insert(RoomAction), batch)
+                    await session.commit()
+            except (asyncio.CancelledError, *TRANSIENT_ERRORS):
+                self.buffer.extendleft(reversed(batch))
+                self._trim()
+                room_actions_written.labels("retried").inc(len(batch))
+                raise
+            except SQLAlchemyError as exc:
+                logger.error("Dropping %d room actions: %s", len(batch), exc)
+                room_actions_written.labels("rejected").inc(len(batch))
+            else:
+                written += len(batch)
+                room_actions_written.labels("written").inc(len(batch))
+            finally:
+                self.space.set()
+                room_actions_buffered.labels().set(len(self.buffer))
+        return written
+
+    def _trim(self) -> None:
+        dropped = 0
+        while len(self.buffer) > settings.ACTIONS_WRITE_BUFFER_SIZE:
+            self.buffer.popleft()
+            dropped += 1
+        if dropped:
+            # Warns once per overflow, the total is reported when it ends.
+            if not self.dropped:
+                logger.warning(
+                    "Room actions buffer is full, dropping the oldest actions"
+                )
+            self.dropped += dropped
+            room_actions_written.labels("dropped").inc(dropped)
+        room_actions_buffered.labels().set(len(self.buffer))
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            if len(self.buffer) < settings.ACTIONS_WRITE_BATCH_SIZE:
+                self.wake.clear()
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(
+                        self.wake.wait(), settings.ACTIONS_WRITE_INTERVAL_SECONDS
+                    )
+            try:
+                await self.flush()
+                failures = 0
+                self.failing = False
+                if self.dropped:
+                    logger.warning(
+                        "Dropped %d room actions while the buffer was full",
+                        self.dropped,
+                    )
+                    self.dropped = 0
+            except TRANSIENT_ERRORS as exc:
+                failures += 1
+                self.failing = True
+                delay = min(
+                    settings.ACTIONS_WRITE_INTERVAL_SECONDS * 2**failures,
+                    settings.ACTIONS_WRITE_RETRY_MAX_SECONDS,
+                )
+                logger.warning(
+                    "Writing room actions failed, retrying in %.1fs: %s", delay, exc
+                )
+                await asyncio.sleep(delay)
+
+
+action_writer = ActionWriter()
@@ -2,6 +2,9 @@ from typing import Optional
 
 from redis.asyncio import Redis
 
+from observability import RedisCommand
+from observability.metrics import cache_requests
+from settings import settings
 from .enums import UserType
 
 
@@ -18,20 +21,54 @@ class CacheKeyGenerator:
         """Generate rooms cache key."""
         return "rooms"
 
+    @staticmethod
+    def generate_recent_games_cache_key(room_id: str) -> str:
+        """Generate the key of the last games of a room sent on join."""
+        return f"room:{room_id}:recent_games"
+
+    @staticmethod
+    def get_key_kind(cache_key: str) -> str:
+        """Returns the kind of a cache key used as a metrics label."""
+        if cache_key == CacheKeyGenerator.generate_rooms_cache_key():
+            return "rooms"
+        if cache_key.endswith(":recent_games"):
+            return "recent_games"
+        return "room_users"
+
 
 async def invalidate_cache(cache_key: str, redis: Redis) -> None:
     """Invalidates the cache for a specific key."""
-    await redis.delete(cache_key)
+    with RedisCommand("delete"):
+        await redis.delete(cache_key)
 
 
 async def set_cache(cache_key: str, json_data: str, redis: Redis) -> None:
     """Sets the cache for a specific key, accepting JSON string."""
-    await redis.set(cache_key, json_data)
+    with RedisCommand("set"):
+        await redis.set(cache_key, json_data, ex=settings.REDIS_CACHE_TTL_SECONDS)
 
 
 async def get_cache(cache_key: str, redis: Redis) -> Optional[str]:
     """Gets the cache for a specific key, returning JSON string."""
-    cached_data = await redis.get(cache_key)
+    with RedisCommand("get"):
+        cached_data = await redis.get(cache_key)
+
+    key_kind = CacheKeyGenerator.get_key_kind(cache_key)
     if cached_data:
+        cache_requests.labels(key_kind, "hit").inc()
         return cached_data.decode("utf-8")
+    cache_requests.labels(key_kind, "miss").inc()
     return None
+
+
+async def get_many_cache(cache_keys: list[str], redis: Redis) -> list[Optional[str]]:
+    """Gets the cache for several keys with one round trip."""
+    with RedisCommand("mget"):
+        cached_data = await redis.mget(cache_keys)
+
+    results: list[Optional[str]] = []
+    for cache_key, data in zip(cache_keys, cached_data):
+        key_kind = CacheKeyGenerator.get_key_kind(cache_key)
+        cache_requests.labels(key_kind, "hit" if data else "miss").inc()
+        results.append(data.decode("utf-8") if data else None)
+    return results
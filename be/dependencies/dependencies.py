@@ -1,17 +1,23 @@
 from datetime import datetime, timezone
 import json
-import logging
-from typing import Optional
+from typing import AsyncIterator, Optional
 
-from fastapi import Depends
+from fastapi import Depends, Query
 from redis.asyncio import Redis
+from sqlalchemy import ARRAY, String, any_, bindparam, case, literal, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 
-from database import get_session, get_redis
-from database.models import Game, Room, RoomUser, User
+from database import (
+    LazySession,
+    get_lazy_session,
+    get_read_session,
+    get_redis,
+    get_session,
+    replica_router,
+)
+from database.models import Room, RoomUser, RoomUserStats, User
 from exceptions.custom_exceptions import (
     RoomNameNotUniqueError,
     RoomNotFoundError,
@@ -21,37 +27,81 @@ from exceptions.custom_exceptions import (
     UserNotInARoomError,
     UserNotPending,
 )
-from schemas import GameResponse, RoomCreate, RoomResponse, RoomUserResponse
-
-from .cache import CacheKeyGenerator, get_cache, invalidate_cache, set_cache
-from .enums import AdminApprovalStatus, ApprovalStatus, RoomEventTypes, UserType
+from observability import RedisCommand, get_logger, traced, tracer
+from schemas import (
+    BulkModerationRequest,
+    BulkModerationResponse,
+    GameResponse,
+    RoomCreate,
+    RoomResponse,
+    RoomUserResponse,
+    RoomUserStatsResponse,
+    UserStatsResponse,
+)
+from settings import settings
+from websocket.manager import pack_pubsub_message, socket_manager
+
+from .action_writer import action_writer
+from .cache import (
+    CacheKeyGenerator,
+    get_cache,
+    get_many_cache,
+    invalidate_cache,
+    set_cache,
+)
+from .enums import (
+    AdminApprovalStatus,
+    ApprovalStatus,
+    ExportFormat,
+    RoomEventTypes,
+    UserType,
+)
+from .export import build_export_query, stream_game_history
+from .http_cache import VersionKeyGenerator, bump_versions
+from .projections import (
+    GAMES_ADAPTER,
+    ROOM_USERS_ADAPTER,
+    ROOMS_ADAPTER,
+    build_game_history_query,
+    build_room_users_query,
+    build_rooms_query,
+    default_history_start,
+    fetch_json,
+)
 
-logger = logging.getLogger("uvicorn.error")
+logger = get_logger("dependencies")
+event_logger = get_logger("events")
 
 
+@traced
 async def get_game_history(
-    room_id: str, session: AsyncSession = Depends(get_session)
+    room_id: str,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    lazy_session: LazySession = Depends(get_read_session),
 ) -> list[GameResponse]:
-    """Fetches game history for a room."""
-    logger.info("Fetching game history for room_id: %s", room_id)
-
-    query = (
-        select(Game).options(selectinload(Game.prices)).filter(Game.room_id == room_id)
+    """Fetches game history for a room.
+
+    Without ``from_date`` partitioned tables are only read for the last
+    ``HISTORY_DEFAULT_DAYS``, see ``default_history_start``.
+    """
+    logger.debug("Fetching game history for room_id: %s", room_id)
+
+    if from_date is None:
+        from_date = default_history_start()
+    session = await lazy_session.get()
+    games_json = await fetch_json(
+        session, build_game_history_query(room_id, from_date, to_date)
     )
-    result = await session.execute(query)
-    games = result.scalars().all()
-
-    if not games:
-        logger.warning("No game history found for room_id: %s", room_id)
-        return []
 
-    logger.info("Game history retrieved successfully for room_id: %s", room_id)
-    return [GameResponse.from_game_obj(game) for game in games]
+    logger.debug("Game history retrieved successfully for room_id: %s", room_id)
+    with tracer.span("pydantic.validate", model="GameResponse"):
+        return GAMES_ADAPTER.validate_json(games_json)
 
 
 async def create_user(user_id: str):
     """Creates a new user."""
-    logger.info("Attempting to create user with user_id: %s", user_id)
+    logger.debug("Attempting to create user with user_id: %s", user_id)
 
     user = User(id=user_id)
     async for session in get_session():
@@ -61,32 +111,34 @@ async def create_user(user_id: str):
             logger.info("User created successfully with user_id: %s", user_id)
         except IntegrityError:
             await session.rollback()
-            logger.warning(
-                "User creation failed: User with user_id %s already exists", user_id
+            logger.debug(
+                "User creation skipped: User with user_id %s already exists", user_id
             )
 
 
 async def get_user(user_id: str, session: AsyncSession) -> User:
     """Fetches a user from db and raises an error if non-existing."""
-    logger.info("Fetching user from db with id: %s.", user_id)
+    logger.debug("Fetching user from db with id: %s.", user_id)
 
     result = await session.execute(select(User).filter_by(id=user_id))
     user = result.scalar_one_or_none()
     if not user:
         logger.error("User with id %s not found.", user_id)
         raise UserNotFound()
-    logger.info("User with id %s found.", user_id)
+    logger.debug("User with id %s found.", user_id)
     return user
 
 
+@traced
 async def create_room_dependency(
     room_data: RoomCreate,
     redis: Redis = Depends(get_redis),
-    session: AsyncSession = Depends(get_session),
+    lazy_session: LazySession = Depends(get_lazy_session),
 ):
     """Dependency to handle the creation of a room."""
     logger.info("Creating new room with name: %s", room_data.name)
 
+    session = await lazy_session.get()
     user = await get_user(room_data.user_id, session)
     new_room = Room(name=room_data.name, created_by=user.id)
     try:
@@ -101,12 +153,19 @@ async def create_room_dependency(
         )
 
         logger.info("Room created successfully: %s", new_room)
-        logger.info("Publishing room creation message.")
+        await replica_router.stick(redis, user_id=room_data.user_id)
+        logger.debug("Publishing room creation message.")
 
-        await redis.publish("rooms", json.dumps(room_response.model_dump()))
-        logger.info("Invalidating room cache.")
+        with RedisCommand("publish"):
+            await redis.publish(
+                "rooms", pack_pubsub_message(json.dumps(room_response.model_dump()))
+            )
+        logger.debug("Invalidating room cache.")
 
         await invalidate_cache(CacheKeyGenerator.generate_rooms_cache_key(), redis)
+        await bump_versions(
+            VersionKeyGenerator.generate_rooms_version_key(), ["rooms"], redis
+        )
         return new_room
     except IntegrityError as exc:
         logger.error("Room creation failed due to IntegrityError: %s", exc)
@@ -114,63 +173,60 @@ async def create_room_dependency(
         raise RoomNameNotUniqueError() from exc
 
 
+@traced
 async def get_room(
     room_id: str,
-    session: AsyncSession = Depends(get_session),
+    lazy_session: LazySession = Depends(get_read_session),
 ) -> Room:
     """Dependency that fetches a room from db."""
-    logger.info("Fetching room with room_id: %s", room_id)
+    logger.debug("Fetching room with room_id: %s", room_id)
 
+    session = await lazy_session.get()
     room = await session.get(Room, room_id)
     if room is None:
         logger.error("Room not found with room_id: %s", room_id)
         raise RoomNotFoundError()
-    logger.info("Room found: %s", room)
+    logger.debug("Room found: %s", room)
 
     return room
 
 
+@traced
 async def get_all_rooms(
-    redis: Redis = Depends(get_redis), session: AsyncSession = Depends(get_session)
+    redis: Redis = Depends(get_redis),
+    lazy_session: LazySession = Depends(get_read_session),
 ) -> list[RoomResponse]:
     """Fetch all rooms from the database."""
-    logger.info("Fetching all rooms from the database.")
+    logger.debug("Fetching all rooms from the database.")
 
     cached_rooms = await get_cache(CacheKeyGenerator.generate_rooms_cache_key(), redis)
     if cached_rooms:
-        logger.info("Cached rooms found")
-        return [RoomResponse.model_validate(obj) for obj in json.loads(cached_rooms)]
-
-    logger.info("No cached rooms found. Querying database.")
-
-    rooms_query = await session.execute(select(Room).order_by(Room.created_at.desc()))
-    rooms_response = [
-        RoomResponse(
-            id=room.id,
-            created_at=room.created_at.isoformat(),
-            created_by=room.created_by,
-            name=room.name,
-        )
-        for room in rooms_query.scalars()
-    ]
-    await set_cache(
-        CacheKeyGenerator.generate_rooms_cache_key(),
-        json.dumps([room.model_dump() for room in rooms_response]),
-        redis,
-    )
+        logger.debug("Cached rooms found")
+        with tracer.span("pydantic.validate", model="RoomResponse"):
+            return ROOMS_ADAPTER.validate_json(cached_rooms)
+
+    logger.debug("No cached rooms found. Querying database.")
 
-    logger.info("All rooms fetched successfully. Total rooms: %d", len(rooms_response))
+    session = await lazy_session.get()
+    rooms_json = await fetch_json(session, build_rooms_query())
+    await set_cache(CacheKeyGenerator.generate_rooms_cache_key(), rooms_json, redis)
+    with tracer.span("pydantic.validate", model="RoomResponse"):
+        rooms_response = ROOMS_ADAPTER.validate_json(rooms_json)
+
+    logger.debug("All rooms fetched successfully. Total rooms: %d", len(rooms_response))
     return rooms_response
 
 
+@traced
 async def get_user_in_room(
     room_id: str,
     user_id: str,
-    session: AsyncSession = Depends(get_session),
+    lazy_session: LazySession = Depends(get_lazy_session),
 ) -> RoomUser:
     """Dependency that checks if user is in a room"""
-    logger.info("Checking if user_id: %s is in room_id: %s", user_id, room_id)
+    logger.debug("Checking if user_id: %s is in room_id: %s", user_id, room_id)
 
+    session = await lazy_session.get()
     user_query = await session.execute(
         select(RoomUser).filter_by(
             room_id=room_id, user_id=user_id, status=ApprovalStatus.APPROVED
@@ -182,20 +238,22 @@ async def get_user_in_room(
         logger.error("User with user_id: %s is not in room_id: %s", user_id, room_id)
         raise UserNotInARoomError()
 
-    logger.info("User with user_id: %s found in room_id: %s", user_id, room_id)
+    logger.debug("User with user_id: %s found in room_id: %s", user_id, room_id)
     return room_user
 
 
+@traced
 async def must_be_admin(
     room_id: str,
     admin_user_id: str,
-    session: AsyncSession = Depends(get_session),
+    lazy_session: LazySession = Depends(get_lazy_session),
 ) -> bool:
     """Dependency that checks if a user is admin of a room."""
-    logger.info(
+    logger.debug(
         "Checking if user_id: %s is an admin of room_id: %s", admin_user_id, room_id
     )
 
+    session = await lazy_session.get()
     user_query = await session.execute(
         select(RoomUser).filter_by(
             room_id=room_id, user_id=admin_user_id, status=ApprovalStatus.APPROVED
@@ -210,7 +268,7 @@ async def must_be_admin(
         )
         raise UserNotAdminOfRoomError()
 
-    logger.info(
+    logger.debug(
         "User with user_id: %s is confirmed as admin of room_id: %s",
         admin_user_id,
         room_id,
@@ -218,18 +276,50 @@ async def must_be_admin(
     return True
 
 
+async def publish_membership_event(
+    room_id: str,
+    user_id: str,
+    message: str,
+    changes: dict[str, list[str]],
+    notify: list[str],
+) -> None:
+    """Publishes a membership change on the room channel and user channels.
+
+    ``changes`` maps ``requested``, ``approved`` and ``rejected`` to the
+    affected users, ``notify`` lists the users whose lobby socket should
+    learn about the change. The event is published once per channel, all
+    in one Redis round trip.
+    """
+    event = json.dumps(
+        {
+            "type": RoomEventTypes.MEMBERSHIP.value,
+            "room_id": room_id,
+            "user_id": user_id,
+            "message": message,
+            "requested": changes.get("requested", []),
+            "approved": changes.get("approved", []),
+            "rejected": changes.get("rejected", []),
+        }
+    )
+    await socket_manager.broadcast_many(
+        [f"room:{room_id}", *(f"user:{notified}" for notified in notify)], event
+    )
+
+
+@traced
 async def join_room_dependency(
     room_id: str,
     user_id: str,
-    _: Room = Depends(get_room),
+    room: Room = Depends(get_room),
     redis: Redis = Depends(get_redis),
-    session: AsyncSession = Depends(get_session),
+    lazy_session: LazySession = Depends(get_lazy_session),
 ):
     """Dependency to handle joining a room."""
-    logger.info(
+    logger.debug(
         "User with user_id: %s is attempting to join room_id: %s", user_id, room_id
     )
 
+    session = await lazy_session.get()
     existing_user = await session.execute(
         select(RoomUser).filter_by(room_id=room_id, user_id=user_id)
     )
@@ -247,6 +337,7 @@ async def join_room_dependency(
     )
 
     session.add(room_user)
+    room_name, room_admin = room.name, room.created_by
 
     await session.commit()
 
@@ -254,64 +345,97 @@ async def join_room_dependency(
         "User with user_id: %s joined room_id: %s successfully", user_id, room_id
     )
 
+    await replica_router.stick(redis, user_id=user_id, room_id=room_id)
     await invalidate_cache(
         CacheKeyGenerator.generate_room_user_cache_key(room_id, UserType.ADMIN), redis
     )
+    await bump_versions(
+        VersionKeyGenerator.generate_room_version_key(room_id), ["users"], redis
+    )
 
-    logger.info("Invalidated cache for room_id: %s after user join", room_id)
+    logger.debug("Invalidated cache for room_id: %s after user join", room_id)
+
+    await publish_membership_event(
+        room_id,
+        user_id,
+        f"User {user_id} requested to join room {room_name}.",
+        {"requested": [user_id]},
+        [room_admin],
+    )
 
     return room_user
 
 
+def find_cached_room_users(
+    user_id: str, cached_users: dict[UserType, Optional[str]]
+) -> Optional[list[RoomUserResponse]]:
+    """Returns the cached users of a room the way the user may see them.
+
+    The list for admins holds every user and the other one every approved
+    user, so either tells whether the user is approved and an admin. Raises
+    UserNotInARoomError when the user is not an approved member.
+    """
+    for user_type, cached in cached_users.items():
+        if not cached:
+            continue
+        with tracer.span("pydantic.validate", model="RoomUserResponse"):
+            users = ROOM_USERS_ADAPTER.validate_json(cached)
+        user = next((user for user in users if user.user_id == user_id), None)
+        if user is None or user.status != ApprovalStatus.APPROVED.name:
+            raise UserNotInARoomError()
+        if user.is_admin:
+            if user_type == UserType.ADMIN:
+                return users
+            continue
+        return [user for user in users if user.status == ApprovalStatus.APPROVED.name]
+    return None
+
+
+@traced
 async def get_room_users(
     room_id: str,
-    _: Room = Depends(get_room),
-    room_user: RoomUser = Depends(get_user_in_room),
+    user_id: str,
     redis: Redis = Depends(get_redis),
-    session: AsyncSession = Depends(get_session),
+    lazy_session: LazySession = Depends(get_read_session),
 ) -> list[RoomUserResponse]:
-    """Dependency for getting users."""
-    logger.info("Fetching users for room_id: %s", room_id)
+    """Dependency for getting users.
+
+    A warm cache answers without opening a database session.
+    """
+    logger.debug("Fetching users for room_id: %s", room_id)
+
+    user_types = (UserType.ADMIN, UserType.NON_ADMIN)
+    cached = await get_many_cache(
+        [
+            CacheKeyGenerator.generate_room_user_cache_key(room_id, user_type)
+            for user_type in user_types
+        ],
+        redis,
+    )
+    cached_users = find_cached_room_users(user_id, dict(zip(user_types, cached)))
+    if cached_users is not None:
+        logger.debug("Cached users found for room_id: %s", room_id)
+        return cached_users
 
-    is_admin = room_user.is_admin
+    logger.debug("No cached users found for room_id: %s. Querying database.", room_id)
 
+    await get_room(room_id, lazy_session)
+    room_user = await get_user_in_room(room_id, user_id, lazy_session)
+    is_admin = room_user.is_admin
     user_type = UserType.ADMIN if is_admin else UserType.NON_ADMIN
 
-    cached_users = await get_cache(
-        CacheKeyGenerator.generate_room_user_cache_key(room_id, UserType.ADMIN), redis
+    session = await lazy_session.get()
+    users_json = await fetch_json(
+        session, build_room_users_query(room_id, approved_only=not is_admin)
     )
-    if cached_users:
-        logger.info("Cached users found for room_id: %s", room_id)
-        return [
-            RoomUserResponse.model_validate(obj) for obj in json.loads(cached_users)
-        ]
-
-    logger.info("No cached users found for room_id: %s. Querying database.", room_id)
-
-    query = select(RoomUser).filter_by(room_id=room_id)
-
-    if not is_admin:
-        query = query.filter(RoomUser.status == ApprovalStatus.APPROVED)
-
-    users_query = await session.execute(query)
-    users = users_query.scalars().all()
-
-    users_response = [
-        RoomUserResponse(
-            user_id=user.user_id,
-            is_admin=user.is_admin,
-            status=user.status.name,
-            created_at=user.created_at.isoformat(),
-        )
-        for user in users
-    ]
-
     await set_cache(
         CacheKeyGenerator.generate_room_user_cache_key(room_id, user_type),
-        json.dumps([user.model_dump() for user in users_response]),
+        users_json,
         redis,
     )
-    logger.info(
+    with tracer.span("pydantic.validate", model="RoomUserResponse"):
+        users_response = ROOM_USERS_ADAPTER.validate_json(users_json)
+    logger.debug(
         "Fetched and cached users for room_id: %s. Total users: %d",
         room_id,
         len(users_response),
@@ -320,12 +444,76 @@ async def get_room_users(
     return users_response
 
 
+async def get_game_history_export(
+    room_id: str,
+    export_format: ExportFormat = Query(ExportFormat.CSV, alias="format"),
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    user_id: Optional[str] = None,
+    _: Room = Depends(get_room),
+) -> AsyncIterator[str]:
+    """Returns the chunks of a game history export of a room."""
+    logger.debug(
+        "Exporting game history for room_id: %s as %s", room_id, export_format.value
+    )
+    return stream_game_history(
+        build_export_query(room_id, from_date, to_date, user_id), export_format
+    )
+
+
+@traced
+async def get_room_stats(
+    room_id: str,
+    _: Room = Depends(get_room),
+    lazy_session: LazySession = Depends(get_lazy_session),
+) -> list[RoomUserStatsResponse]:
+    """Fetches the leaderboard of a room from the precomputed aggregates."""
+    logger.debug("Fetching stats for room_id: %s", room_id)
+
+    session = await lazy_session.get()
+    result = await session.execute(
+        select(RoomUserStats)
+        .filter_by(room_id=room_id)
+        .order_by(
+            RoomUserStats.losses.desc(),
+            RoomUserStats.total_paid_czk.desc(),
+            RoomUserStats.games_played,
+        )
+    )
+    return [RoomUserStatsResponse.from_stats_obj(row) for row in result.scalars()]
+
+
+@traced
+async def get_user_stats(
+    user_id: str, lazy_session: LazySession = Depends(get_lazy_session)
+) -> UserStatsResponse:
+    """Fetches stats of a user across all rooms from the precomputed aggregates."""
+    logger.debug("Fetching stats for user_id: %s", user_id)
+
+    session = await lazy_session.get()
+    await get_user(user_id, session)
+    result = await session.execute(
+        select(RoomUserStats)
+        .filter_by(user_id=user_id)
+        .order_by(RoomUserStats.last_played_at.desc())
+    )
+    rooms = [RoomUserStatsResponse.from_stats_obj(row) for row in result.scalars()]
+    return UserStatsResponse(
+        user_id=user_id,
+        games_played=sum(room.games_played for room in rooms),
+        losses=sum(room.losses for room in rooms),
+        total_paid_czk=sum(room.total_paid_czk for room in rooms),
+        rooms=rooms,
+    )
+
+
+@traced
 async def approve_user(
     room_id: str,
     user_id: str,
     status: AdminApprovalStatus,
     _: bool = Depends(must_be_admin),
-    session: AsyncSession = Depends(get_session),
+    lazy_session: LazySession = Depends(get_lazy_session),
     redis: Redis = Depends(get_redis),
 ):
     """Dependency for approval/rejection of an user"""
@@ -336,6 +524,7 @@ async def approve_user(
         status,
     )
 
+    session = await lazy_session.get()
     user_query = await session.execute(
         select(RoomUser).filter_by(room_id=room_id, user_id=user_id)
     )
@@ -355,8 +544,12 @@ async def approve_user(
         user_to_approve.status = ApprovalStatus.APPROVED
     elif status == AdminApprovalStatus.REJECTE:
         user_to_approve.status = ApprovalStatus.REJECTED
+    change = (
+        "approved" if user_to_approve.status == ApprovalStatus.APPROVED else "rejected"
+    )
 
     await session.commit()
+    await replica_router.stick(redis, user_id=user_id, room_id=room_id)
 
     await invalidate_cache(
         CacheKeyGenerator.generate_room_user_cache_key(room_id, UserType.NON_ADMIN),
@@ -365,12 +558,118 @@ async def approve_user(
     await invalidate_cache(
         CacheKeyGenerator.generate_room_user_cache_key(room_id, UserType.ADMIN), redis
     )
+    await bump_versions(
+        VersionKeyGenerator.generate_room_version_key(room_id), ["users"], redis
+    )
 
     logger.info("User %s approved/rejected successfully and cache invalidated", user_id)
 
+    await publish_membership_event(
+        room_id,
+        user_id,
+        f"User {user_id} was {change} in room {room_id}.",
+        {change: [user_id]},
+        [user_id],
+    )
+
     return user_to_approve
 
 
+@traced
+async def bulk_moderate_users(
+    room_id: str,
+    admin_user_id: str,
+    moderation: BulkModerationRequest,
+    _: bool = Depends(must_be_admin),
+    lazy_session: LazySession = Depends(get_lazy_session),
+    redis: Redis = Depends(get_redis),
+) -> BulkModerationResponse:
+    """Dependency for approval/rejection of many pending users at once.
+
+    All decisions are applied by a single UPDATE, users that are not pending
+    in the room are reported as skipped instead of failing the whole batch.
+    """
+    decisions = {decision.user_id: decision.status for decision in moderation.decisions}
+    approved_ids = [
+        user_id
+        for user_id, status in decisions.items()
+        if status == AdminApprovalStatus.APPROVE
+    ]
+    logger.info(
+        "Moderating %d users for room_id: %s, %d approved",
+        len(decisions),
+        room_id,
+        len(approved_ids),
+    )
+
+    session = await lazy_session.get()
+    result = await session.execute(
+        update(RoomUser)
+        .where(
+            RoomUser.room_id == room_id,
+            RoomUser.status == ApprovalStatus.PENDING,
+            RoomUser.user_id
+            == any_(bindparam("user_ids", list(decisions), type_=ARRAY(String))),
+        )
+        .values(
+            status=case(
+                (
+                    RoomUser.user_id
+                    == any_(
+                        bindparam("approved_ids", approved_ids, type_=ARRAY(String))
+                    ),
+                    literal(ApprovalStatus.APPROVED, RoomUser.status.type),
+                ),
+                else_=literal(ApprovalStatus.REJECTED, RoomUser.status.type),
+            )
+        )
+        .returning(RoomUser.user_id, RoomUser.status)
+        .execution_options(synchronize_session=False)
+    )
+    changed = result.all()
+    await session.commit()
+
+    response = BulkModerationResponse(
+        approved=[
+            row.user_id for row in changed if row.status == ApprovalStatus.APPROVED
+        ],
+        rejected=[
+            row.user_id for row in changed if row.status == ApprovalStatus.REJECTED
+        ],
+        skipped=sorted(set(decisions) - {row.user_id for row in changed}),
+    )
+    if not changed:
+        return response
+
+    await replica_router.stick(redis, user_id=admin_user_id, room_id=room_id)
+    with RedisCommand("delete"):
+        await redis.delete(
+            CacheKeyGenerator.generate_room_user_cache_key(room_id, UserType.NON_ADMIN),
+            CacheKeyGenerator.generate_room_user_cache_key(room_id, UserType.ADMIN),
+        )
+    await bump_versions(
+        VersionKeyGenerator.generate_room_version_key(room_id), ["users"], redis
+    )
+    await publish_membership_event(
+        room_id,
+        admin_user_id,
+        (
+            f"{len(response.approved)} users approved, "
+            f"{len(response.rejected)} users rejected."
+        ),
+        {"approved": response.approved, "rejected": response.rejected},
+        [row.user_id for row in changed],
+    )
+    logger.info(
+        "Moderated room_id: %s, approved: %d, rejected: %d, skipped: %d",
+        room_id,
+        len(response.approved),
+        len(response.rejected),
+        len(response.skipped),
+    )
+    return response
+
+
 async def log_action_to_redis(
     room_id: str,
     user_id: str,
@@ -379,7 +678,7 @@ async def log_action_to_redis(
     addition: Optional[dict] = None,
 ):
     """Logs action to redis for a specific room."""
-    logger.info(
+    event_logger.debug(
         "Logging action to redis for room_id: %s by user_id: %s", room_id, user_id
     )
 
@@ -394,31 +693,46 @@ async def log_action_to_redis(
             "message": message,
             **addition,
         }
-        await redis.rpush(  # type: ignore
-            f"room:{room_id}:actions", json.dumps(action_log)
-        )
-        logger.info("Action logged successfully for room_id: %s", room_id)
+        key = f"room:{room_id}:actions"
+        # Bounds the log of games that are never evaluated.
+        pipeline = redis.pipeline(transaction=False)
+        pipeline.rpush(key, json.dumps(action_log))
+        pipeline.ltrim(key, -settings.REDIS_ACTIONS_MAX_LENGTH, -1)
+        pipeline.expire(key, settings.REDIS_ACTIONS_TTL_SECONDS)
+        with RedisCommand("rpush"):
+            await pipeline.execute()
+        await action_writer.submit(room_id, action_log)
+        event_logger.debug("Action logged successfully for room_id: %s", room_id)
+
+
+def parse_actions(actions: list[bytes], fetch_all: Optional[bool] = False) -> list:
+    """Parses logged actions, filtering out 'bet' actions unless asked for all."""
+    parsed = [json.loads(action) for action in actions]
+    if fetch_all:
+        return parsed
+    return [action for action in parsed if action.get("action") != "bet"]
 
 
 async def fetch_actions_from_redis(room_id: str, fetch_all: Optional[bool] = False):
     """Fetches actions from Redis for a specific room, filtering out 'bet' actions."""
-    logger.info("Fetching actions from redis for room_id: %s", room_id)
+    event_logger.debug("Fetching actions from redis for room_id: %s", room_id)
 
     async for redis in get_redis():
-        actions = await redis.lrange(f"room:{room_id}:actions", 0, -1)  # type: ignore
-        actions = [json.loads(action) for action in actions]
-
-        if not fetch_all:
-            actions = [action for action in actions if action.get("action") != "bet"]
+        with RedisCommand("lrange"):
+            actions = await redis.lrange(  # type: ignore
+                f"room:{room_id}:actions", 0, -1
+            )
+        actions = parse_actions(actions, fetch_all)
 
-        logger.info("Actions fetched successfully for room_id: %s", room_id)
+        event_logger.debug("Actions fetched successfully for room_id: %s", room_id)
         return actions
 
 
 async def remove_actions_from_redis(room_id: str):
     """Removes actions from redis for a specific room."""
-    logger.info("Removing actions from redis for room_id: %s", room_id)
+    event_logger.debug("Removing actions from redis for room_id: %s", room_id)
 
     async for redis in get_redis():
-        await redis.delete(f"room:{room_id}:actions")
-        logger.info("Actions removed successfully for room_id: %s", room_id)
+        with RedisCommand("delete"):
+            await redis.delete(f"room:{room_id}:actions")
+        event_logger.debug("Actions removed successfully for room_id: %s", room_id)
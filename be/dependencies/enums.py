@@ -35,6 +35,13 @@ class RoomEventTypes(Enum):
     BET = "bet"  # this is internal
     EVALUATE = "evaluate"
     RESULT = "result"
+    MEMBERSHIP = "membership"
+    ERROR = "error"
+    RECONNECT = "reconnect"
+    SNAPSHOT = "snapshot"
+    PING = "ping"
+    PONG = "pong"
+    HISTORY = "history"
 
     @classmethod
     def get_event_type_from_string(cls, event_type_str: str) -> "RoomEventTypes":
@@ -45,6 +52,15 @@ class RoomEventTypes(Enum):
             raise ValueError(f"Invalid event type: {event_type_str}") from exc
 
 
+class GamePhase(Enum):
+    """Enum for phases of a game played in a room."""
+
+    IDLE = "idle"
+    COLLECTING_PRICES = "collecting_prices"
+    BETTING = "betting"
+    EVALUATING = "evaluating"
+
+
 class Currency(Enum):
     """Enum for currencies."""
 
@@ -59,3 +75,15 @@ class Currency(Enum):
             return cls[currency_str.upper()]
         except KeyError as exc:
             raise ValueError(f"Invalid event type: {currency_str}") from exc
+
+
+class ExportFormat(Enum):
+    """Enum for formats of the game history export."""
+
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+    @property
+    def media_type(self) -> str:
+        """Media type of the exported file."""
+        return "text/csv" if self == ExportFormat.CSV else "application/x-ndjson"
@@ -0,0 +1,112 @@
+import csv
+from datetime import datetime
+from decimal import Decimal
+import io
+import json
+from typing import AsyncIterator, Optional, Sequence
+
+from sqlalchemy import Row, Select, select
+
+from database import SessionLocal
+from database.models import Game, GamePrice
+from observability import get_logger
+from .enums import ExportFormat
+
+logger = get_logger("dependencies")
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = (
+    "game_id",
+    "played_at",
+    "loser_id",
+    "game_total_czk",
+    "user_id",
+    "price",
+    "currency",
+    "conversion_rate",
+    "price_in_czk",
+)
+
+
+def build_export_query(
+    room_id: str,
+    from_date: Optional[datetime],
+    to_date: Optional[datetime],
+    user_id: Optional[str],
+) -> Select:
+    """Builds the query selecting one row per price of the games of a room."""
+    query = (
+        select(
+            Game.id,
+            Game.created_at,
+            Game.loser,
+            Game.price,
+            GamePrice.user_id,
+            GamePrice.price,
+            GamePrice.currency,
+            GamePrice.conversion_rate,
+            GamePrice.price_in_czk,
+        )
+        .join(GamePrice, GamePrice.game_id == Game.id)
+        .where(Game.room_id == room_id)
+        .order_by(Game.created_at, Game.id, GamePrice.user_id)
+    )
+    if from_date is not None:
+        query = query.where(Game.created_at >= from_date)
+    if to_date is not None:
+        query = query.where(Game.created_at < to_date)
+    if user_id is not None:
+        query = query.where(GamePrice.user_id == user_id)
+    return query
+
+
+def _export_values(row: Row) -> list:
+    values = list(row)
+    values[1] = values[1].isoformat()
+    values[6] = values[6].value
+    return values
+
+
+def format_csv(rows: Sequence[Row]) -> str:
+    """Formats rows as CSV lines."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(_export_values(row) for row in rows)
+    return buffer.getvalue()
+
+
+def format_ndjson(rows: Sequence[Row]) -> str:
+    """Formats rows as JSON lines with amounts as exact decimal strings."""
+    return "".join(
+        json.dumps(
+            dict(zip(EXPORT_COLUMNS, _export_values(row))),
+            default=lambda value: str(value) if isinstance(value, Decimal) else value,
+        )
+        + "\n"
+        for row in rows
+    )
+
+
+async def stream_game_history(
+    query: Select, export_format: ExportFormat
+) -> AsyncIterator[str]:
+    """Yields the export in chunks of ``EXPORT_BATCH_SIZE`` rows.
+
+    Rows are read through a server-side cursor, so memory use does not grow
+    with the history. The generator runs after the request dependencies are
+    closed and therefore uses its own session.
+    """
+    formatter = format_csv if export_format == ExportFormat.CSV else format_ndjson
+    if export_format == ExportFormat.CSV:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue()
+
+    exported = 0
+    async with SessionLocal() as session:
+        result = await session.stream(
+            query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for rows in result.partitions():
+            exported += len(rows)
+            yield formatter(rows)
+    logger.info("Exported %d game prices as %s", exported, export_format.value)
@@ -0,0 +1,221 @@
+from datetime import datetime, timezone
+import gzip
+import hashlib
+import json
+import time
+from typing import Any, Optional
+
+from fastapi import Depends, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from redis.asyncio import Redis
+
+from database import get_redis
+from exceptions.custom_exceptions import NotModifiedError
+from observability import RedisCommand, traced
+from observability.metrics import http_cache_requests
+from settings import settings
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+IDENTITY = "identity"
+
+
+class VersionKeyGenerator:
+    """Helper class for getting the keys of resource version counters."""
+
+    @staticmethod
+    def generate_rooms_version_key() -> str:
+        """Generate the key counting changes of the room list."""
+        return "rooms:version"
+
+    @staticmethod
+    def generate_room_version_key(room_id: str) -> str:
+        """Generate the key counting changes of the users and games of a room."""
+        return f"room:{room_id}:version"
+
+
+async def get_version(key: str, field: str, redis: Redis) -> int:
+    """Returns the version of a resource, starting it when it has none.
+
+    Counters start at the current time in milliseconds, so a counter lost
+    with its key never goes back to a version a client may still hold.
+    """
+    pipeline = redis.pipeline(transaction=False)
+    pipeline.hsetnx(key, field, str(time.time_ns() // 1_000_000))
+    pipeline.expire(key, settings.REDIS_ACTIONS_TTL_SECONDS)
+    pipeline.hget(key, field)
+    with RedisCommand("hget"):
+        _, _, version = await pipeline.execute()
+    return int(version)
+
+
+async def bump_versions(key: str, fields: list[str], redis: Redis) -> None:
+    """Increments the versions of resources after they were written."""
+    pipeline = redis.pipeline(transaction=False)
+    for field in fields:
+        pipeline.hsetnx(key, field, str(time.time_ns() // 1_000_000))
+        pipeline.hincrby(key, field, 1)
+    pipeline.expire(key, settings.REDIS_ACTIONS_TTL_SECONDS)
+    with RedisCommand("hincrby"):
+        await pipeline.execute()
+
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    """Picks brotli, gzip or no compression from an Accept-Encoding header."""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip()] = quality
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return IDENTITY
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compresses a body, the same body always gives the same bytes."""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+def matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header with an entity tag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+class ConditionalResponse:  # pylint: disable=R0903
+    """Entity tag of a cacheable GET and the encoding its body is sent with.
+
+    The tag is derived from the version of the resource only, so it is known
+    and compared before the body is read. Compressed bodies are cached in
+    Redis under the tag for ``REDIS_CACHE_TTL_SECONDS``, together with the
+    encoding they got, as bodies below ``HTTP_COMPRESS_MIN_BYTES`` are kept
+    as they are.
+    """
+
+    def __init__(self, cache_key: str, resource: str, tag: str, encoding: str):
+        self.cache_key = cache_key
+        self.resource = resource
+        self.etag = f'"{tag}"'
+        self.encoding = encoding
+
+    async def render(self, content: Any, redis: Redis) -> Response:
+        """Returns the JSON of the content compressed as negotiated.
+
+        A cached body is looked up by the tag first, so the content is only
+        serialized and compressed on a miss.
+        """
+        if self.encoding != IDENTITY:
+            with RedisCommand("hgetall"):
+                cached = await redis.hgetall(self.cache_key)  # type: ignore
+            if cached:
+                http_cache_requests.labels(self.resource, "hit").inc()
+                return self._response(cached[b"body"], cached[b"encoding"].decode())
+            http_cache_requests.labels(self.resource, "miss").inc()
+
+        body = json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()
+        if self.encoding == IDENTITY:
+            return self._response(body, IDENTITY)
+        encoding = (
+            self.encoding if len(body) >= settings.HTTP_COMPRESS_MIN_BYTES else IDENTITY
+        )
+        body = compress(body, encoding)
+        pipeline = redis.pipeline(transaction=False)
+        pipeline.hset(self.cache_key, mapping={"encoding": encoding, "body": body})
+        pipeline.expire(self.cache_key, settings.REDIS_CACHE_TTL_SECONDS)
+        with RedisCommand("hset"):
+            await pipeline.execute()
+        return self._response(body, encoding)
+
+    def _response(self, body: bytes, encoding: str) -> Response:
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if encoding != IDENTITY:
+            headers["Content-Encoding"] = encoding
+        return Response(body, media_type="application/json", headers=headers)
+
+
+def check_conditional(
+    request: Request, prefix: str, resource: str, version: int, *extra: str
+) -> ConditionalResponse:
+    """Raises NotModifiedError when the client holds the current version."""
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    tag = hashlib.sha1(
+        "|".join(
+            (request.url.path, str(request.query_params), str(version), encoding)
+            + extra
+        ).encode("utf-8"),
+        usedforsecurity=False,
+    ).hexdigest()
+    conditional = ConditionalResponse(f"{prefix}:body:{tag}", resource, tag, encoding)
+    if matches(request.headers.get("if-none-match"), conditional.etag):
+        http_cache_requests.labels(resource, "not_modified").inc()
+        raise NotModifiedError(conditional.etag)
+    return conditional
+
+
+@traced
+async def rooms_etag(
+    request: Request, redis: Redis = Depends(get_redis)
+) -> ConditionalResponse:
+    """Dependency answering conditional GETs of the room list."""
+    version = await get_version(
+        VersionKeyGenerator.generate_rooms_version_key(), "rooms", redis
+    )
+    return check_conditional(request, "rooms", "rooms", version)
+
+
+@traced
+async def room_users_etag(
+    room_id: str, request: Request, redis: Redis = Depends(get_redis)
+) -> ConditionalResponse:
+    """Dependency answering conditional GETs of the users of a room."""
+    version = await get_version(
+        VersionKeyGenerator.generate_room_version_key(room_id), "users", redis
+    )
+    return check_conditional(request, f"room:{room_id}", "room_users", version)
+
+
+@traced
+async def history_etag(
+    room_id: str, request: Request, redis: Redis = Depends(get_redis)
+) -> ConditionalResponse:
+    """Dependency answering conditional GETs of the game history of a room."""
+    version = await get_version(
+        VersionKeyGenerator.generate_room_version_key(room_id), "games", redis
+    )
+    # Without from_date the history covers the last days, so it moves daily.
+    day = (
+        ""
+        if "from_date" in request.query_params
+        else datetime.now(tz=timezone.utc).date().isoformat()
+    )
+    return check_conditional(request, f"room:{room_id}", "history", version, day)
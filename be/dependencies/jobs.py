@@ -0,0 +1,192 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import time
+from typing import Awaitable, Callable, Optional
+import uuid
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import SessionLocal
+from database.models import Job
+from observability import get_logger
+from observability.metrics import job_duration, jobs_processed
+from settings import settings
+
+logger = get_logger("dependencies")
+
+JobHandler = Callable[[AsyncSession, dict], Awaitable[None]]
+
+
+class JobQueue:
+    """Runs background jobs at least once with the jobs table as an outbox.
+
+    A job is committed to the table before it is queued for one of the
+    ``JOBS_WORKERS`` workers. A worker locks the row, runs the handler in the
+    same transaction and deletes the row with it, so the database writes of
+    a handler are committed exactly once. Failed jobs are retried with an
+    exponential backoff, and jobs of workers that died are picked up by the
+    poller once their lease runs out.
+    """
+
+    def __init__(self) -> None:
+        self.handlers: dict[str, JobHandler] = {}
+        self.queue: asyncio.Queue[str] = asyncio.Queue(settings.JOBS_QUEUE_SIZE)
+        self.tasks: list[asyncio.Task] = []
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        """Sets the coroutine running jobs of a kind."""
+        self.handlers[kind] = handler
+
+    def start(self) -> None:
+        """Starts the workers and the poller."""
+        self.tasks = [
+            asyncio.create_task(self._work()) for _ in range(settings.JOBS_WORKERS)
+        ]
+        self.tasks.append(asyncio.create_task(self._poll()))
+
+    async def stop(self) -> None:
+        """Waits a while for queued jobs and stops the workers.
+
+        Jobs that did not finish stay in the table and run after their lease.
+        """
+        if not self.tasks:
+            return
+        poller = self.tasks.pop()
+        poller.cancel()
+        try:
+            await asyncio.wait_for(
+                self.queue.join(), settings.JOBS_SHUTDOWN_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Leaving %d jobs to other workers", self.queue.qsize())
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(poller, *self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def enqueue(
+        self, kind: str, payload: dict, session: Optional[AsyncSession] = None
+    ) -> None:
+        """Stores a job and queues it once it is committed.
+
+        Without a session the job is committed right away. Jobs added to the
+        session of a running job are committed and queued along with it.
+        """
+        now = datetime.now(tz=timezone.utc)
+        # Jobs that will be queued here are leased right away.
+        if self.tasks and not self.queue.full():
+            now += timedelta(seconds=settings.JOBS_LEASE_SECONDS)
+        job_id = str(uuid.uuid4())
+        job = Job(id=job_id, kind=kind, payload=payload, run_after=now)
+        if session is not None:
+            session.add(job)
+            session.info.setdefault("jobs", []).append(job_id)
+            return
+        async with SessionLocal() as own_session:
+            own_session.add(job)
+            await own_session.commit()
+        self._dispatch([job_id])
+
+    def _dispatch(self, job_ids: list[str]) -> None:
+        for job_id in job_ids:
+            if not self.tasks or self.queue.full():
+                return
+            self.queue.put_nowait(job_id)
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._run(job_id)
+            except (SQLAlchemyError, OSError) as exc:
+                logger.warning("Running job %s failed: %s", job_id, exc)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        async with SessionLocal() as session:
+            job = await session.scalar(
+                select(Job)
+                .where(Job.id == job_id, Job.failed_at.is_(None))
+                .with_for_update(skip_locked=True)
+            )
+            # Done already or being run by another worker.
+            if job is None:
+                return
+            kind, attempts = job.kind, job.attempts + 1
+            start = time.perf_counter()
+            try:
+                await self.handlers[kind](session, job.payload)
+                await session.delete(job)
+                await session.commit()
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                await session.rollback()
+                await self._retry(job_id, kind, attempts, exc)
+                return
+            finally:
+                job_duration.labels(kind).observe(time.perf_counter() - start)
+            jobs_processed.labels(kind, "done").inc()
+            self._dispatch(session.info.pop("jobs", []))
+
+    async def _retry(
+        self, job_id: str, kind: str, attempts: int, exc: Exception
+    ) -> None:
+        now = datetime.now(tz=timezone.utc)
+        failed = attempts >= settings.JOBS_MAX_ATTEMPTS
+        delay = min(2**attempts, settings.JOBS_RETRY_MAX_SECONDS)
+        if failed:
+            logger.error("Job %s %s failed for good: %s", kind, job_id, exc)
+        else:
+            logger.warning(
+                "Job %s %s failed, retrying in %ds: %s", kind, job_id, delay, exc
+            )
+        jobs_processed.labels(kind, "failed" if failed else "retried").inc()
+        async with SessionLocal() as session:
+            await session.execute(
+                update(Job)
+                .where(Job.id == job_id)
+                .values(
+                    attempts=attempts,
+                    run_after=now + timedelta(seconds=delay),
+                    last_error=repr(exc),
+                    failed_at=now if failed else None,
+                )
+            )
+            await session.commit()
+
+    async def _claim(self, limit: int) -> list[str]:
+        """Leases due jobs nobody is running and returns their ids."""
+        now = datetime.now(tz=timezone.utc)
+        due = (
+            select(Job.id)
+            .where(Job.failed_at.is_(None), Job.run_after <= now)
+            .order_by(Job.run_after)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        async with SessionLocal() as session:
+            job_ids = await session.scalars(
+                update(Job)
+                .where(Job.id.in_(due.scalar_subquery()))
+                .values(run_after=now + timedelta(seconds=settings.JOBS_LEASE_SECONDS))
+                .returning(Job.id)
+                .execution_options(synchronize_session=False)
+            )
+            claimed = list(job_ids)
+            await session.commit()
+        return claimed
+
+    async def _poll(self) -> None:
+        while True:
+            free = settings.JOBS_QUEUE_SIZE - self.queue.qsize()
+            if free > 0:
+                try:
+                    self._dispatch(await self._claim(free))
+                except (SQLAlchemyError, OSError) as exc:
+                    logger.warning("Polling jobs failed: %s", exc)
+            await asyncio.sleep(settings.JOBS_POLL_INTERVAL_SECONDS)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Union
+
+from pydantic import TypeAdapter
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    String,
+    Text,
+    cast,
+    func,
+    literal_column,
+    select,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import QueryableAttribute
+
+from database.models import Game, GamePrice, Room, RoomUser
+from schemas import GameResponse, RoomResponse, RoomUserResponse
+from settings import settings
+from .enums import ApprovalStatus
+
+ROOMS_ADAPTER: TypeAdapter[list[RoomResponse]] = TypeAdapter(list[RoomResponse])
+ROOM_USERS_ADAPTER: TypeAdapter[list[RoomUserResponse]] = TypeAdapter(
+    list[RoomUserResponse]
+)
+GAMES_ADAPTER: TypeAdapter[list[GameResponse]] = TypeAdapter(list[GameResponse])
+
+Column = Union[ColumnElement, QueryableAttribute]
+
+
+def isoformat(column: Column) -> ColumnElement:
+    """Formats a timestamp in SQL like ``datetime.isoformat`` does in UTC."""
+    return func.to_char(
+        func.timezone("UTC", column), 'YYYY-MM-DD"T"HH24:MI:SS.US"+00:00"'
+    )
+
+
+def json_list(element: Column, *order_by: Column) -> ColumnElement:
+    """Aggregates rows into a JSON array, an empty one when there are none."""
+    return func.coalesce(
+        func.json_agg(aggregate_order_by(element, *order_by)),
+        literal_column("'[]'::json"),
+    )
+
+
+def build_rooms_query() -> Select:
+    """Builds the query returning all rooms as one JSON array, newest first."""
+    room = func.json_build_object(
+        "id",
+        Room.id,
+        "name",
+        Room.name,
+        "created_at",
+        isoformat(Room.created_at),
+        "created_by",
+        Room.created_by,
+    )
+    return select(cast(json_list(room, Room.created_at.desc()), Text))
+
+
+def build_room_users_query(room_id: str, approved_only: bool) -> Select:
+    """Builds the query returning the users of a room as one JSON array."""
+    user = func.json_build_object(
+        "user_id",
+        RoomUser.user_id,
+        "is_admin",
+        RoomUser.is_admin,
+        "status",
+        cast(RoomUser.status, String),
+        "created_at",
+        isoformat(RoomUser.created_at),
+    )
+    query = select(cast(json_list(user, RoomUser.created_at), Text)).where(
+        RoomUser.room_id == room_id
+    )
+    if approved_only:
+        query = query.where(RoomUser.status == ApprovalStatus.APPROVED)
+    return query
+
+
+def default_history_start() -> Optional[datetime]:
+    """Returns where history without a ``from_date`` starts.
+
+    Only partitioned tables are cut to the last ``HISTORY_DEFAULT_DAYS``, so
+    reads are pruned to their recent partitions.
+    """
+    if not settings.DB_PARTITIONING_ENABLED:
+        return None
+    return datetime.now(tz=timezone.utc) - timedelta(days=settings.HISTORY_DEFAULT_DAYS)
+
+
+def build_game_history_query(
+    room_id: str,
+    from_date: Optional[datetime],
+    to_date: Optional[datetime],
+    limit: Optional[int] = None,
+) -> Select:
+    """Builds the query returning the games of a room as one JSON array.
+
+    Prices are aggregated per game in Postgres, so no ORM objects are loaded.
+    With ``limit`` only the most recent games are returned, oldest first.
+    """
+    price = func.json_build_object(
+        "user_id",
+        GamePrice.user_id,
+        "price",
+        GamePrice.price,
+        "currency",
+        func.lower(cast(GamePrice.currency, String)),
+        "conversion_rate",
+        func.nullif(GamePrice.conversion_rate, 0),
+        "price_in_czk",
+        GamePrice.price_in_czk,
+        "created_at",
+        isoformat(GamePrice.created_at),
+    )
+    # Prices are never older than their game, so the lower bound also prunes
+    # the partitions of game_prices.
+    prices = select(json_list(price, GamePrice.created_at)).where(
+        GamePrice.game_id == Game.id
+    )
+    if from_date is not None:
+        prices = prices.where(GamePrice.created_at >= from_date)
+    games = select(
+        Game.created_at,
+        func.json_build_object(
+            "id",
+            Game.id,
+            "room_id",
+            Game.room_id,
+            "loser",
+            Game.loser,
+            "price",
+            Game.price,
+            "created_at",
+            isoformat(Game.created_at),
+            "prices",
+            prices.scalar_subquery(),
+        ).label("game"),
+    ).where(Game.room_id == room_id)
+    if from_date is not None:
+        games = games.where(Game.created_at >= from_date)
+    if to_date is not None:
+        games = games.where(Game.created_at < to_date)
+    if limit is not None:
+        games = games.order_by(Game.created_at.desc()).limit(limit)
+    games_subquery = games.subquery()
+    return select(
+        cast(
+            json_list(games_subquery.c.game, games_subquery.c.created_at),
+            Text,
+        )
+    )
+
+
+async def fetch_json(session: AsyncSession, query: Select) -> str:
+    """Runs a query returning one JSON array and returns its text."""
+    return (await session.execute(query)).scalar_one()
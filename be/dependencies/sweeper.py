@@ -0,0 +1,128 @@
+import asyncio
+from typing import Optional
+
+import redis.asyncio as redis
+
+from database import create_redis
+from observability import RedisCommand, get_logger
+from observability.metrics import redis_reclaimed_bytes, redis_swept_keys
+from settings import settings
+
+logger = get_logger("dependencies")
+
+SCAN_BATCH_SIZE = 500
+
+
+def get_key_ttl(key: str) -> Optional[int]:
+    """Returns the expiry a key of the application should have."""
+    if key == "rooms" or ":users:" in key or ":http:" in key or ":body:" in key:
+        return settings.REDIS_CACHE_TTL_SECONDS
+    if key.endswith((":actions", ":game", ":version")):
+        return settings.REDIS_ACTIONS_TTL_SECONDS
+    if key.endswith(":rates"):
+        return settings.RATES_PIN_SECONDS
+    return None
+
+
+class RedisSweeper:
+    """Bounds Redis memory by expiring keys written without an expiry.
+
+    Keys written by older versions or by code paths that skip the expiry are
+    found with SCAN. A key idle for longer than its TTL is deleted right away
+    and its size counts as reclaimed, any other key gets its TTL set.
+    """
+
+    def __init__(self) -> None:
+        self.task: Optional[asyncio.Task] = None
+        self.redis_connection: Optional[redis.Redis] = None
+
+    def start(self) -> None:
+        """Starts the periodic sweep."""
+        # The in-memory backend expires and evicts keys by itself.
+        if (
+            settings.REDIS_SWEEP_INTERVAL_SECONDS <= 0
+            or settings.STORAGE_BACKEND == "memory"
+        ):
+            return
+        self.redis_connection = create_redis()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the periodic sweep."""
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.redis_connection is not None:
+            await self.redis_connection.aclose()
+            self.redis_connection = None
+
+    async def sweep(self) -> tuple[int, int]:
+        """Runs one sweep and returns the deleted keys and reclaimed bytes."""
+        assert self.redis_connection is not None
+        results = []
+        batch: list[bytes] = []
+        async for key in self.redis_connection.scan_iter(
+            match="room*", count=SCAN_BATCH_SIZE
+        ):
+            batch.append(key)
+            if len(batch) == SCAN_BATCH_SIZE:
+                results.append(await self._sweep_batch(batch))
+                batch = []
+        if batch:
+            results.append(await self._sweep_batch(batch))
+        return sum(result[0] for result in results), sum(
+            result[1] for result in results
+        )
+
+    async def _sweep_batch(self, keys: list[bytes]) -> tuple[int, int]:
+        assert self.redis_connection is not None
+        pipeline = self.redis_connection.pipeline(transaction=False)
+        for key in keys:
+            pipeline.ttl(key)
+            pipeline.object("idletime", key)
+            pipeline.memory_usage(key)
+        with RedisCommand("pipeline"):
+            replies = await pipeline.execute(raise_on_error=False)
+
+        to_delete, to_expire, reclaimed = [], [], 0
+        for index, key in enumerate(keys):
+            ttl, idle, size = replies[index * 3 : index * 3 + 3]
+            expected_ttl = get_key_ttl(key.decode("utf-8"))
+            if ttl != -1 or expected_ttl is None:
+                continue
+            if isinstance(idle, int) and idle > expected_ttl:
+                to_delete.append(key)
+                reclaimed += size if isinstance(size, int) else 0
+            else:
+                to_expire.append((key, expected_ttl))
+
+        pipeline = self.redis_connection.pipeline(transaction=False)
+        for key in to_delete:
+            pipeline.delete(key)
+        for key, expected_ttl in to_expire:
+            pipeline.expire(key, expected_ttl)
+        if to_delete or to_expire:
+            with RedisCommand("pipeline"):
+                await pipeline.execute()
+
+        redis_swept_keys.labels("deleted").inc(len(to_delete))
+        redis_swept_keys.labels("expired").inc(len(to_expire))
+        redis_reclaimed_bytes.labels().inc(reclaimed)
+        return len(to_delete), reclaimed
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                deleted, reclaimed = await self.sweep()
+                logger.info(
+                    "Redis sweep deleted %d stale keys, reclaimed %d bytes.",
+                    deleted,
+                    reclaimed,
+                )
+            except redis.RedisError as exc:
+                logger.warning("Redis sweep failed: %s", exc)
+            await asyncio.sleep(settings.REDIS_SWEEP_INTERVAL_SECONDS)
+
+
+redis_sweeper = RedisSweeper()
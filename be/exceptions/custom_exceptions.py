@@ -51,3 +51,11 @@ class UserNotPending(Exception):
 
     def __init__(self):
         self.detail = "User was already approved/rejected."
+
+
+class NotModifiedError(Exception):
+    """Raised when a conditional GET matches the current version of a resource."""
+
+    def __init__(self, etag: str):
+        self.detail = "Not modified."
+        self.etag = etag
@@ -1,7 +1,8 @@
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 from exceptions.custom_exceptions import (
+    NotModifiedError,
     RoomNameNotUniqueError,
     RoomNotFoundError,
     UserAlreadyInRoomError,
@@ -52,7 +53,14 @@ async def user_not_pending_handler(_: Request, exc: UserNotPending) -> JSONRespo
     return JSONResponse(status_code=400, content={"detail": exc.detail})
 
 
+async def not_modified_handler(_: Request, exc: NotModifiedError) -> Response:
+    return Response(
+        status_code=304, headers={"ETag": exc.etag, "Cache-Control": "no-cache"}
+    )
+
+
 error_handlers = [
+    (NotModifiedError, not_modified_handler),
     (RoomNameNotUniqueError, room_name_not_unique_error_handler),
     (RoomNotFoundError, room_not_found_error_handler),
     (UserAlreadyInRoomError, user_already_in_room_error_handler),
@@ -3,18 +3,57 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from database import disconnect_db, init_db
+from database import disconnect_db, engine, init_db, replica_router
+from database.partitions import partition_maintenance
+from database.models import RoomUserStats
+from dependencies.action_writer import action_writer
+from dependencies.jobs import job_queue
+from dependencies.sweeper import redis_sweeper
 from exceptions.exception_route_handlers import error_handlers
+from observability import (
+    MetricsMiddleware,
+    TracingMiddleware,
+    configure_logging,
+    log_queue,
+    tracer,
+)
+from rates import rate_cache
+from routes.metrics_routes import router as metrics_router
 from routes.routes import router
 from routes.ws_routes import router as ws_router
+from settings import settings
+from websocket.drain import drain, drain_on_signal
+from websocket.keepalive import keepalive
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
-    """Init db on start and disconnects upon shutdown."""
+    """Init db on start, drains sockets and disconnects upon shutdown."""
+    configure_logging()
+    log_queue.start()
+    await tracer.start()
     await init_db()
+    await RoomUserStats.backfill()
+    await replica_router.start()
+    await rate_cache.start()
+    partition_maintenance.start(engine)
+    redis_sweeper.start()
+    action_writer.start()
+    job_queue.start()
+    keepalive.start()
+    drain_on_signal()
     yield
+    await drain()
+    await job_queue.stop()
+    await keepalive.stop()
+    await action_writer.stop()
+    await redis_sweeper.stop()
+    await partition_maintenance.stop()
+    await rate_cache.stop()
+    await replica_router.stop()
     await disconnect_db()
+    await tracer.stop()
+    log_queue.stop()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -33,6 +72,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
 for handler in error_handlers:
     # Ignore due to bug https://github.com/encode/starlette/pull/2403
     app.add_exception_handler(*handler)  # type: ignore
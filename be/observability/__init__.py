@@ -0,0 +1,4 @@
+from .instrumentation import RedisCommand, traced
+from .logs import configure_logging, get_logger, log_queue
+from .middleware import MetricsMiddleware, TracingMiddleware
+from .tracing import tracer
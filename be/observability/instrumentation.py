@@ -0,0 +1,46 @@
+import functools
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+from .metrics import redis_command_duration
+from .tracing import NOOP_SPAN, tracer
+
+T = TypeVar("T")
+
+
+class RedisCommand:
+    """Context manager timing a Redis command for metrics and tracing."""
+
+    __slots__ = ("command", "span", "start")
+
+    def __init__(self, command: str) -> None:
+        self.command = command
+        self.span = NOOP_SPAN if not tracer.enabled else tracer.span(f"redis {command}")
+        self.start = 0.0
+
+    def __enter__(self) -> "RedisCommand":
+        self.span.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        redis_command_duration.labels(self.command).observe(
+            time.perf_counter() - self.start
+        )
+        self.span.__exit__(exc_type, exc, traceback)
+
+
+def traced(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """Wraps an async dependency in a span named after the function.
+
+    The wrapper keeps the signature of the wrapped function, so FastAPI keeps
+    resolving its parameters and sub-dependencies as before.
+    """
+    name = f"dependency {func.__name__}"
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        with tracer.span(name):
+            return await func(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,142 @@
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import random
+import time
+
+from settings import settings
+
+ROOT_LOGGER_NAME = "uvicorn.error"
+QUEUED_LOGGER_NAMES = (ROOT_LOGGER_NAME, "uvicorn.access")
+
+SUBSYSTEMS = ("database", "dependencies", "websocket", "events", "tracing", "rates")
+EVENTS_SUBSYSTEM = "events"
+
+
+def get_logger(subsystem: str) -> logging.Logger:
+    """Returns the logger of an application subsystem.
+
+    Subsystem loggers are children of uvicorn's error logger so they share its
+    handlers while their level can be tuned independently.
+    """
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{subsystem}")
+
+
+class RateLimitFilter(logging.Filter):  # pylint: disable=R0903
+    """Samples and rate limits log records using a token bucket.
+
+    The bucket holds at least one token, so rates below one record per
+    second still let a record through every ``1 / rate`` seconds. The number
+    of dropped records is appended to the next emitted record so suppressed
+    bursts are still visible in the logs.
+    """
+
+    def __init__(self, rate: float, sample_rate: float = 1.0) -> None:
+        super().__init__()
+        self.rate = rate
+        self.sample_rate = sample_rate
+        self.burst = max(rate, 1.0)
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return self._emit(record)
+
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.suppressed += 1
+            return False
+
+        if self.rate > 0:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.last_refill) * self.rate
+            )
+            self.last_refill = now
+            if self.tokens < 1:
+                self.suppressed += 1
+                return False
+            self.tokens -= 1
+
+        return self._emit(record)
+
+    def _emit(self, record: logging.LogRecord) -> bool:
+        """Marks the record with the number of records suppressed before it."""
+        if self.suppressed and isinstance(record.args, tuple):
+            record.msg = f"{record.msg} (%d similar messages suppressed)"
+            record.args = (*record.args, self.suppressed)
+            self.suppressed = 0
+        return True
+
+
+def configure_logging() -> None:
+    """Applies log levels and per-event sampling from settings."""
+    logging.getLogger(ROOT_LOGGER_NAME).setLevel(settings.LOG_LEVEL.upper())
+
+    for subsystem in SUBSYSTEMS:
+        level = settings.LOG_LEVELS.get(subsystem, settings.LOG_LEVEL)
+        get_logger(subsystem).setLevel(level.upper())
+
+    events_logger = get_logger(EVENTS_SUBSYSTEM)
+    for log_filter in list(events_logger.filters):
+        if isinstance(log_filter, RateLimitFilter):
+            events_logger.removeFilter(log_filter)
+
+    if settings.LOG_EVENTS_RATE_LIMIT > 0 or settings.LOG_EVENTS_SAMPLE_RATE < 1.0:
+        events_logger.addFilter(
+            RateLimitFilter(
+                settings.LOG_EVENTS_RATE_LIMIT, settings.LOG_EVENTS_SAMPLE_RATE
+            )
+        )
+
+
+class LocalQueueHandler(QueueHandler):
+    """Queue handler passing records on without formatting them first.
+
+    The listener lives in the same process, so records need not be made
+    picklable, and formatters such as uvicorn's access log formatter still
+    get the original arguments.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LogQueue:
+    """Moves handlers of uvicorn loggers behind queues.
+
+    Records are only enqueued on the event loop, formatting and writing happen
+    on background listener threads.
+    """
+
+    def __init__(self) -> None:
+        self.listeners: list[tuple[logging.Logger, QueueListener]] = []
+
+    def start(self) -> None:
+        """Replaces handlers of uvicorn loggers with queue handlers."""
+        if not settings.LOG_QUEUE_ENABLED:
+            return
+
+        for name in QUEUED_LOGGER_NAMES:
+            logger = logging.getLogger(name)
+            if not logger.handlers:
+                continue
+
+            records: queue.SimpleQueue = queue.SimpleQueue()
+            listener = QueueListener(
+                records, *logger.handlers, respect_handler_level=True
+            )
+            logger.handlers = [LocalQueueHandler(records)]
+            listener.start()
+            self.listeners.append((logger, listener))
+
+    def stop(self) -> None:
+        """Flushes queued records and restores the original handlers."""
+        for logger, listener in self.listeners:
+            listener.stop()
+            logger.handlers = list(listener.handlers)
+        self.listeners.clear()
+
+
+log_queue = LogQueue()
@@ -0,0 +1,346 @@
+from bisect import bisect_left
+from typing import Generic, TypeVar
+
+# pylint: disable=too-few-public-methods
+
+# Metrics are only ever updated from the event loop thread, so plain integer
+# and float updates are atomic with respect to each other and need no locks.
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+ChildT = TypeVar("ChildT")
+
+
+class CounterValue:
+    """Single labelled counter."""
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increments the counter."""
+        self.value += amount
+
+
+class GaugeValue:
+    """Single labelled gauge."""
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increments the gauge."""
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrements the gauge."""
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        """Sets the gauge to a value."""
+        self.value = value
+
+
+class HistogramValue:
+    """Single labelled histogram with preallocated buckets."""
+
+    __slots__ = ("upper_bounds", "bucket_counts", "sum", "count")
+
+    def __init__(self, upper_bounds: tuple[float, ...]) -> None:
+        self.upper_bounds = upper_bounds
+        self.bucket_counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Records an observation."""
+        self.bucket_counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric(Generic[ChildT]):
+    """Base class of a metric family with a fixed set of label names."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self.children: dict[tuple, ChildT] = {}
+
+    def labels(self, *values: str) -> ChildT:
+        """Returns the child for the label values, creating it on first use."""
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self._new_child()
+        return child
+
+    def _new_child(self) -> ChildT:
+        raise NotImplementedError
+
+    def _format_labels(self, values: tuple, extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(str(value))}"'
+            for name, value in zip(self.label_names, values)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        """Renders the metric family in the Prometheus text format."""
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._render_samples(),
+        ]
+
+    def _render_samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric[CounterValue]):
+    """Monotonically increasing counter."""
+
+    kind = "counter"
+
+    def _new_child(self) -> CounterValue:
+        return CounterValue()
+
+    def _render_samples(self) -> list[str]:
+        return [
+            f"{self.name}{self._format_labels(values)} {child.value}"
+            for values, child in self.children.items()
+        ]
+
+
+class Gauge(Metric[GaugeValue]):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def _new_child(self) -> GaugeValue:
+        return GaugeValue()
+
+    def _render_samples(self) -> list[str]:
+        return [
+            f"{self.name}{self._format_labels(values)} {child.value}"
+            for values, child in self.children.items()
+        ]
+
+
+class Histogram(Metric[HistogramValue]):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+
+    def _new_child(self) -> HistogramValue:
+        return HistogramValue(self.buckets)
+
+    def _render_samples(self) -> list[str]:
+        lines = []
+        for values, child in self.children.items():
+            cumulative = 0
+            for bound, bucket_count in zip(
+                (*self.buckets, "+Inf"), child.bucket_counts
+            ):
+                cumulative += bucket_count
+                labels = self._format_labels(values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = self._format_labels(values)
+            lines.append(f"{self.name}_sum{labels} {child.sum}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """Holds all metric families and renders them for scraping."""
+
+    def __init__(self) -> None:
+        self.metrics: list[Metric] = []
+
+    def counter(self, name: str, documentation: str, labels: tuple = ()) -> Counter:
+        """Creates and registers a counter."""
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: tuple = ()) -> Gauge:
+        """Creates and registers a gauge."""
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: tuple = ()) -> Histogram:
+        """Creates and registers a histogram."""
+        return self._register(Histogram(name, documentation, labels))
+
+    def render(self) -> str:
+        """Renders all registered metrics in the Prometheus text format."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests per route.",
+    ("method", "route", "status"),
+)
+ws_events = registry.counter(
+    "ws_events_total", "WebSocket room events handled per type.", ("type",)
+)
+ws_events_rejected = registry.counter(
+    "ws_events_rejected_total",
+    "WebSocket room events rejected by the game state per type.",
+    ("type",),
+)
+ws_events_limited = registry.counter(
+    "ws_events_limited_total",
+    "WebSocket room events dropped by rate limits per scope.",
+    ("scope",),
+)
+ws_event_duration = registry.histogram(
+    "ws_event_duration_seconds",
+    "Time spent handling a WebSocket room event per type.",
+    ("type",),
+)
+ws_connections = registry.gauge(
+    "ws_connections", "Open WebSocket connections per channel kind.", ("channel",)
+)
+ws_drained = registry.counter(
+    "ws_drained_sockets_total",
+    "WebSockets handed over to other workers on shutdown per result.",
+    ("result",),
+)
+ws_snapshot_duration = registry.histogram(
+    "ws_snapshot_duration_seconds",
+    "Time to assemble the snapshot frame sent when a socket joins a room.",
+)
+ws_pings = registry.counter(
+    "ws_pings_total", "Keepalive pings sent to silent WebSockets."
+)
+ws_reaped = registry.counter(
+    "ws_reaped_sockets_total",
+    "WebSockets closed for not answering keepalive pings per reason.",
+    ("reason",),
+)
+ws_channels = registry.gauge(
+    "ws_channels", "Channels with at least one local WebSocket connection."
+)
+broadcast_fanout_duration = registry.histogram(
+    "broadcast_fanout_duration_seconds",
+    "Time to send a pub/sub message to all local sockets of a channel.",
+    ("channel",),
+)
+pubsub_lag = registry.histogram(
+    "pubsub_lag_seconds",
+    "Delay between publishing a message and reading it from pub/sub.",
+    ("channel",),
+)
+redis_command_duration = registry.histogram(
+    "redis_command_duration_seconds",
+    "Latency of Redis commands issued by the application.",
+    ("command",),
+)
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds",
+    "Latency of SQL statements per operation.",
+    ("operation",),
+)
+db_pool_checkouts = registry.counter(
+    "db_pool_checkouts_total",
+    "Connections checked out of the pool of each database.",
+    ("pool",),
+)
+db_read_routes = registry.counter(
+    "db_read_routes_total",
+    "Read-only sessions per database they were routed to and why.",
+    ("target", "reason"),
+)
+db_replica_lag = registry.gauge(
+    "db_replica_lag_seconds", "Replication lag of read replicas.", ("replica",)
+)
+cache_requests = registry.counter(
+    "cache_requests_total", "Cache lookups per key kind and result.", ("key", "result")
+)
+http_cache_requests = registry.counter(
+    "http_cache_requests_total",
+    "Conditional GETs per resource and whether a body was sent or cached.",
+    ("resource", "result"),
+)
+rate_refreshes = registry.counter(
+    "exchange_rate_refreshes_total",
+    "Exchange rate refreshes per source and result.",
+    ("source", "result"),
+)
+redis_swept_keys = registry.counter(
+    "redis_swept_keys_total",
+    "Keys without an expiry found by the sweeper per action taken.",
+    ("action",),
+)
+redis_reclaimed_bytes = registry.counter(
+    "redis_reclaimed_bytes_total", "Bytes freed by keys deleted by the sweeper."
+)
+room_actions_written = registry.counter(
+    "room_actions_written_total",
+    "Room actions copied to Postgres per result.",
+    ("result",),
+)
+room_actions_buffered = registry.gauge(
+    "room_actions_buffered", "Room actions waiting to be copied to Postgres."
+)
+jobs_processed = registry.counter(
+    "jobs_processed_total",
+    "Background jobs run per kind and result.",
+    ("kind", "result"),
+)
+job_duration = registry.histogram(
+    "job_duration_seconds", "Time to run a background job.", ("kind",)
+)
+memory_backend_evictions = registry.counter(
+    "memory_backend_evicted_keys_total",
+    "Keys dropped by the in-memory storage backend per reason.",
+    ("reason",),
+)
+evaluation_duration = registry.histogram(
+    "game_evaluation_duration_seconds", "Time to evaluate a game."
+)
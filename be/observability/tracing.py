@@ -0,0 +1,298 @@
+import asyncio
+from contextvars import ContextVar, Token
+import json
+import os
+import random
+import time
+from typing import Any, Optional
+from urllib import request as urllib_request
+
+from settings import settings
+from .logs import get_logger
+
+# pylint: disable=too-few-public-methods, too-many-instance-attributes
+
+logger = get_logger("tracing")
+
+EXPORT_BATCH_SIZE = 64
+EXPORT_INTERVAL_SECONDS = 1.0
+EXPORT_QUEUE_SIZE = 1024
+
+
+class Span:
+    """Timed unit of work inside a trace."""
+
+    __slots__ = (
+        "trace",
+        "name",
+        "span_id",
+        "parent",
+        "start",
+        "end",
+        "attributes",
+        "token",
+    )
+
+    def __init__(
+        self, trace: "Trace", name: str, parent: Optional["Span"], attributes: dict
+    ) -> None:
+        self.trace = trace
+        self.name = name
+        self.span_id = random.getrandbits(64)
+        self.parent = parent
+        self.start = time.time_ns()
+        self.end = 0
+        self.attributes = attributes
+        self.token: Optional[Token] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Sets an attribute on the span."""
+        self.attributes[key] = value
+
+    def update_name(self, name: str) -> None:
+        """Renames the span once more context is known."""
+        self.name = name
+
+    def __enter__(self) -> "Span":
+        self.token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, _traceback) -> None:
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        if self.token is not None:
+            _current_span.reset(self.token)
+        self.finish()
+
+    def finish(self) -> None:
+        """Ends the span without it ever becoming the current span."""
+        self.end = time.time_ns()
+        self.trace.spans.append(self)
+
+    @property
+    def duration_ms(self) -> float:
+        """Duration of the finished span in milliseconds."""
+        return (self.end - self.start) / 1_000_000
+
+    def to_dict(self) -> dict:
+        """Serializes the span for the JSON exporter."""
+        return {
+            "name": self.name,
+            "span_id": f"{self.span_id:016x}",
+            "parent_id": f"{self.parent.span_id:016x}" if self.parent else None,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """Spans recorded while handling one request or WebSocket event."""
+
+    __slots__ = ("trace_id", "sampled", "spans")
+
+    def __init__(self, sampled: bool) -> None:
+        self.trace_id = random.getrandbits(128)
+        self.sampled = sampled
+        self.spans: list[Span] = []
+
+
+class _NoopSpan:
+    """Span returned when there is no active trace."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Ignores the attribute."""
+
+    def update_name(self, name: str) -> None:
+        """Ignores the name."""
+
+    def finish(self) -> None:
+        """Does nothing."""
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, _traceback) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+class RootSpan(Span):
+    """Span that opens a new trace and hands it to the exporter when done."""
+
+    __slots__ = ("tracer",)
+
+    def __init__(self, owner: "Tracer", name: str, attributes: dict) -> None:
+        super().__init__(
+            Trace(random.random() < settings.TRACING_SAMPLE_RATE),
+            name,
+            None,
+            attributes,
+        )
+        self.tracer = owner
+
+    def __exit__(self, exc_type, exc, _traceback) -> None:
+        super().__exit__(exc_type, exc, _traceback)
+        self.tracer.finish(self.trace, self)
+
+
+class Tracer:
+    """Records spans with head sampling and exports them in the background.
+
+    Spans are recorded for every trace so that a trace slower than
+    ``TRACING_SLOW_THRESHOLD_MS`` is exported even when it was not sampled.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = settings.TRACING_ENABLED
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.dropped = 0
+
+    def start_trace(self, name: str, **attributes: Any) -> Span | _NoopSpan:
+        """Opens a root span, a no-op when tracing is disabled."""
+        if not self.enabled:
+            return NOOP_SPAN
+        return RootSpan(self, name, attributes)
+
+    def span(self, name: str, **attributes: Any) -> Span | _NoopSpan:
+        """Opens a child span of the current span, a no-op outside a trace."""
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = _current_span.get()
+        if parent is None:
+            return NOOP_SPAN
+        return Span(parent.trace, name, parent, attributes)
+
+    def finish(self, trace: Trace, root: Span) -> None:
+        """Queues a finished trace for export if it was sampled or slow."""
+        if not trace.sampled and root.duration_ms < settings.TRACING_SLOW_THRESHOLD_MS:
+            return
+        if self.queue is None:
+            return
+        try:
+            self.queue.put_nowait(trace)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def start(self) -> None:
+        """Starts the background exporter."""
+        if not self.enabled:
+            return
+        self.queue = asyncio.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self.task = asyncio.create_task(self._export_loop())
+
+    async def stop(self) -> None:
+        """Exports remaining traces and stops the background exporter."""
+        if self.task is None or self.queue is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        await self._export(self._drain())
+        self.task = None
+
+    def _drain(self) -> list[Trace]:
+        traces = []
+        while self.queue is not None and not self.queue.empty():
+            traces.append(self.queue.get_nowait())
+        return traces
+
+    async def _export_loop(self) -> None:
+        assert self.queue is not None
+        while True:
+            batch = [await self.queue.get()]
+            await asyncio.sleep(EXPORT_INTERVAL_SECONDS)
+            while len(batch) < EXPORT_BATCH_SIZE and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            await self._export(batch)
+
+    async def _export(self, traces: list[Trace]) -> None:
+        if not traces:
+            return
+        try:
+            if settings.TRACING_EXPORTER == "otlp":
+                await asyncio.to_thread(export_otlp, traces)
+            else:
+                await asyncio.to_thread(export_json, traces)
+        except OSError as exc:
+            logger.warning("Exporting %d traces failed: %s", len(traces), exc)
+
+
+def export_json(traces: list[Trace]) -> None:
+    """Appends traces to the JSON lines file."""
+    path = settings.TRACING_JSON_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as file:
+        for trace in traces:
+            file.write(
+                json.dumps(
+                    {
+                        "trace_id": f"{trace.trace_id:032x}",
+                        "sampled": trace.sampled,
+                        "spans": [span.to_dict() for span in trace.spans],
+                    },
+                    default=str,
+                )
+                + "\n"
+            )
+
+
+def _otlp_span(trace: Trace, span: Span) -> dict:
+    return {
+        "traceId": f"{trace.trace_id:032x}",
+        "spanId": f"{span.span_id:016x}",
+        "parentSpanId": f"{span.parent.span_id:016x}" if span.parent else "",
+        "name": span.name,
+        "kind": 2 if span.parent is None else 1,
+        "startTimeUnixNano": str(span.start),
+        "endTimeUnixNano": str(span.end),
+        "attributes": [
+            {"key": key, "value": {"stringValue": str(value)}}
+            for key, value in span.attributes.items()
+        ],
+    }
+
+
+def export_otlp(traces: list[Trace]) -> None:
+    """Posts traces to an OTLP/HTTP collector using the JSON encoding."""
+    body = {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {
+                            "key": "service.name",
+                            "value": {"stringValue": settings.TRACING_SERVICE_NAME},
+                        }
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "lunch-bet"},
+                        "spans": [
+                            _otlp_span(trace, span)
+                            for trace in traces
+                            for span in trace.spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+    otlp_request = urllib_request.Request(
+        settings.TRACING_OTLP_ENDPOINT,
+        data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib_request.urlopen(otlp_request, timeout=5):
+        pass
+
+
+tracer = Tracer()
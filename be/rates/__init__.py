@@ -0,0 +1,2 @@
+from .cache import RateSnapshot, rate_cache
+from .providers import RateProvider, get_rate_provider
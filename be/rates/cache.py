@@ -0,0 +1,240 @@
+import asyncio
+import time
+from typing import Optional
+import uuid
+
+from pydantic import BaseModel, ValidationError
+import redis.asyncio as redis
+from redis.exceptions import WatchError
+
+from database import create_redis
+from observability import RedisCommand, get_logger
+from observability.metrics import rate_refreshes
+from settings import settings
+from .providers import (
+    DEFAULT_RATES,
+    RateProvider,
+    get_rate_provider,
+    validate_rates,
+)
+
+logger = get_logger("rates")
+
+SHARED_RATES_KEY = "exchange_rates"
+SHARED_LOCK_KEY = "exchange_rates:lock"
+SHARED_LOCK_SECONDS = 30
+
+
+def get_room_rates_key(room_id: str) -> str:
+    """Returns the key of the rates pinned to the running game of a room."""
+    return f"room:{room_id}:rates"
+
+
+class RateSnapshot(BaseModel):
+    """Exchange rates to CZK as fetched at one point in time."""
+
+    rates: dict[str, float]
+    fetched_at: float
+    source: str
+
+    @property
+    def age(self) -> float:
+        """Seconds since the rates were fetched."""
+        return time.time() - self.fetched_at
+
+
+FALLBACK_SNAPSHOT = RateSnapshot(rates=DEFAULT_RATES, fetched_at=0, source="static")
+
+
+class RateCache:
+    """Process-wide exchange rates with a TTL and a copy shared through Redis.
+
+    Readers never wait for the upstream provider. A stale snapshot is served
+    while a single background task refreshes it, first from the Redis copy
+    written by another worker and only then from the provider. A Redis lock
+    keeps concurrent workers from fetching upstream at the same time.
+    """
+
+    def __init__(self) -> None:
+        self.provider: RateProvider = get_rate_provider()
+        self.snapshot: Optional[RateSnapshot] = None
+        self.refreshing: Optional[asyncio.Task] = None
+        self.task: Optional[asyncio.Task] = None
+        self.redis_connection: Optional[redis.Redis] = None
+
+    async def start(self) -> None:
+        """Loads the initial rates and starts the periodic refresh."""
+        self.redis_connection = create_redis()
+        await self.refresh()
+        self.task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """Stops the periodic refresh."""
+        for task in (self.task, self.refreshing):
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(
+            *(task for task in (self.task, self.refreshing) if task is not None),
+            return_exceptions=True,
+        )
+        self.task = self.refreshing = None
+        if self.redis_connection is not None:
+            await self.redis_connection.aclose()
+            self.redis_connection = None
+
+    def current(self) -> RateSnapshot:
+        """Returns the cached rates without waiting, refreshing them if stale."""
+        if self.snapshot is None or self.snapshot.age > settings.RATES_TTL_SECONDS:
+            self.refresh_in_background()
+        return self.snapshot or FALLBACK_SNAPSHOT
+
+    def refresh_in_background(self) -> asyncio.Task:
+        """Starts a refresh unless one is already running and returns its task."""
+        if self.refreshing is None or self.refreshing.done():
+            self.refreshing = asyncio.create_task(self._refresh())
+        return self.refreshing
+
+    async def refresh(self) -> RateSnapshot:
+        """Waits for a refresh, joining the one in progress if there is any."""
+        return await asyncio.shield(self.refresh_in_background())
+
+    async def pin(self, room_id: str) -> None:
+        """Stores the current rates as the rates of the game started in a room."""
+        if self.redis_connection is None:
+            return
+        with RedisCommand("set"):
+            await self.redis_connection.set(
+                get_room_rates_key(room_id),
+                self.current().model_dump_json(),
+                ex=settings.RATES_PIN_SECONDS,
+            )
+
+    async def for_room(self, room_id: str) -> RateSnapshot:
+        """Returns the rates pinned to the game of a room or the current ones."""
+        if self.redis_connection is not None:
+            with RedisCommand("get"):
+                pinned = await self.redis_connection.get(get_room_rates_key(room_id))
+            snapshot = self._parse(pinned)
+            if snapshot is not None:
+                return snapshot
+        return self.current()
+
+    async def unpin(self, room_id: str) -> None:
+        """Removes the rates pinned to the finished game of a room."""
+        if self.redis_connection is None:
+            return
+        with RedisCommand("delete"):
+            await self.redis_connection.delete(get_room_rates_key(room_id))
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.RATES_REFRESH_SECONDS)
+            try:
+                await self.refresh()
+            except Exception:  # pylint: disable=broad-exception-caught
+                # Keeps refreshing, the rates in use stay until a refresh works.
+                logger.exception("Refreshing rates failed")
+
+    async def _refresh(self) -> RateSnapshot:
+        shared = await self._read_shared()
+        if shared is not None and shared.age <= settings.RATES_REFRESH_SECONDS:
+            self.snapshot = shared
+            rate_refreshes.labels("redis", "ok").inc()
+            return shared
+
+        token = uuid.uuid4().hex
+        if not await self._acquire_fetch_lock(token):
+            # Another worker is fetching, keep serving what we have.
+            self.snapshot = shared or self.snapshot
+            return self.snapshot or FALLBACK_SNAPSHOT
+
+        try:
+            return await self._fetch(shared)
+        finally:
+            await self._release_fetch_lock(token)
+
+    async def _fetch(self, shared: Optional[RateSnapshot]) -> RateSnapshot:
+        try:
+            rates = validate_rates(await self.provider.fetch())
+        except (OSError, ValueError) as exc:
+            rate_refreshes.labels(self.provider.name, "error").inc()
+            logger.warning("Fetching rates from %s failed: %s", self.provider.name, exc)
+            self.snapshot = shared or self.snapshot
+            return self.snapshot or FALLBACK_SNAPSHOT
+
+        snapshot = RateSnapshot(
+            rates=rates, fetched_at=time.time(), source=self.provider.name
+        )
+        rate_refreshes.labels(self.provider.name, "ok").inc()
+        logger.info("Fetched rates from %s: %s", self.provider.name, rates)
+        self.snapshot = snapshot
+        await self._write_shared(snapshot)
+        return snapshot
+
+    async def _read_shared(self) -> Optional[RateSnapshot]:
+        if self.redis_connection is None:
+            return None
+        try:
+            with RedisCommand("get"):
+                return self._parse(await self.redis_connection.get(SHARED_RATES_KEY))
+        except redis.RedisError as exc:
+            logger.warning("Reading shared rates failed: %s", exc)
+            return None
+
+    async def _write_shared(self, snapshot: RateSnapshot) -> None:
+        if self.redis_connection is None:
+            return
+        try:
+            with RedisCommand("set"):
+                await self.redis_connection.set(
+                    SHARED_RATES_KEY,
+                    snapshot.model_dump_json(),
+                    ex=settings.RATES_TTL_SECONDS,
+                )
+        except redis.RedisError as exc:
+            logger.warning("Writing shared rates failed: %s", exc)
+
+    async def _acquire_fetch_lock(self, token: str) -> bool:
+        if self.redis_connection is None:
+            return True
+        try:
+            with RedisCommand("set"):
+                return bool(
+                    await self.redis_connection.set(
+                        SHARED_LOCK_KEY, token, nx=True, ex=SHARED_LOCK_SECONDS
+                    )
+                )
+        except redis.RedisError:
+            return True
+
+    async def _release_fetch_lock(self, token: str) -> None:
+        if self.redis_connection is None:
+            return
+        # Only the worker that set the lock deletes it, it may have expired and
+        # been taken by another worker during a slow fetch.
+        try:
+            async with self.redis_connection.pipeline(transaction=True) as pipeline:
+                with RedisCommand("delete"):
+                    await pipeline.watch(SHARED_LOCK_KEY)
+                    if await pipeline.get(SHARED_LOCK_KEY) != token.encode():
+                        return
+                    pipeline.multi()
+                    pipeline.delete(SHARED_LOCK_KEY)
+                    await pipeline.execute()
+        except WatchError:
+            # Taken over by another worker meanwhile.
+            pass
+        except redis.RedisError as exc:
+            logger.warning("Releasing the rates fetch lock failed: %s", exc)
+
+    @staticmethod
+    def _parse(raw: Optional[bytes]) -> Optional[RateSnapshot]:
+        if raw is None:
+            return None
+        try:
+            return RateSnapshot.model_validate_json(raw)
+        except ValidationError:
+            return None
+
+
+rate_cache = RateCache()
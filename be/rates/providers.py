@@ -0,0 +1,126 @@
+import asyncio
+import json
+import math
+from typing import Any
+from urllib import request as urllib_request
+
+from dependencies.enums import Currency
+from settings import settings
+
+# pylint: disable=too-few-public-methods
+
+DEFAULT_RATES = {Currency.EUR.value: 23.10, Currency.USD.value: 25.35}
+
+
+def validate_rates(data: Any) -> dict[str, float]:
+    """Returns rates of every foreign currency as positive finite floats.
+
+    Raises ValueError for anything else, so a malformed source is handled
+    like an unreachable one.
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f"Rates have to be an object, got {type(data).__name__}")
+    rates = {}
+    for code, rate in data.items():
+        if isinstance(rate, bool) or not isinstance(rate, (int, float)):
+            raise ValueError(f"Rate of {code} is not a number: {rate!r}")
+        if not math.isfinite(rate) or rate <= 0:
+            raise ValueError(f"Rate of {code} is not positive: {rate!r}")
+        rates[str(code).lower()] = float(rate)
+    wanted = {currency.value for currency in Currency if currency != Currency.CZK}
+    missing = wanted - rates.keys()
+    if missing:
+        raise ValueError(f"Rates missing for: {', '.join(sorted(missing))}")
+    return rates
+
+
+class RateProvider:
+    """Source of exchange rates to CZK keyed by lowercase currency code.
+
+    What a provider returns is checked with ``validate_rates`` by the cache.
+    """
+
+    name = ""
+
+    async def fetch(self) -> dict[str, float]:
+        """Fetches the current rates."""
+        raise NotImplementedError
+
+
+class StaticRateProvider(RateProvider):
+    """Fixed rates, used offline and as the last resort fallback."""
+
+    name = "static"
+
+    def __init__(self, rates: dict[str, float] | None = None) -> None:
+        self.rates = dict(rates or DEFAULT_RATES)
+
+    async def fetch(self) -> dict[str, float]:
+        """Returns the fixed rates."""
+        return dict(self.rates)
+
+
+class FileRateProvider(RateProvider):
+    """Rates read from a JSON file such as ``{"eur": 25.1, "usd": 23.4}``."""
+
+    name = "file"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    async def fetch(self) -> dict[str, float]:
+        """Reads the rates from the file."""
+        return await asyncio.to_thread(self._read)
+
+    def _read(self) -> dict[str, float]:
+        with open(self.path, encoding="utf-8") as file:
+            return json.load(file)
+
+
+class CnbRateProvider(RateProvider):
+    """Daily exchange rate fixing published by the Czech National Bank."""
+
+    name = "cnb"
+
+    def __init__(self, url: str, timeout: float) -> None:
+        self.url = url
+        self.timeout = timeout
+
+    async def fetch(self) -> dict[str, float]:
+        """Downloads and parses the daily fixing."""
+        body = await asyncio.to_thread(self._download)
+        return parse_cnb_rates(body)
+
+    def _download(self) -> str:
+        with urllib_request.urlopen(self.url, timeout=self.timeout) as response:
+            return response.read().decode("utf-8")
+
+
+def parse_cnb_rates(body: str) -> dict[str, float]:
+    """Parses the CNB ``daily.txt`` format into CZK per one unit of currency.
+
+    The first two lines are the date and the column header, every other line
+    is ``Country|Currency|Amount|Code|Rate``.
+    """
+    wanted = {currency.value for currency in Currency if currency != Currency.CZK}
+    rates = {}
+    for line in body.splitlines()[2:]:
+        parts = line.split("|")
+        if len(parts) != 5 or parts[3].lower() not in wanted:
+            continue
+        amount = float(parts[2])
+        if amount <= 0:
+            raise ValueError(f"Invalid amount of {parts[3]}: {parts[2]}")
+        rates[parts[3].lower()] = float(parts[4].replace(",", ".")) / amount
+    return rates
+
+
+def get_rate_provider() -> RateProvider:
+    """Returns the provider configured by ``RATES_PROVIDER``."""
+    match settings.RATES_PROVIDER:
+        case "file":
+            return FileRateProvider(settings.RATES_FILE_PATH)
+        case "cnb":
+            return CnbRateProvider(settings.RATES_CNB_URL, settings.RATES_FETCH_TIMEOUT)
+        case _:
+            return StaticRateProvider()
@@ -1,17 +1,39 @@
-from fastapi import APIRouter, Depends, status
-from fastapi.responses import JSONResponse
+from typing import AsyncIterator
 
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from redis.asyncio import Redis
+
+from database import get_redis
 from database.models import Room, RoomUser
-from schemas import GameResponse, RoomResponse, RoomUserResponse
+from schemas import (
+    BulkModerationResponse,
+    GameResponse,
+    RoomResponse,
+    RoomUserResponse,
+    RoomUserStatsResponse,
+    UserStatsResponse,
+)
 from dependencies.dependencies import (
     approve_user,
+    bulk_moderate_users,
     create_room_dependency,
     get_game_history,
+    get_game_history_export,
     fetch_actions_from_redis,
     get_all_rooms,
+    get_room_stats,
     get_room_users,
+    get_user_stats,
     join_room_dependency,
 )
+from dependencies.enums import ExportFormat
+from dependencies.http_cache import (
+    ConditionalResponse,
+    history_etag,
+    room_users_etag,
+    rooms_etag,
+)
 
 
 router = APIRouter()
@@ -24,16 +46,54 @@ async def get_actions(room_id: str):
     return actions
 
 
-@router.get("/rooms/{room_id}/history")
-async def get_history(game_history: list[GameResponse] = Depends(get_game_history)):
+@router.get("/rooms/{room_id}/history", response_model=list[GameResponse])
+async def get_history(
+    conditional: ConditionalResponse = Depends(history_etag),
+    game_history: list[GameResponse] = Depends(get_game_history),
+    redis: Redis = Depends(get_redis),
+) -> Response:
     """Gets list of all games played for a room."""
-    return game_history
+    return await conditional.render(game_history, redis)
 
 
-@router.get("/rooms")
-async def get_rooms(rooms: list[RoomResponse] = Depends(get_all_rooms)):
+@router.get("/rooms/{room_id}/export")
+async def export_history(
+    room_id: str,
+    export_format: ExportFormat = Query(ExportFormat.CSV, alias="format"),
+    chunks: AsyncIterator[str] = Depends(get_game_history_export),
+):
+    """Streams all prices of the games played in a room as CSV or NDJSON."""
+    return StreamingResponse(
+        chunks,
+        media_type=export_format.media_type,
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{room_id}.{export_format.value}"'
+            )
+        },
+    )
+
+
+@router.get("/rooms/{room_id}/stats", response_model=list[RoomUserStatsResponse])
+async def get_stats(stats: list[RoomUserStatsResponse] = Depends(get_room_stats)):
+    """Gets the leaderboard of a room."""
+    return stats
+
+
+@router.get("/users/{user_id}/stats", response_model=UserStatsResponse)
+async def get_user_statistics(stats: UserStatsResponse = Depends(get_user_stats)):
+    """Gets games played, losses and total paid of a user across rooms."""
+    return stats
+
+
+@router.get("/rooms", response_model=list[RoomResponse])
+async def get_rooms(
+    conditional: ConditionalResponse = Depends(rooms_etag),
+    rooms: list[RoomResponse] = Depends(get_all_rooms),
+    redis: Redis = Depends(get_redis),
+) -> Response:
     """Gets the list of all rooms"""
-    return rooms
+    return await conditional.render(rooms, redis)
 
 
 @router.post("/rooms")
@@ -53,12 +113,26 @@ async def join_room(
 
 
 @router.get("/rooms/{room_id}/users", response_model=list[RoomUserResponse])
-async def get_users(users: list[RoomUserResponse] = Depends(get_room_users)):
+async def get_users(
+    conditional: ConditionalResponse = Depends(room_users_etag),
+    users: list[RoomUserResponse] = Depends(get_room_users),
+    redis: Redis = Depends(get_redis),
+) -> Response:
     """Gets the list of all users for a room"""
-    return users
+    return await conditional.render(users, redis)
 
 
 @router.post("/rooms/{room_id}/users/moderate")
 async def approve_users(_: RoomUser = Depends(approve_user)):
     """Approve/Reject user from joining a room"""
     return JSONResponse(content=None, status_code=status.HTTP_201_CREATED)
+
+
+@router.post(
+    "/rooms/{room_id}/users/moderate/bulk", response_model=BulkModerationResponse
+)
+async def bulk_moderate(
+    moderation: BulkModerationResponse = Depends(bulk_moderate_users),
+):
+    """Approve/Reject many pending users of a room at once"""
+    return moderation
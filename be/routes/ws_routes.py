@@ -4,6 +4,8 @@ from dependencies.dependencies import create_user
 
 from websocket import socket_manager
 from websocket.helpers import RoomEventHandler
+from websocket.keepalive import keepalive
+from websocket.limits import RoomEventGate
 
 router = APIRouter()
 
@@ -12,26 +14,43 @@ router = APIRouter()
 async def websocket_rooms(websocket: WebSocket, user_id: str):
     """Websocket that servers all newly created rooms."""
     channel = "rooms"
+    user_channel = f"user:{user_id}"
+    if socket_manager.draining:
+        await socket_manager.refuse(websocket)
+        return
     await socket_manager.create_channel(channel, websocket)
+    await socket_manager.join_channel(user_channel, websocket)
+    keepalive.watch(websocket)
 
     await create_user(user_id)
 
     try:
         while True:
-            _ = await websocket.receive_text()
+            data = await websocket.receive_text()
+            keepalive.received(websocket, data)
     except WebSocketDisconnect:
+        keepalive.forget(websocket)
         await socket_manager.remove_user(channel, websocket)
+        await socket_manager.remove_user(user_channel, websocket)
 
 
 @router.websocket("/ws/room/{room_id}/{user_id}")
 async def websocket_room(websocket: WebSocket, room_id: str, user_id: str):
     """Websocket that servers actions in a room."""
+    if socket_manager.draining:
+        await socket_manager.refuse(websocket)
+        return
     handler = RoomEventHandler(websocket, room_id, user_id)
+    gate = RoomEventGate(handler)
     await handler.handle_user_join_room()
+    keepalive.watch(websocket)
 
     try:
         while True:
             data = await websocket.receive_text()
-            await handler.handle_event(data)
+            if keepalive.received(websocket, data):
+                continue
+            await gate.submit(data)
     except WebSocketDisconnect:
+        keepalive.forget(websocket)
         await handler.handle_user_leave_room()
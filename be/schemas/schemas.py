@@ -1,8 +1,8 @@
 from typing import Optional
 from pydantic import BaseModel, Field
 
-from database.models import Game, GamePrice
-from dependencies.enums import Currency
+from database.models import Game, GamePrice, RoomUserStats
+from dependencies.enums import AdminApprovalStatus, Currency
 
 # pylint: disable=missing-class-docstring, too-few-public-methods
 
@@ -20,10 +20,12 @@ class GamePriceResponse(BaseModel):
         """Create an instance from a GamePrice SQLAlchemy model instance."""
         return cls(
             user_id=price.user_id,
-            price=price.price,
+            price=float(price.price),
             currency=price.currency,
-            conversion_rate=price.conversion_rate,
-            price_in_czk=price.price_in_czk,
+            conversion_rate=(
+                float(price.conversion_rate) if price.conversion_rate else None
+            ),
+            price_in_czk=float(price.price_in_czk),
             created_at=price.created_at.isoformat(),
         )
 
@@ -43,7 +45,7 @@ class GameResponse(BaseModel):
             id=game.id,
             room_id=game.room_id,
             loser=game.loser,
-            price=game.price,
+            price=float(game.price),
             created_at=game.created_at.isoformat(),
             prices=[
                 GamePriceResponse.from_game_price_obj(price) for price in game.prices
@@ -70,3 +72,53 @@ class RoomUserResponse(BaseModel):
     is_admin: bool
     status: str
     created_at: str
+
+
+class ModerationDecision(BaseModel):
+    user_id: str
+    status: AdminApprovalStatus
+
+
+class BulkModerationRequest(BaseModel):
+    decisions: list[ModerationDecision] = Field(min_length=1, max_length=500)
+
+
+class BulkModerationResponse(BaseModel):
+    approved: list[str]
+    rejected: list[str]
+    skipped: list[str]
+
+
+class RoomUserStatsResponse(BaseModel):
+    room_id: str
+    user_id: str
+    games_played: int
+    losses: int
+    total_paid_czk: float
+    current_loss_streak: int
+    longest_loss_streak: int
+    last_played_at: Optional[str]
+
+    @classmethod
+    def from_stats_obj(cls, stats: RoomUserStats) -> "RoomUserStatsResponse":
+        """Create an instance from a RoomUserStats SQLAlchemy model instance."""
+        return cls(
+            room_id=stats.room_id,
+            user_id=stats.user_id,
+            games_played=stats.games_played,
+            losses=stats.losses,
+            total_paid_czk=float(stats.total_paid_czk),
+            current_loss_streak=stats.current_loss_streak,
+            longest_loss_streak=stats.longest_loss_streak,
+            last_played_at=(
+                stats.last_played_at.isoformat() if stats.last_played_at else None
+            ),
+        )
+
+
+class UserStatsResponse(BaseModel):
+    user_id: str
+    games_played: int
+    losses: int
+    total_paid_czk: float
+    rooms: list[RoomUserStatsResponse]
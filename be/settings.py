@@ -11,5 +11,130 @@ class Settings(BaseSettings):
     DB_USERNAME: str
     DB_PASSWORD: str
 
+    # Default level for all application loggers.
+    LOG_LEVEL: str = "INFO"
+    # Per-subsystem overrides, e.g. {"dependencies": "WARNING", "events": "DEBUG"}.
+    LOG_LEVELS: dict[str, str] = {}
+    # Maximum number of per-event log lines per second, 0 disables the limit.
+    LOG_EVENTS_RATE_LIMIT: float = 0
+    # Fraction of per-event log lines that are emitted.
+    LOG_EVENTS_SAMPLE_RATE: float = 1.0
+    # Hand log records to a background thread instead of writing them inline.
+    LOG_QUEUE_ENABLED: bool = True
+
+    # Expose /metrics and record request latencies.
+    METRICS_ENABLED: bool = True
+
+    # Record spans for requests and WebSocket events.
+    TRACING_ENABLED: bool = False
+    # Fraction of traces exported regardless of their duration.
+    TRACING_SAMPLE_RATE: float = 0.01
+    # Traces slower than this are always exported.
+    TRACING_SLOW_THRESHOLD_MS: float = 500
+    # Either "json" (append to TRACING_JSON_PATH) or "otlp" (OTLP/HTTP JSON).
+    TRACING_EXPORTER: str = "json"
+    TRACING_JSON_PATH: str = "traces.ndjson"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_SERVICE_NAME: str = "lunch-bet-be"
+
+    # Partition games and game_prices by month, converting existing tables.
+    DB_PARTITIONING_ENABLED: bool = False
+    PARTITIONS_AHEAD_MONTHS: int = 3
+    # Archive partitions older than this many months, 0 disables archival.
+    ARCHIVE_AFTER_MONTHS: int = 0
+    # Either "schema" (detach into the archive schema) or "parquet" (needs pyarrow).
+    ARCHIVE_TARGET: str = "schema"
+    ARCHIVE_DIR: str = "archive"
+    # With partitioning, history without a from_date covers this many days.
+    HISTORY_DEFAULT_DAYS: int = 90
+
+    # SQLAlchemy URLs of read replicas used by read-only endpoints.
+    DB_REPLICA_URLS: list[str] = []
+    # Replicas lagging more than this are skipped until they catch up.
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DB_REPLICA_CHECK_INTERVAL_SECONDS: float = 5.0
+    # Reads of a user or room go to the primary this long after writing it.
+    DB_READ_YOUR_WRITES_SECONDS: int = 10
+
+    # "redis" shares caches, action logs and Pub/Sub between workers, "memory"
+    # keeps them in the process and only suits a single worker.
+    STORAGE_BACKEND: str = "redis"
+    REDIS_HOST: str = "localhost"
+    REDIS_PORT: int = 6379
+    # The in-memory backend evicts the least recently used keys beyond this.
+    MEMORY_BACKEND_MAX_KEYS: int = 100_000
+
+    # Room action logs expire this long after their last action.
+    REDIS_ACTIONS_TTL_SECONDS: int = 24 * 3600
+    # Action logs keep at most this many most recent entries.
+    REDIS_ACTIONS_MAX_LENGTH: int = 1000
+    REDIS_CACHE_TTL_SECONDS: int = 300
+    # How often keys written without an expiry are swept, 0 disables sweeping.
+    REDIS_SWEEP_INTERVAL_SECONDS: int = 600
+    # Smaller JSON bodies of conditional GETs are sent uncompressed.
+    HTTP_COMPRESS_MIN_BYTES: int = 512
+
+    # Room actions are also copied to the room_actions table in batches of
+    # this size, or at least this often.
+    ACTIONS_WRITE_BEHIND_ENABLED: bool = True
+    ACTIONS_WRITE_BATCH_SIZE: int = 500
+    ACTIONS_WRITE_INTERVAL_SECONDS: float = 1.0
+    # The oldest actions are dropped once this many wait for Postgres.
+    ACTIONS_WRITE_BUFFER_SIZE: int = 50_000
+    # Logging an action into a full buffer waits this long for a batch written.
+    ACTIONS_WRITE_BACKPRESSURE_SECONDS: float = 0.5
+    # Upper bound of the backoff between writes while Postgres fails.
+    ACTIONS_WRITE_RETRY_MAX_SECONDS: float = 30.0
+
+    # Work after an evaluation runs as jobs kept in the jobs table until they
+    # succeed, on this many workers per process.
+    JOBS_WORKERS: int = 4
+    JOBS_QUEUE_SIZE: int = 1000
+    # How often the table is checked for jobs to retry or left by dead workers.
+    JOBS_POLL_INTERVAL_SECONDS: float = 5.0
+    # Jobs claimed by a worker are not run elsewhere for this long.
+    JOBS_LEASE_SECONDS: float = 60.0
+    JOBS_MAX_ATTEMPTS: int = 10
+    JOBS_RETRY_MAX_SECONDS: float = 300.0
+    # Queued jobs are given this long to finish on shutdown.
+    JOBS_SHUTDOWN_TIMEOUT_SECONDS: float = 10.0
+
+    # Source of exchange rates, one of "static", "file" or "cnb".
+    RATES_PROVIDER: str = "static"
+    RATES_FILE_PATH: str = "rates.json"
+    RATES_CNB_URL: str = (
+        "https://www.cnb.cz/en/financial-markets/foreign-exchange-market/"
+        "central-bank-exchange-rate-fixing/central-bank-exchange-rate-fixing/daily.txt"
+    )
+    RATES_FETCH_TIMEOUT: float = 5.0
+    # Rates older than this are refreshed in the background on the next read.
+    RATES_TTL_SECONDS: int = 6 * 3600
+    RATES_REFRESH_SECONDS: int = 3600
+    # How long the rates captured at game start are kept for its evaluation.
+    RATES_PIN_SECONDS: int = 24 * 3600
+
+    # Randomness deciding games, one of "system", "seeded" or "commit_reveal".
+    RANDOM_SOURCE: str = "system"
+    RANDOM_SEED: int = 0
+
+    # Token buckets of room WebSocket events, per socket and per room.
+    WS_CONNECTION_EVENTS_PER_SECOND: float = 5.0
+    WS_CONNECTION_EVENTS_BURST: int = 20
+    WS_ROOM_EVENTS_PER_SECOND: float = 50.0
+    WS_ROOM_EVENTS_BURST: int = 200
+    # Events per room and second across workers counted in Redis, 0 disables it.
+    WS_GLOBAL_ROOM_EVENTS_PER_SECOND: int = 0
+    # Sockets silent for this long are pinged, 0 disables the keepalive.
+    WS_PING_INTERVAL_SECONDS: float = 30.0
+    # Pinged sockets sending nothing for this long are closed.
+    WS_PING_TIMEOUT_SECONDS: float = 10.0
+    # Games of a room sent in the snapshot frame when a socket joins it.
+    WS_SNAPSHOT_GAMES: int = 5
+    # On shutdown sockets are handed over for at most this long, 0 cuts them.
+    WS_DRAIN_TIMEOUT_SECONDS: float = 10.0
+    # Drained clients are told to reconnect after a random delay in this range.
+    WS_RECONNECT_MIN_MS: int = 500
+    WS_RECONNECT_MAX_MS: int = 5000
+
 
 settings = Settings()  # type: ignore
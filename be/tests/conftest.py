@@ -0,0 +1,7 @@
+import os
+
+# Settings need database credentials even where no database is used.
+os.environ.setdefault("DB_USERNAME", "postgres")
+os.environ.setdefault("DB_PASSWORD", "postgres")
+# Redis commands are served by the in-process backend.
+os.environ.setdefault("STORAGE_BACKEND", "memory")
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+
+import pytest
+
+from dependencies.action_writer import ActionWriter
+from settings import settings
+
+
+def action(index: int) -> dict:
+    """Returns an action log as log_action_to_redis builds it."""
+    return {
+        "user_id": "user",
+        "action": "set_bet",
+        "message": str(index),
+        "timestamp": "2026-01-01T00:00:00+00:00",
+    }
+
+
+@pytest.fixture(name="writer")
+def fixture_writer(monkeypatch: pytest.MonkeyPatch) -> ActionWriter:
+    """Returns a started writer with room for two actions."""
+    monkeypatch.setattr(settings, "ACTIONS_WRITE_BUFFER_SIZE", 2)
+    monkeypatch.setattr(settings, "ACTIONS_WRITE_BACKPRESSURE_SECONDS", 0.5)
+    writer = ActionWriter()
+    # Only marks the writer as started, no background writes run.
+    writer.task = object()  # type: ignore
+    return writer
+
+
+def test_full_buffer_waits_for_a_written_batch(writer: ActionWriter) -> None:
+    """An action logged into a full buffer is kept once a batch frees space."""
+
+    async def write_batch() -> None:
+        await asyncio.sleep(0.01)
+        writer.buffer.clear()
+        writer.space.set()
+
+    async def scenario() -> None:
+        for index in range(2):
+            await writer.submit("room", action(index))
+        await asyncio.gather(writer.submit("room", action(2)), write_batch())
+
+    asyncio.run(scenario())
+
+    assert [item["message"] for item in writer.buffer] == ["2"]
+    assert writer.dropped == 0
+
+
+def test_failing_writes_drop_the_oldest_at_once(
+    writer: ActionWriter, caplog: pytest.LogCaptureFixture
+) -> None:
+    """While Postgres is down nothing waits and the drop is logged once."""
+    writer.failing = True
+
+    async def scenario() -> None:
+        for index in range(4):
+            await asyncio.wait_for(writer.submit("room", action(index)), 0.1)
+
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(scenario())
+
+    assert [item["message"] for item in writer.buffer] == ["2", "3"]
+    assert writer.dropped == 2
+    assert len(caplog.records) == 1
@@ -0,0 +1,130 @@
+import json
+from typing import Any, Optional
+import uuid
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+
+from database import get_lazy_session
+from database.engine import LazySession
+from database.models import Room, RoomUser
+from exceptions.exception_route_handlers import error_handlers
+from routes.routes import router
+
+
+class FakeResult:
+    """Result of any query, the room membership or one JSON array."""
+
+    def __init__(self, room_user: RoomUser, body: str) -> None:
+        self.room_user = room_user
+        self.body = body
+
+    def scalar_one_or_none(self) -> RoomUser:
+        """Returns the room membership."""
+        return self.room_user
+
+    def scalar_one(self) -> str:
+        """Returns the JSON array."""
+        return self.body
+
+
+class FakeSession:
+    """Session answering the queries of the room users and history endpoints."""
+
+    def __init__(self, room_id: str, user_id: str, body: str) -> None:
+        self.room = Room(id=room_id, name="room", created_by=user_id)
+        self.room_user = RoomUser(room_id=room_id, user_id=user_id, is_admin=True)
+        self.body = body
+
+    async def get(self, _: Any, __: str) -> Room:
+        """Returns the room."""
+        return self.room
+
+    async def execute(self, _: Any) -> FakeResult:
+        """Returns the canned result."""
+        return FakeResult(self.room_user, self.body)
+
+    async def close(self) -> None:
+        """Nothing to release."""
+
+
+class Sessions:  # pylint: disable=R0903
+    """Counts the sessions the endpoints open, each would check out a connection."""
+
+    def __init__(self) -> None:
+        self.opened = 0
+        self.session: Optional[FakeSession] = None
+
+    async def open(self) -> FakeSession:
+        """Hands out the fake session."""
+        self.opened += 1
+        assert self.session is not None
+        return self.session
+
+
+@pytest.fixture(name="sessions")
+def fixture_sessions() -> Sessions:
+    """Sessions of the endpoints, opened through the primary lazy session."""
+    return Sessions()
+
+
+@pytest.fixture(name="client")
+def fixture_client(sessions: Sessions):
+    """Client of an app serving the REST routes."""
+    app = FastAPI()
+    for handler in error_handlers:
+        app.add_exception_handler(*handler)  # type: ignore
+    app.include_router(router)
+
+    async def lazy_session():
+        yield LazySession(sessions.open)
+
+    app.dependency_overrides[get_lazy_session] = lazy_session
+    with TestClient(app) as client:
+        yield client
+
+
+def test_warm_room_users_cache_opens_no_session(
+    client: TestClient, sessions: Sessions
+) -> None:
+    """The second read of the users of a room is answered from Redis."""
+    room_id, user_id = str(uuid.uuid4()), str(uuid.uuid4())
+    users = [
+        {
+            "user_id": user_id,
+            "is_admin": True,
+            "status": "APPROVED",
+            "created_at": "2024-01-01T00:00:00+00:00",
+        }
+    ]
+    sessions.session = FakeSession(room_id, user_id, json.dumps(users))
+    path, params = f"/rooms/{room_id}/users", {"user_id": user_id}
+
+    first = client.get(path, params=params)
+    assert first.status_code == 200
+    assert first.json() == users
+    assert sessions.opened == 1
+
+    # Without If-None-Match the body is built again, but from the cache.
+    second = client.get(path, params=params)
+    assert second.status_code == 200
+    assert second.json() == users
+    assert sessions.opened == 1
+
+
+def test_conditional_history_read_opens_no_session(
+    client: TestClient, sessions: Sessions
+) -> None:
+    """A history read holding the current ETag is answered before any query."""
+    room_id, user_id = str(uuid.uuid4()), str(uuid.uuid4())
+    sessions.session = FakeSession(room_id, user_id, "[]")
+    path = f"/rooms/{room_id}/history"
+
+    first = client.get(path)
+    assert first.status_code == 200
+    assert sessions.opened == 1
+
+    second = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
+    assert sessions.opened == 1
@@ -0,0 +1,71 @@
+import asyncio
+import gzip
+from typing import Any
+
+from fastapi.responses import Response
+import pytest
+
+from database.memory import MemoryRedis
+from dependencies import http_cache
+from dependencies.http_cache import ConditionalResponse
+from settings import settings
+
+
+@pytest.fixture(name="encoded")
+def fixture_encoded(monkeypatch: pytest.MonkeyPatch) -> list[Any]:
+    """Records the contents serialized by render."""
+    encoded: list[Any] = []
+    encoder = http_cache.jsonable_encoder
+
+    def counting(content: Any) -> Any:
+        encoded.append(content)
+        return encoder(content)
+
+    monkeypatch.setattr(http_cache, "jsonable_encoder", counting)
+    return encoded
+
+
+def render(
+    conditional: ConditionalResponse, content: Any, redis: MemoryRedis
+) -> Response:
+    """Renders the content synchronously."""
+    return asyncio.run(conditional.render(content, redis))  # type: ignore
+
+
+def test_cached_body_is_not_serialized_again(encoded: list[Any]) -> None:
+    """A second render of the same tag is served from Redis as it was."""
+    redis = MemoryRedis(100)
+    conditional = ConditionalResponse("room:1:body:tag", "history", "tag", "gzip")
+    content = [{"price": "x" * settings.HTTP_COMPRESS_MIN_BYTES}]
+
+    first = render(conditional, content, redis)
+    second = render(conditional, content, redis)
+
+    assert len(encoded) == 1
+    assert second.body == first.body
+    assert second.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(second.body).startswith(b'[{"price":"xxx')
+
+
+def test_small_cached_body_stays_uncompressed(encoded: list[Any]) -> None:
+    """Bodies below the threshold are cached without Content-Encoding."""
+    redis = MemoryRedis(100)
+    conditional = ConditionalResponse("room:1:body:tag", "history", "tag", "gzip")
+
+    render(conditional, [], redis)
+    second = render(conditional, [], redis)
+
+    assert len(encoded) == 1
+    assert second.body == b"[]"
+    assert "content-encoding" not in second.headers
+
+
+def test_identity_body_is_not_cached(encoded: list[Any]) -> None:
+    """Clients without compression get the JSON without a Redis round trip."""
+    redis = MemoryRedis(100)
+    conditional = ConditionalResponse("room:1:body:tag", "history", "tag", "identity")
+
+    render(conditional, [], redis)
+
+    assert len(encoded) == 1
+    assert asyncio.run(redis.exists("room:1:body:tag")) == 0
@@ -0,0 +1,63 @@
+import logging
+
+import pytest
+
+from observability import logs
+from observability.logs import RateLimitFilter
+
+
+class FakeClock:  # pylint: disable=too-few-public-methods
+    """Monotonic clock moved by hand."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(name="clock")
+def fixture_clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    """Replaces the clock of the rate limit filter."""
+    clock = FakeClock()
+    monkeypatch.setattr(logs.time, "monotonic", clock)
+    return clock
+
+
+def make_record(level: int = logging.INFO) -> logging.LogRecord:
+    """Returns a record of the events logger."""
+    return logging.LogRecord("uvicorn.error.events", level, "", 0, "event", (), None)
+
+
+def test_rate_limit_passes_records_up_to_the_rate(clock: FakeClock) -> None:
+    """Two records per second pass, the third within the second is dropped."""
+    log_filter = RateLimitFilter(2)
+
+    assert [log_filter.filter(make_record()) for _ in range(3)] == [True, True, False]
+    clock.now += 1
+    assert log_filter.filter(make_record())
+
+
+def test_fractional_rate_lets_a_record_through_every_interval(
+    clock: FakeClock,
+) -> None:
+    """With half a record per second one record passes every two seconds."""
+    log_filter = RateLimitFilter(0.5)
+
+    assert log_filter.filter(make_record())
+    assert not log_filter.filter(make_record())
+    clock.now += 1
+    assert not log_filter.filter(make_record())
+    clock.now += 1
+    record = make_record()
+    assert log_filter.filter(record)
+    assert record.getMessage() == "event (2 similar messages suppressed)"
+
+
+@pytest.mark.usefixtures("clock")
+def test_warnings_are_never_rate_limited() -> None:
+    """Warnings pass even when the bucket is empty."""
+    log_filter = RateLimitFilter(0.5)
+    log_filter.filter(make_record())
+
+    assert log_filter.filter(make_record(logging.WARNING))
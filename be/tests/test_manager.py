@@ -0,0 +1,23 @@
+import asyncio
+
+from websocket.manager import RedisPubSubManager, unpack_pubsub_message
+
+
+def test_publish_many_delivers_one_message_per_channel() -> None:
+    """Every channel gets the message, channels not listed get nothing."""
+
+    async def scenario() -> list[tuple[bytes, bytes]]:
+        client = RedisPubSubManager()
+        await client.connect()
+        await client.subscribe("room:1")
+        await client.subscribe("user:a")
+        await client.subscribe("user:b")
+        await client.publish_many(["room:1", "user:a"], "event")
+        received = []
+        while message := await client.pubsub.get_message(timeout=0.01):
+            _, payload = unpack_pubsub_message(message["data"])
+            received.append((message["channel"], payload))
+        await client.close()
+        return received
+
+    assert asyncio.run(scenario()) == [(b"room:1", b"event"), (b"user:a", b"event")]
@@ -0,0 +1,76 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from rates.cache import FALLBACK_SNAPSHOT, RateCache
+from rates.providers import (
+    FileRateProvider,
+    RateProvider,
+    parse_cnb_rates,
+    validate_rates,
+)
+
+CNB_HEADER = "19.10.2026 #201\nzemě|měna|množství|kód|kurz\n"
+
+
+class FixedProvider(RateProvider):  # pylint: disable=R0903
+    """Provider returning whatever it was given."""
+
+    name = "fixed"
+
+    def __init__(self, data: Any) -> None:
+        self.data = data
+
+    async def fetch(self) -> Any:
+        """Returns the data."""
+        return self.data
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        [25.1, 23.4],
+        {"eur": None, "usd": 23.4},
+        {"eur": "25.1", "usd": 23.4},
+        {"eur": 0, "usd": 23.4},
+        {"eur": float("nan"), "usd": 23.4},
+        {"eur": 25.1},
+    ],
+)
+def test_malformed_rates_are_rejected_with_value_error(data: Any) -> None:
+    """Anything but positive rates of every currency is a ValueError."""
+    with pytest.raises(ValueError):
+        validate_rates(data)
+
+
+def test_rates_are_keyed_by_lowercase_code() -> None:
+    """Codes are lowercased and integer rates become floats."""
+    assert validate_rates({"EUR": 25, "usd": 23.4}) == {"eur": 25.0, "usd": 23.4}
+
+
+def test_cnb_amount_of_zero_is_a_value_error() -> None:
+    """A zero amount does not divide by zero."""
+    body = CNB_HEADER + "EMU|euro|0|EUR|25,100\nUSA|dolar|1|USD|23,400\n"
+    with pytest.raises(ValueError):
+        parse_cnb_rates(body)
+
+
+def test_malformed_rates_file_keeps_the_current_rates(tmp_path: Path) -> None:
+    """A refresh from a malformed file serves the fallback instead of raising."""
+    path = tmp_path / "rates.json"
+    path.write_text(json.dumps([25.1, 23.4]), encoding="utf-8")
+    cache = RateCache()
+    cache.provider = FileRateProvider(str(path))
+
+    assert asyncio.run(cache.refresh()) == FALLBACK_SNAPSHOT
+
+
+def test_valid_rates_replace_the_snapshot() -> None:
+    """Rates of a working provider are served after a refresh."""
+    cache = RateCache()
+    cache.provider = FixedProvider({"eur": 25.1, "usd": 23.4})
+
+    assert asyncio.run(cache.refresh()).rates == {"eur": 25.1, "usd": 23.4}
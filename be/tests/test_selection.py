@@ -0,0 +1,99 @@
+from collections import Counter
+import math
+import random
+
+import pytest
+
+from websocket.helpers import GameEvaluator
+from websocket.models import Bet
+from websocket.randomness import CommitRevealRandomSource, SeededRandomSource
+from websocket.state import GameStateError
+
+select_loser = GameEvaluator.calculate_furthest_from_number
+
+
+def generate_bets(rng: random.Random, bets: int, users: int) -> list[Bet]:
+    """Returns bets of a room where most users bet several times."""
+    return [
+        Bet(bet=rng.randint(1, 10000), user_id=f"user-{rng.randrange(users)}")
+        for _ in range(bets)
+    ]
+
+
+def test_only_the_latest_bet_of_a_user_counts() -> None:
+    """An earlier bet far from the number does not make its user lose."""
+    bets = [
+        Bet(bet=1, user_id="a"),
+        Bet(bet=4000, user_id="b"),
+        Bet(bet=5000, user_id="a"),
+    ]
+
+    assert select_loser(bets, 5000, random.Random(0)).user_id == "b"
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_loser_is_a_latest_bet_furthest_from_the_number(seed: int) -> None:
+    """The loser is the latest bet of its user and no latest bet is further."""
+    rng = random.Random(seed)
+    bets = generate_bets(rng, 500, 50)
+    number = rng.randint(1, 10000)
+
+    looser = select_loser(bets, number, rng)
+
+    latest_bets = {bet.user_id: bet for bet in bets}
+    assert latest_bets[looser.user_id] is looser
+    assert abs(looser.bet - number) == max(
+        abs(bet.bet - number) for bet in latest_bets.values()
+    )
+
+
+def test_ties_are_broken_uniformly() -> None:
+    """Tied users lose equally often, within five standard deviations."""
+    users, trials = 5, 20_000
+    bets = [Bet(bet=1, user_id=f"user-{index}") for index in range(users)]
+    rng = random.Random(42)
+
+    counts = Counter(select_loser(bets, 10000, rng).user_id for _ in range(trials))
+
+    expected = trials / users
+    deviation = math.sqrt(trials * (1 / users) * (1 - 1 / users))
+    assert set(counts) == {bet.user_id for bet in bets}
+    assert all(abs(count - expected) <= 5 * deviation for count in counts.values())
+
+
+def test_tie_pick_does_not_depend_on_the_order_of_bets() -> None:
+    """A verifier replays the pick from the sorted user ids of the tied bets."""
+    bets = [Bet(bet=1, user_id=user_id) for user_id in ("c", "a", "d", "b")]
+    source = CommitRevealRandomSource()
+    seed = source.new_seed()
+    assert seed is not None
+
+    losers = set()
+    for _ in range(10):
+        random.shuffle(bets)
+        losers.add(select_loser(bets, 10000, source.generator(seed)).user_id)
+
+    verifier = random.Random(int(seed, 16))
+    assert losers == {["a", "b", "c", "d"][verifier.randrange(4)]}
+
+
+def test_seeded_source_is_reproducible() -> None:
+    """Two sources with the same seed draw the same numbers and losers."""
+    bets = generate_bets(random.Random(1), 200, 20)
+    runs = []
+    for _ in range(2):
+        generator = SeededRandomSource(7).generator(None)
+        runs.append(
+            [
+                select_loser(bets, generator.randint(1, 10000), generator).user_id
+                for _ in range(50)
+            ]
+        )
+
+    assert runs[0] == runs[1]
+
+
+def test_a_room_without_bets_cannot_be_evaluated() -> None:
+    """Evaluating without bets is rejected."""
+    with pytest.raises(GameStateError):
+        select_loser([], 5000, random.Random(0))
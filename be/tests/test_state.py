@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+import pytest
+
+from dependencies.enums import Currency, GamePhase
+from websocket import state as state_module
+from websocket.state import GameState, GameStateError
+
+
+def snapshot(fields: dict[str, str]) -> dict[bytes, bytes]:
+    """Encodes hash fields as Redis returns them."""
+    return {key.encode(): value.encode() for key, value in fields.items()}
+
+
+def betting_state() -> tuple[GameState, dict[str, str]]:
+    """Returns a game with one price and bet and the hash fields it wrote."""
+    state = GameState("room")
+    fields = state.start()
+    fields.update(state.set_price("user", "10", Currency.CZK))
+    fields.update(state.set_bet("user", 5))
+    return state, fields
+
+
+def test_taken_over_evaluation_keeps_the_game_id(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A stale evaluation returns to betting and is evaluated as the same game."""
+    state, fields = betting_state()
+    fields.update(state.begin_evaluation())
+    monkeypatch.setattr(state_module.time, "time", lambda: float("inf"))
+
+    taken_over = GameState.from_snapshot("room", snapshot(fields))
+    retry = taken_over.begin_evaluation()
+
+    assert taken_over.phase == GamePhase.EVALUATING
+    assert retry["game_id"] == fields["game_id"]
+
+
+def test_new_game_gets_a_new_id() -> None:
+    """Finishing a game drops its id, the next evaluation draws another one."""
+    state, _ = betting_state()
+    first = state.begin_evaluation()["game_id"]
+    state.finish_evaluation()
+    state.start()
+    state.set_price("user", "10", Currency.CZK)
+    state.set_bet("user", 5)
+
+    assert state.begin_evaluation()["game_id"] != first
+
+
+def test_price_too_high_in_czk_is_rejected() -> None:
+    """A price that fits as given but not converted to CZK is refused."""
+    state = GameState("room")
+    state.start()
+
+    with pytest.raises(GameStateError, match="too high"):
+        state.set_price("user", "9999999999", Currency.EUR, Decimal("25.1"))
+    fields = state.set_price("user", "9999999999", Currency.CZK)
+
+    assert fields["price:user"] == "9999999999|czk"
@@ -0,0 +1,71 @@
+import asyncio
+import signal
+import threading
+from typing import Optional
+
+from observability import get_logger
+from settings import settings
+from websocket.manager import socket_manager
+
+logger = get_logger("websocket")
+
+
+async def drain() -> None:
+    """Hands the sockets of this worker over to other workers before it exits.
+
+    New sockets are refused, frames held back by the rate limits are handled,
+    messages published so far are delivered and every socket is told when to
+    reconnect. Whatever is left after ``WS_DRAIN_TIMEOUT_SECONDS`` is cut.
+    """
+    if socket_manager.draining:
+        return
+    socket_manager.draining = True
+    if settings.WS_DRAIN_TIMEOUT_SECONDS > 0:
+        try:
+            await asyncio.wait_for(_hand_over(), settings.WS_DRAIN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Draining sockets took longer than %ss",
+                settings.WS_DRAIN_TIMEOUT_SECONDS,
+            )
+    await socket_manager.close()
+
+
+async def _hand_over() -> None:
+    await socket_manager.flush()
+    await socket_manager.hand_over()
+
+
+def drain_on_signal() -> None:
+    """Drains the sockets when SIGTERM arrives, before the server stops.
+
+    Uvicorn closes all sockets before the lifespan shutdown runs, so its
+    handler is only called once the sockets were handed over.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    stop_server = signal.getsignal(signal.SIGTERM)
+    if not callable(stop_server):
+        return
+    loop = asyncio.get_running_loop()
+    task: Optional[asyncio.Task] = None
+
+    async def drain_and_stop(signum, frame) -> None:
+        try:
+            await drain()
+        finally:
+            stop_server(signum, frame)
+
+    def start_drain(signum, frame) -> None:
+        nonlocal task
+        task = loop.create_task(drain_and_stop(signum, frame))
+
+    def handle_sigterm(signum, frame) -> None:
+        # A second SIGTERM stops the server without waiting for the drain.
+        if task is not None or socket_manager.draining:
+            stop_server(signum, frame)
+            return
+        logger.info("Draining sockets before shutdown")
+        loop.call_soon_threadsafe(start_drain, signum, frame)
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
@@ -1,22 +1,53 @@
 import asyncio
+from datetime import datetime, timezone
+from decimal import Decimal
 import json
 import logging
 import random
+import time
+from typing import Optional
 from fastapi import WebSocket
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
+from dependencies.cache import CacheKeyGenerator, invalidate_cache
 from dependencies.dependencies import (
     create_user,
-    fetch_actions_from_redis,
     log_action_to_redis,
     remove_actions_from_redis,
 )
 from dependencies.enums import Currency, RoomEventTypes
+from dependencies.http_cache import VersionKeyGenerator, bump_versions
+from dependencies.jobs import job_queue
+from database import get_redis, replica_router
 from database.models import Game
+from observability import get_logger, tracer
+from observability.metrics import (
+    evaluation_duration,
+    ws_event_duration,
+    ws_events,
+    ws_events_rejected,
+)
+from rates import rate_cache
 from websocket import socket_manager
-from websocket.models import Bet, ConvertedPrice, Price
+from websocket.models import (
+    MAX_CZK_AMOUNT,
+    Bet,
+    ConvertedPrice,
+    GameRecord,
+    Price,
+    to_czk_amount,
+)
+from websocket.limits import event_limiter
+from websocket.randomness import random_source
+from websocket.snapshot import build_room_snapshot
+from websocket.state import MAX_BET, MIN_BET, GameState, GameStateError, game_states
 
-logger = logging.getLogger("uvicorn.error")
+logger = get_logger("websocket")
+event_logger = get_logger("events")
+
+PERSIST_GAME_JOB = "persist_game"
+GAMES_WRITTEN_JOB = "games_written"
 
 
 class RoomEventMessageGenerator:
@@ -53,7 +84,7 @@ class RoomEventMessageGenerator:
         return f"User {user_id} set bet."
 
     @staticmethod
-    def generate_result_message(user_id: str, amount: float) -> str:
+    def generate_result_message(user_id: str, amount: Decimal) -> str:
         """Generates result message."""
         return f"User {user_id} lost and has to pay {amount} CZK."
 
@@ -69,25 +100,54 @@ class RoomEventHandler:
 
     async def handle_event(self, data: str) -> None:
         """Handle incoming event."""
-        input_data = await self._parse_input_data(data)
-        event_type = RoomEventTypes.get_event_type_from_string(input_data["type"])
-        user_id = input_data["user_id"]
-        logger.info("Handling event: %s for user: %s", event_type, user_id)
+        with tracer.start_trace("ws.event", room_id=self.room_id) as span:
+            await self._handle_event(data, span)
+
+    async def _handle_event(self, data: str, span) -> None:
+        """Handle incoming event within a trace."""
+        start = time.perf_counter()
+        try:
+            input_data = await self._parse_input_data(data)
+            event_type = RoomEventTypes.get_event_type_from_string(input_data["type"])
+        except ValueError as exc:
+            await self.send_error(RoomEventTypes.ERROR, str(exc))
+            return
+        except KeyError as exc:
+            await self.send_error(RoomEventTypes.ERROR, f"Missing field: {exc}")
+            return
+        user_id = input_data.get("user_id", self.user_id)
+        event_logger.info("Handling event: %s for user: %s", event_type, user_id)
+        ws_events.labels(event_type.value).inc()
+        span.update_name(f"ws.event {event_type.value}")
 
         addition: dict = {}
-        message = await self._process_event(event_type, input_data, user_id, addition)
+        try:
+            message = await self._process_event(
+                event_type, input_data, user_id, addition
+            )
+        except GameStateError as exc:
+            await self.send_error(event_type, exc.detail)
+            return
+        except KeyError as exc:
+            await self.send_error(event_type, f"Missing field: {exc}")
+            return
 
         if event_type == RoomEventTypes.EVALUATE:
             event_type = RoomEventTypes.RESULT
 
         await self._broadcast_message(event_type, user_id, message, addition)
+        ws_event_duration.labels(event_type.value).observe(time.perf_counter() - start)
 
     async def handle_user_join_room(self) -> None:
         """Handle user join event."""
         logger.info("User %s joining room %s", self.user_id, self.room_id)
         await socket_manager.create_channel(self.channel, self.websocket)
 
-        await create_user(self.user_id)
+        # Sent after subscribing, so no event falls between the two.
+        _, snapshot = await asyncio.gather(
+            create_user(self.user_id), build_room_snapshot(self.room_id, self.user_id)
+        )
+        await self.websocket.send_text(snapshot)
 
         message = RoomEventMessageGenerator.generate_join_message(self.user_id)
 
@@ -97,6 +157,11 @@ class RoomEventHandler:
         """Handle user leave room event."""
         logger.info("User %s leaving room %s", self.user_id, self.room_id)
         await socket_manager.remove_user(self.channel, self.websocket)
+        if self.channel not in socket_manager.channels:
+            event_limiter.forget(self.room_id)
+        # The user comes back through another worker, so this is no leave.
+        if socket_manager.draining:
+            return
 
         message = RoomEventMessageGenerator.generate_leave_message(self.user_id)
 
@@ -106,7 +171,7 @@ class RoomEventHandler:
         """Parse incoming event data from JSON."""
         try:
             input_data = json.loads(data)
-            logger.debug("Parsed input data: %s", input_data)
+            event_logger.debug("Parsed input data: %s", input_data)
             return input_data
         except json.JSONDecodeError as e:
             logger.error("Invalid input format: %s", e)
@@ -118,7 +183,7 @@ class RoomEventHandler:
         """Process the specific event based on its type."""
         match event_type:
             case RoomEventTypes.GAME_START:
-                return await self._handle_game_start(user_id)
+                return await self._handle_game_start(user_id, addition)
             case RoomEventTypes.GAME_END:
                 return await self._handle_game_end(user_id)
             case RoomEventTypes.SET_PRICE:
@@ -126,23 +191,34 @@ class RoomEventHandler:
             case RoomEventTypes.SET_BET:
                 return await self._handle_set_bet(input_data, user_id)
             case RoomEventTypes.EVALUATE:
-                return await self._handle_evaluate()
+                return await self._handle_evaluate(addition)
             case _:
                 logger.error("Event type %s is not implemented.", event_type)
-                raise NotImplementedError(
-                    f"Event type {event_type} is not implemented."
+                raise GameStateError(
+                    f"Event type {event_type.value} is not implemented."
                 )
 
-    async def _handle_game_start(self, user_id: str) -> str:
+    async def _handle_game_start(self, user_id: str, addition: dict) -> str:
         """Handle game start event."""
+        state = await game_states.apply(
+            self.room_id,
+            lambda state: state.start(random_source.new_seed()),
+            replace=True,
+        )
+        commitment = random_source.commitment(state.seed)
+        if commitment is not None:
+            addition["commitment"] = commitment
         message = RoomEventMessageGenerator.generate_game_start_message(user_id)
-        logger.info("Game started by user: %s", user_id)
+        await rate_cache.pin(self.room_id)
+        event_logger.debug("Game started by user: %s", user_id)
         return message
 
     async def _handle_game_end(self, user_id: str) -> str:
         """Handle game end event."""
+        await game_states.apply(self.room_id, GameState.end, replace=True)
+        await rate_cache.unpin(self.room_id)
         message = RoomEventMessageGenerator.generate_game_end_message(user_id)
-        logger.info("Game ended by user: %s", user_id)
+        event_logger.debug("Game ended by user: %s", user_id)
         return message
 
     async def _handle_set_price(
@@ -150,52 +226,98 @@ class RoomEventHandler:
     ) -> str:
         """Handle setting the price event."""
         price = input_data["price"]
-        currency = Currency.get_currency_type_from_string(input_data["currency"])
+        try:
+            currency = Currency.get_currency_type_from_string(input_data["currency"])
+        except ValueError as exc:
+            raise GameStateError(str(exc)) from exc
+        rate = None
+        if currency != Currency.CZK:
+            # The price is checked at the rates the game is evaluated with.
+            snapshot = await rate_cache.for_room(self.room_id)
+            rate = Decimal(str(snapshot.rates[currency.value]))
+        await game_states.apply(
+            self.room_id,
+            lambda state: state.set_price(user_id, price, currency, rate),
+        )
         message = RoomEventMessageGenerator.generate_set_price_message(
             user_id, price, currency
         )
         addition.update({"price": price, "currency": currency.value})
-        logger.info("Price set by user %s: %s %s", user_id, price, currency)
+        event_logger.debug("Price set by user %s: %s %s", user_id, price, currency)
         return message
 
     async def _handle_set_bet(self, input_data: dict, user_id: str) -> str:
         """Handle setting the bet event."""
+        bet = input_data["bet"]
+        # The bet is kept only in the game state so it is not visible to others.
+        await game_states.apply(self.room_id, lambda state: state.set_bet(user_id, bet))
         message = RoomEventMessageGenerator.generate_set_bet_message(user_id)
-        logger.info("Bet set by user: %s", user_id)
-
-        # Log action again so the bet is not visible to other users.
-        await log_action_to_redis(
-            room_id=self.room_id,
-            user_id=user_id,
-            message=message,
-            action_type=RoomEventTypes.BET,
-            addition={"bet": input_data["bet"]},
-        )
+        event_logger.debug("Bet set by user: %s", user_id)
         return message
 
-    async def _handle_evaluate(self) -> str:
+    async def _handle_evaluate(self, addition: dict) -> str:
         """Handle game evaluation."""
-        evaluator = GameEvaluator(self.room_id)
-        looser, converted_prices = await evaluator.evaluate()
-        total_in_czk = await ConvertedPrice.calculate_totals(converted_prices)
+        start = time.perf_counter()
+        # The state read here holds the slots filled through every worker.
+        state = await game_states.apply(self.room_id, GameState.begin_evaluation)
+        try:
+            evaluator = GameEvaluator(self.room_id, state)
+            with tracer.span("game.evaluate"):
+                looser, converted_prices, total_in_czk = await evaluator.evaluate()
+
+            # Only the job is stored before the result goes out, the game, its
+            # prices and the stats are written by a worker.
+            with tracer.span("game.enqueue"):
+                await job_queue.enqueue(
+                    PERSIST_GAME_JOB,
+                    GameRecord(
+                        game_id=state.game_id,
+                        room_id=self.room_id,
+                        loser_id=looser.user_id,
+                        prices=converted_prices,
+                        total_in_czk=total_in_czk,
+                        created_at=datetime.now(tz=timezone.utc),
+                    ).model_dump(mode="json"),
+                )
+        except Exception:
+            await game_states.apply(self.room_id, GameState.abort_evaluation)
+            raise
         message = RoomEventMessageGenerator.generate_result_message(
             looser.user_id, total_in_czk
         )
-
-        await Game.create_game_with_prices(
-            room_id=self.room_id,
-            loser_id=looser.user_id,
-            converted_prices=converted_prices,
-            total_in_czk=total_in_czk,
+        addition["random_number"] = evaluator.random_number
+        if state.seed is not None:
+            addition["seed"] = state.seed
+
+        await asyncio.gather(
+            game_states.apply(self.room_id, GameState.finish_evaluation, replace=True),
+            remove_actions_from_redis(self.room_id),
+            rate_cache.unpin(self.room_id),
         )
-
-        await remove_actions_from_redis(self.room_id)
+        evaluation_duration.labels().observe(time.perf_counter() - start)
         logger.info(
             "Game evaluated. Looser: %s, Total in CZK: %s", looser.user_id, total_in_czk
         )
 
         return message
 
+    async def send_error(self, event_type, detail: str) -> None:
+        """Sends an error frame to the socket that sent a rejected event."""
+        event_logger.info(
+            "Rejected %s event in room %s: %s", event_type, self.room_id, detail
+        )
+        ws_events_rejected.labels(event_type.value).inc()
+        await self.websocket.send_text(
+            json.dumps(
+                {
+                    "type": RoomEventTypes.ERROR.value,
+                    "user_id": self.user_id,
+                    "message": detail,
+                    "event": event_type.value,
+                }
+            )
+        )
+
     async def _broadcast_message(
         self, event_type, user_id: str, message: str, addition: dict
     ) -> None:
@@ -221,62 +343,28 @@ class RoomEventHandler:
         )
 
 
-class DataFetcher:  # pylint: disable=R0903
-    """Class responsible for fetching data from Redis."""
-
-    def __init__(self, room_id: str):
-        self.room_id = room_id
-
-    async def fetch_bets_and_prices(self) -> tuple[list[Bet], list[Price]]:
-        """Fetches bets and prices from Redis actions."""
-        logger.info("Fetching bets and prices from Redis for room: %s", self.room_id)
-        redis_actions = await fetch_actions_from_redis(self.room_id, True)
-
-        bets: list[Bet] = []
-        prices: list[Price] = []
-
-        for action in redis_actions:
-            if action["action"] == "set_price":
-                prices.append(
-                    Price(
-                        price=action["price"],
-                        currency=action["currency"],
-                        user_id=action["user_id"],
-                    )
-                )
-                logger.debug("Added price action: %s", action)
-            elif action["action"] == "bet":
-                bets.append(Bet(bet=action["bet"], user_id=action["user_id"]))
-                logger.debug("Added bet action: %s", action)
-
-        logger.info("Fetched bets: %s, prices: %s", bets, prices)
-        return bets, prices
-
-
-class CurrencyConverter:
+class CurrencyConverter:  # pylint: disable=R0903
     """Class for converting and calculating total value in CZK."""
 
-    def __init__(self) -> None:
-        self.rates = self.fetch_current_exchange_rates()
-        logger.info("Initialized CurrencyConverter with exchange rates: %s", self.rates)
-
-    def fetch_current_exchange_rates(self) -> dict:
-        """Fetches the current exchange rates for USD and EUR to CZK."""
-        rates = {Currency.EUR.value: 23.10, Currency.USD.value: 25.35}
-        logger.info("Fetched current exchange rates: %s", rates)
-        return rates
+    def __init__(self, rates: dict[str, float]) -> None:
+        # Going through str keeps the rate as published instead of its binary
+        # float approximation.
+        self.rates = {currency: Decimal(str(rate)) for currency, rate in rates.items()}
+        logger.debug(
+            "Initialized CurrencyConverter with exchange rates: %s", self.rates
+        )
 
     def convert_to_czk(self, price: Price) -> ConvertedPrice:
         """Converts the given price into CZK."""
         logger.debug("Converting price: %s %s", price.price, price.currency)
 
         if price.currency == Currency.CZK.value:
-            price_in_czk = price.price
+            price_in_czk = to_czk_amount(price.price)
             conversion_rate = None
             logger.debug("Price is already in CZK: %s", price_in_czk)
         else:
             conversion_rate = self.rates[price.currency]
-            price_in_czk = price.price * conversion_rate
+            price_in_czk = to_czk_amount(price.price * conversion_rate)
             logger.debug(
                 "Converted price from %s to CZK using rate %s: %s",
                 price.price,
@@ -291,67 +379,136 @@ class CurrencyConverter:
             price_in_czk=price_in_czk,
             conversion_rate=conversion_rate,
         )
-        logger.info("Converted price object created: %s", converted_price)
         return converted_price
 
+    def convert_all(self, prices: list[Price]) -> tuple[list[ConvertedPrice], Decimal]:
+        """Converts all prices of a game in one pass and returns their total.
+
+        Rates and currencies are resolved once per currency instead of once per
+        price, and nothing is logged per price.
+        """
+        currencies = {currency.value: currency for currency in Currency}
+        rates: dict[str, Optional[Decimal]] = {Currency.CZK.value: None, **self.rates}
+        converted_prices = []
+        total = Decimal(0)
+        for price in prices:
+            rate = rates[price.currency]
+            price_in_czk = to_czk_amount(
+                price.price if rate is None else price.price * rate
+            )
+            total += price_in_czk
+            converted_prices.append(
+                ConvertedPrice(
+                    user_id=price.user_id,
+                    original_price=price.price,
+                    original_currency=currencies[price.currency],
+                    conversion_rate=rate,
+                    price_in_czk=price_in_czk,
+                )
+            )
+        logger.debug("Converted %d prices, total %s CZK", len(prices), total)
+        return converted_prices, total
+
 
 class GameEvaluator:
     """Class for game evaluation."""
 
-    def __init__(self, room_id: str) -> None:
+    def __init__(self, room_id: str, state: GameState) -> None:
         self.room_id = room_id
-        self.converter = CurrencyConverter()
-        self.data_fetcher = DataFetcher(room_id)
-        logger.info("Initialized GameEvaluator for room: %s", room_id)
+        self.state = state
+        self.random_number: Optional[int] = None
+        logger.debug("Initialized GameEvaluator for room: %s", room_id)
 
     async def evaluate(self):
-        """Evaluates the game state by fetching actions and
-        generating a random number."""
+        """Evaluates the game from the bet and price slots of its state and
+        a random number."""
         logger.info("Starting game evaluation for room: %s", self.room_id)
 
-        redis_actions, random_number = await asyncio.gather(
-            self.data_fetcher.fetch_bets_and_prices(), self.generate_random_number()
-        )
+        snapshot = await rate_cache.for_room(self.room_id)
+        converter = CurrencyConverter(snapshot.rates)
+        generator = random_source.generator(self.state.seed)
+        random_number = self.random_number = self.generate_random_number(generator)
 
-        bets, prices = redis_actions
-        logger.info("Random number generated: %d", random_number)
-        logger.info("Fetched bets: %s", bets)
-        logger.info("Fetched prices: %s", prices)
+        bets = list(self.state.bets.values())
+        prices = list(self.state.prices.values())
+        logger.debug("Random number generated: %d", random_number)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Fetched bets: %s", bets)
+            logger.debug("Fetched prices: %s", prices)
 
-        looser = self.calculate_furthest_from_number(bets, random_number)
-        logger.info("Looser determined: %s", looser)
+        looser = self.calculate_furthest_from_number(bets, random_number, generator)
+        logger.debug("Looser determined: %s", looser)
 
-        converted_prices = [self.converter.convert_to_czk(price) for price in prices]
-        logger.info("Converted Prices: %s", converted_prices)
+        converted_prices, total_in_czk = converter.convert_all(prices)
+        if total_in_czk > MAX_CZK_AMOUNT:
+            raise GameStateError("The total price is too high to be stored.")
 
-        return looser, converted_prices
+        return looser, converted_prices, total_in_czk
 
     @staticmethod
-    async def generate_random_number() -> int:
+    def generate_random_number(generator: random.Random) -> int:
         """Generates a random number between 1 and 10,000."""
-        random_number = random.randint(1, 10000)
+        random_number = generator.randint(MIN_BET, MAX_BET)
         logger.debug("Generated random number: %d", random_number)
         return random_number
 
     @staticmethod
-    def calculate_furthest_from_number(bets: list[Bet], random_number: int) -> Bet:
+    def calculate_furthest_from_number(
+        bets: list[Bet], random_number: int, generator: random.Random
+    ) -> Bet:
         """Calculates the user whose bet is furthest from the generated number.
-        If there is a tie, picks one randomly."""
-        logger.info("Calculating furthest bet from random number: %d", random_number)
-        furthest_bets = sorted(
-            bets, key=lambda bet: abs(bet.bet - random_number), reverse=True
-        )
 
-        max_distance = abs(furthest_bets[0].bet - random_number)
+        Only the last bet of each user counts. The bets are walked once without
+        sorting, and only tied bets are sorted by user id before one of them is
+        picked uniformly, so a verifier replays the pick without knowing the
+        order the bets came in.
+        """
+        logger.debug("Calculating furthest bet from random number: %d", random_number)
+        latest_bets = {bet.user_id: bet for bet in bets}
+        if not latest_bets:
+            raise GameStateError("Nothing to evaluate yet.")
+
+        max_distance = -1
+        tied: list[Bet] = []
+        for bet in latest_bets.values():
+            distance = abs(bet.bet - random_number)
+            if distance > max_distance:
+                max_distance, tied = distance, [bet]
+            elif distance == max_distance:
+                tied.append(bet)
+
+        looser = tied[0]
+        if len(tied) > 1:
+            tied.sort(key=lambda bet: bet.user_id)
+            looser = tied[generator.randrange(len(tied))]
+        logger.debug("Looser calculated: %s", looser)
+        return looser
+
+
+async def persist_game(session: AsyncSession, payload: dict) -> None:
+    """Stores an evaluated game and queues the refresh of its room."""
+    record = GameRecord.model_validate(payload)
+    with tracer.span("game.persist"):
+        if not await Game.create_game_with_prices(session, record):
+            return
+    await job_queue.enqueue(GAMES_WRITTEN_JOB, {"room_id": record.room_id}, session)
 
-        furthest_candidates = [
-            bet for bet in furthest_bets if abs(bet.bet - random_number) == max_distance
-        ]
 
-        looser = (
-            random.choice(furthest_candidates)
-            if len(furthest_candidates) > 1
-            else furthest_candidates[0]
+async def mark_games_written(_: AsyncSession, payload: dict) -> None:
+    """Makes cached game histories of a room stale and tells its sockets."""
+    room_id = payload["room_id"]
+    async for redis in get_redis():
+        await replica_router.stick(redis, room_id=room_id)
+        await invalidate_cache(
+            CacheKeyGenerator.generate_recent_games_cache_key(room_id), redis
         )
-        logger.info("Looser calculated: %s", looser)
-        return looser
+        await bump_versions(
+            VersionKeyGenerator.generate_room_version_key(room_id), ["games"], redis
+        )
+    await socket_manager.broadcast(
+        f"room:{room_id}", json.dumps({"type": RoomEventTypes.HISTORY.value})
+    )
+
+
+job_queue.register(PERSIST_GAME_JOB, persist_game)
+job_queue.register(GAMES_WRITTEN_JOB, mark_games_written)
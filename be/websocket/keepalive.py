@@ -0,0 +1,197 @@
+import asyncio
+import json
+import math
+import time
+from typing import Generic, Hashable, Optional, TypeVar
+
+from fastapi import WebSocket
+
+from dependencies.enums import RoomEventTypes
+from observability import get_logger
+from observability.metrics import ws_pings, ws_reaped
+from settings import settings
+from websocket.manager import socket_manager
+
+logger = get_logger("websocket")
+
+TICK_SECONDS = 1.0
+WHEEL_SLOTS = 64
+# Close code the websockets library uses for keepalive timeouts.
+KEEPALIVE_TIMEOUT = 1011
+PING_FRAME = json.dumps({"type": RoomEventTypes.PING.value})
+
+KeyT = TypeVar("KeyT", bound=Hashable)
+
+
+class TimerWheel(Generic[KeyT]):
+    """Hashed timer wheel, scheduling and cancelling a deadline costs O(1).
+
+    Deadlines are rounded up to whole ticks. Deadlines further away than one
+    turn of the wheel wait in their slot for the remaining turns.
+    """
+
+    def __init__(self, slots: int) -> None:
+        self.slots: list[dict[KeyT, int]] = [{} for _ in range(slots)]
+        self.slot_of: dict[KeyT, int] = {}
+        self.position = 0
+
+    def schedule(self, key: KeyT, ticks: int) -> None:
+        """Expires a key after the given number of ticks, replacing its deadline."""
+        self.cancel(key)
+        ticks = max(ticks, 1)
+        slot = (self.position + ticks) % len(self.slots)
+        self.slots[slot][key] = (ticks - 1) // len(self.slots)
+        self.slot_of[key] = slot
+
+    def cancel(self, key: KeyT) -> None:
+        """Drops the deadline of a key, if it has one."""
+        slot = self.slot_of.pop(key, None)
+        if slot is not None:
+            del self.slots[slot][key]
+
+    def advance(self) -> list[KeyT]:
+        """Moves the wheel by one tick and returns the keys that expired."""
+        self.position = (self.position + 1) % len(self.slots)
+        slot = self.slots[self.position]
+        expired = [key for key, turns in slot.items() if turns == 0]
+        for key in expired:
+            del slot[key]
+            del self.slot_of[key]
+        for key in slot:
+            slot[key] -= 1
+        return expired
+
+    def __len__(self) -> int:
+        return len(self.slot_of)
+
+
+def is_pong(data: str) -> bool:
+    """Returns whether a frame answers a keepalive ping."""
+    if RoomEventTypes.PONG.value not in data:
+        return False
+    try:
+        return json.loads(data).get("type") == RoomEventTypes.PONG.value
+    except (ValueError, AttributeError):
+        return False
+
+
+class Keepalive:
+    """Pings silent sockets and closes the ones that stopped answering.
+
+    The deadlines of all sockets of the worker are kept in one timer wheel
+    turned by one task, instead of a sleeping task per socket. Any frame
+    received from a socket counts as a sign of life, so busy sockets are
+    never pinged.
+    """
+
+    def __init__(self) -> None:
+        self.wheel: TimerWheel[int] = TimerWheel(WHEEL_SLOTS)
+        self.sockets: dict[int, WebSocket] = {}
+        self.last_seen: dict[int, float] = {}
+        self.pinged_at: dict[int, float] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether sockets are pinged at all."""
+        return settings.WS_PING_INTERVAL_SECONDS > 0
+
+    def start(self) -> None:
+        """Starts turning the wheel."""
+        if self.enabled:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops turning the wheel."""
+        task, self.task = self.task, None
+        if task is None:
+            return
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    def watch(self, websocket: WebSocket) -> None:
+        """Starts watching an accepted socket."""
+        if not self.enabled:
+            return
+        key = id(websocket)
+        self.sockets[key] = websocket
+        self.last_seen[key] = time.monotonic()
+        self.wheel.schedule(key, _ticks(settings.WS_PING_INTERVAL_SECONDS))
+
+    def forget(self, websocket: WebSocket) -> None:
+        """Stops watching a socket."""
+        key = id(websocket)
+        self.sockets.pop(key, None)
+        self.last_seen.pop(key, None)
+        self.pinged_at.pop(key, None)
+        self.wheel.cancel(key)
+
+    def received(self, websocket: WebSocket, data: str) -> bool:
+        """Notes a frame from a socket, returns True when it only answered a ping."""
+        key = id(websocket)
+        if key in self.last_seen:
+            self.last_seen[key] = time.monotonic()
+        return is_pong(data)
+
+    async def _run(self) -> None:
+        next_tick = time.monotonic()
+        while True:
+            next_tick += TICK_SECONDS
+            await asyncio.sleep(max(next_tick - time.monotonic(), 0))
+            expired = self.wheel.advance()
+            if not expired:
+                continue
+            results = await asyncio.gather(
+                *(self._expire(key) for key in expired), return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error("Keepalive check failed: %s", result)
+
+    async def _expire(self, key: int) -> None:
+        websocket = self.sockets.get(key)
+        if websocket is None:
+            return
+        now = time.monotonic()
+        pinged_at = self.pinged_at.pop(key, None)
+        if pinged_at is not None and self.last_seen[key] < pinged_at:
+            await self._reap(websocket, "timeout")
+            return
+        silent = now - self.last_seen[key]
+        if silent < settings.WS_PING_INTERVAL_SECONDS:
+            self.wheel.schedule(key, _ticks(settings.WS_PING_INTERVAL_SECONDS - silent))
+            return
+
+        self.pinged_at[key] = now
+        self.wheel.schedule(key, _ticks(settings.WS_PING_TIMEOUT_SECONDS))
+        try:
+            await asyncio.wait_for(
+                websocket.send_text(PING_FRAME), settings.WS_PING_TIMEOUT_SECONDS
+            )
+        except (RuntimeError, OSError, asyncio.TimeoutError):
+            await self._reap(websocket, "send_failed")
+            return
+        ws_pings.labels().inc()
+
+    async def _reap(self, websocket: WebSocket, reason: str) -> None:
+        """Stops broadcasting to an unresponsive socket and closes it."""
+        if id(websocket) not in self.sockets:
+            return
+        logger.info("Closing unresponsive socket: %s", reason)
+        self.forget(websocket)
+        ws_reaped.labels(reason).inc()
+        await socket_manager.remove_socket(websocket)
+        try:
+            await asyncio.wait_for(
+                websocket.close(code=KEEPALIVE_TIMEOUT),
+                settings.WS_PING_TIMEOUT_SECONDS,
+            )
+        except (RuntimeError, OSError, asyncio.TimeoutError) as exc:
+            logger.debug("Closing an unresponsive socket failed: %s", exc)
+
+
+def _ticks(seconds: float) -> int:
+    return math.ceil(seconds / TICK_SECONDS)
+
+
+keepalive = Keepalive()
@@ -0,0 +1,111 @@
+import time
+from typing import TYPE_CHECKING
+
+from database import get_redis
+from dependencies.enums import RoomEventTypes
+from observability import RedisCommand
+from observability.metrics import ws_events_limited
+from settings import settings
+
+if TYPE_CHECKING:
+    from websocket.helpers import RoomEventHandler
+
+
+class TokenBucket:  # pylint: disable=R0903
+    """Allows ``burst`` events at once and ``rate`` events per second after."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        """Takes one token, returns False when the bucket is empty."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class EventLimiter:
+    """Per-room token buckets of this worker and optional limits across workers.
+
+    The global limit counts the events of a room per second in Redis, so it
+    costs a round trip per event and is off unless
+    ``WS_GLOBAL_ROOM_EVENTS_PER_SECOND`` is set.
+    """
+
+    def __init__(self) -> None:
+        self.rooms: dict[str, TokenBucket] = {}
+
+    def connection_bucket(self) -> TokenBucket:
+        """Returns a new bucket for one socket."""
+        return TokenBucket(
+            settings.WS_CONNECTION_EVENTS_PER_SECOND,
+            settings.WS_CONNECTION_EVENTS_BURST,
+        )
+
+    async def allow(self, room_id: str, connection: TokenBucket) -> bool:
+        """Returns whether an event of a socket in a room may be handled."""
+        if not connection.take():
+            ws_events_limited.labels("connection").inc()
+            return False
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = self.rooms[room_id] = TokenBucket(
+                settings.WS_ROOM_EVENTS_PER_SECOND, settings.WS_ROOM_EVENTS_BURST
+            )
+        if not room.take():
+            ws_events_limited.labels("room").inc()
+            return False
+        if (
+            settings.WS_GLOBAL_ROOM_EVENTS_PER_SECOND > 0
+            and not await self._allow_global(room_id)
+        ):
+            ws_events_limited.labels("global").inc()
+            return False
+        return True
+
+    def forget(self, room_id: str) -> None:
+        """Drops the bucket of a room without local sockets."""
+        self.rooms.pop(room_id, None)
+
+    @staticmethod
+    async def _allow_global(room_id: str) -> bool:
+        key = f"room:{room_id}:events:{int(time.time())}"
+        async for redis in get_redis():
+            pipeline = redis.pipeline(transaction=False)
+            pipeline.incr(key)
+            pipeline.expire(key, 2)
+            with RedisCommand("incr"):
+                count, _ = await pipeline.execute()
+        return count <= settings.WS_GLOBAL_ROOM_EVENTS_PER_SECOND
+
+
+class RoomEventGate:  # pylint: disable=R0903
+    """Rate limits the frames of one room socket before they are handled."""
+
+    def __init__(self, handler: "RoomEventHandler") -> None:
+        self.handler = handler
+        self.bucket = event_limiter.connection_bucket()
+        self.limited = False
+
+    async def submit(self, data: str) -> None:
+        """Takes one frame received from the socket."""
+        if not await event_limiter.allow(self.handler.room_id, self.bucket):
+            # Tell the client once instead of answering every dropped frame.
+            if not self.limited:
+                self.limited = True
+                await self.handler.send_error(
+                    RoomEventTypes.ERROR, "Too many events, slow down."
+                )
+            return
+        self.limited = False
+        await self.handler.handle_event(data)
+
+
+event_limiter = EventLimiter()
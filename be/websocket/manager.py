@@ -1,32 +1,85 @@
 import asyncio
-import logging
+import json
+import random
+import time
+from typing import Optional
+import uuid
 
-import redis.asyncio as redis
 from fastapi import WebSocket
 
-logger = logging.getLogger("uvicorn.error")
+from database import create_redis
+from dependencies.enums import RoomEventTypes
+from observability import RedisCommand, get_logger, tracer
+from observability.metrics import (
+    broadcast_fanout_duration,
+    pubsub_lag,
+    ws_channels,
+    ws_connections,
+    ws_drained,
+)
+from settings import settings
+
+logger = get_logger("websocket")
+
+# Close code telling clients the server restarts and they should reconnect.
+SERVICE_RESTART = 1012
+
+
+def pack_pubsub_message(message: str) -> str:
+    """Prefixes a pub/sub message with its publish time."""
+    return f"{time.time():.6f}|{message}"
+
+
+def unpack_pubsub_message(data: bytes) -> tuple[float | None, bytes]:
+    """Splits a pub/sub message into its publish time and payload.
+
+    Messages published without a timestamp are returned unchanged.
+    """
+    head, separator, payload = data.partition(b"|")
+    if separator and head[:1].isdigit():
+        return float(head), payload
+    return None, data
+
+
+def get_channel_kind(channel: str) -> str:
+    """Returns the kind of a channel used as a metrics label."""
+    return channel.split(":", 1)[0]
 
 
 class RedisPubSubManager:
     """Class for managing Redis Pub/Sub."""
 
-    def __init__(self, host="localhost", port=6379):
-        self.redis_host = host
-        self.redis_port = port
+    def __init__(self):
         self.redis_connection = None
         self.pubsub = None
 
     async def connect(self) -> None:
         """Connect and initialize Redis Pub/Sub."""
         logger.info("Connecting to Redis")
-        self.redis_connection = redis.Redis(host=self.redis_host, port=self.redis_port)
+        self.redis_connection = create_redis()
         logger.info("Initializing Pub/Sub")
         self.pubsub = self.redis_connection.pubsub()
 
     async def publish(self, channel: str, message: str) -> None:
         """Publishes a message to a specific Redis channel."""
-        logger.info("Publishing message - %s - to channel: %s", message, channel)
-        await self.redis_connection.publish(channel, message)
+        if self.redis_connection is None:
+            await self.connect()
+        assert self.redis_connection is not None
+        logger.debug("Publishing %d bytes to channel: %s", len(message), channel)
+        with RedisCommand("publish"):
+            await self.redis_connection.publish(channel, pack_pubsub_message(message))
+
+    async def publish_many(self, channels: list[str], message: str) -> None:
+        """Publishes one message to several channels in one round trip."""
+        if self.redis_connection is None:
+            await self.connect()
+        assert self.redis_connection is not None
+        packed = pack_pubsub_message(message)
+        pipeline = self.redis_connection.pipeline(transaction=False)
+        for channel in channels:
+            pipeline.publish(channel, packed)
+        with RedisCommand("publish"):
+            await pipeline.execute()
 
     async def subscribe(self, channel: str):
         """Subscribes to a Redis channel."""
@@ -35,9 +88,22 @@ class RedisPubSubManager:
 
     async def unsubscribe(self, channel: str) -> None:
         """Unsubscribes from a Redis channel."""
+        if self.pubsub is None:
+            return
         logger.info("Unsubscribing to channel: %s", channel)
         await self.pubsub.unsubscribe(channel)
 
+    async def close(self) -> None:
+        """Unsubscribes from all channels and closes the connections."""
+        if self.pubsub is not None:
+            logger.info("Closing Pub/Sub")
+            await self.pubsub.unsubscribe()
+            await self.pubsub.aclose()
+            self.pubsub = None
+        if self.redis_connection is not None:
+            await self.redis_connection.aclose()
+            self.redis_connection = None
+
 
 class WebSocketManager:
     """Class to manage WebSocket connections."""
@@ -45,11 +111,26 @@ class WebSocketManager:
     def __init__(self) -> None:
         self.channels: dict[str, list[WebSocket]] = {}
         self.pubsub_client = RedisPubSubManager()
+        self.reader: Optional[asyncio.Task] = None
+        # Concurrent first subscribes would each check out a connection.
+        self.subscribe_lock = asyncio.Lock()
+        # Set once the worker shuts down, new sockets are sent elsewhere.
+        self.draining = False
+        self.flushes: dict[bytes, asyncio.Event] = {}
 
     async def create_channel(self, channel: str, websocket: WebSocket) -> None:
-        """Creates a connection for a channel."""
-        logger.info("Connecting to channel: %s", channel)
+        """Accepts a socket and creates a connection for a channel."""
         await websocket.accept()
+        await self.join_channel(channel, websocket)
+
+    async def join_channel(self, channel: str, websocket: WebSocket) -> None:
+        """Adds an already accepted socket to a channel.
+
+        All channels share one Pub/Sub connection and one reader task, so a
+        socket can listen on several channels.
+        """
+        logger.info("Connecting to channel: %s", channel)
+        ws_connections.labels(get_channel_kind(channel)).inc()
 
         if channel in self.channels:
             logger.info("Channel already exists. Appending too existing one")
@@ -58,45 +139,153 @@ class WebSocketManager:
 
         logger.info("Channel does not exists. Creating new one.")
         self.channels[channel] = [websocket]
-        await self.pubsub_client.connect()
-        await self.pubsub_client.subscribe(channel)
-        asyncio.create_task(self._pubsub_data_reader())
+        ws_channels.labels().inc()
+        async with self.subscribe_lock:
+            if self.pubsub_client.pubsub is None:
+                await self.pubsub_client.connect()
+            await self.pubsub_client.subscribe(channel)
+        if self.reader is None or self.reader.done():
+            self.reader = asyncio.create_task(self._pubsub_data_reader())
 
     async def broadcast(self, channel: str, message: str) -> None:
         """Broadcasts a message to all connected sockets in a channel."""
         await self.pubsub_client.publish(channel, message)
 
+    async def broadcast_many(self, channels: list[str], message: str) -> None:
+        """Broadcasts one message to the sockets of several channels."""
+        await self.pubsub_client.publish_many(channels, message)
+
     async def remove_user(self, channel: str, websocket: WebSocket) -> None:
         """Removes a user's WebSocket connection from a channel."""
         logger.info("Removing user from channel: %s", channel)
         if channel in self.channels and websocket in self.channels[channel]:
             logger.info("Socket found, removing.")
             self.channels[channel].remove(websocket)
+            ws_connections.labels(get_channel_kind(channel)).dec()
 
             if not self.channels[channel]:
                 logger.info(
                     "Socket was last in channel, removing channel and unsubscribing."
                 )
                 del self.channels[channel]
+                ws_channels.labels().dec()
                 await self.pubsub_client.unsubscribe(channel)
 
+    async def remove_socket(self, websocket: WebSocket) -> None:
+        """Removes a socket from all channels it listens on."""
+        channels = [
+            channel
+            for channel, sockets in self.channels.items()
+            if websocket in sockets
+        ]
+        for channel in channels:
+            await self.remove_user(channel, websocket)
+
+    async def refuse(self, websocket: WebSocket) -> None:
+        """Sends a socket arriving at a draining worker to another worker."""
+        await websocket.accept()
+        await self._send_reconnect(websocket, "refused")
+
+    async def flush(self) -> None:
+        """Waits until the messages published so far were sent to local sockets.
+
+        A PING on the Pub/Sub connection is answered after every message Redis
+        queued for it before, so its PONG marks the end of the backlog.
+        """
+        if not self.channels or self.reader is None or self.reader.done():
+            return
+        token = uuid.uuid4().hex.encode()
+        flushed = self.flushes[token] = asyncio.Event()
+        try:
+            await self.pubsub_client.pubsub.ping(token)
+            await flushed.wait()
+        finally:
+            del self.flushes[token]
+
+    async def hand_over(self) -> None:
+        """Tells every local socket to reconnect and closes it."""
+        sockets = {
+            id(socket): socket
+            for channel_sockets in self.channels.values()
+            for socket in channel_sockets
+        }
+        logger.info("Handing over %d sockets", len(sockets))
+        await asyncio.gather(
+            *(self._send_reconnect(socket, "reconnect") for socket in sockets.values())
+        )
+
+    async def close(self) -> None:
+        """Stops the reader and closes the Pub/Sub connection."""
+        reader, self.reader = self.reader, None
+        if reader is not None:
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+        await self.pubsub_client.close()
+
+    @staticmethod
+    async def _send_reconnect(websocket: WebSocket, result: str) -> None:
+        """Sends a reconnect frame with a random delay and closes the socket.
+
+        The delays are spread so clients do not all reconnect at once.
+        """
+        after_ms = random.randint(
+            settings.WS_RECONNECT_MIN_MS, settings.WS_RECONNECT_MAX_MS
+        )
+        try:
+            await websocket.send_text(
+                json.dumps(
+                    {
+                        "type": RoomEventTypes.RECONNECT.value,
+                        "message": "Server is restarting, reconnecting.",
+                        "after_ms": after_ms,
+                    }
+                )
+            )
+            await websocket.close(code=SERVICE_RESTART)
+        except (RuntimeError, OSError) as exc:
+            ws_drained.labels("failed").inc()
+            logger.debug("Handing over a socket failed: %s", exc)
+            return
+        ws_drained.labels(result).inc()
+
     async def _pubsub_data_reader(self) -> None:
         """Reads and processes messages received from Redis Pub/Sub."""
         pubsub = self.pubsub_client.pubsub
         while True:
-            message = await pubsub.get_message(ignore_subscribe_messages=True)
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=None
+            )
             if not message:
                 continue
+            if message["type"] == "pong":
+                flushed = self.flushes.get(message["data"])
+                if flushed is not None:
+                    flushed.set()
+                continue
 
             channel = message["channel"].decode("utf-8")
             if channel not in self.channels:
                 continue
 
-            data = message["data"].decode("utf-8")
+            channel_kind = get_channel_kind(channel)
+            published_at, payload = unpack_pubsub_message(message["data"])
+            if published_at is not None:
+                pubsub_lag.labels(channel_kind).observe(time.time() - published_at)
+
+            data = payload.decode("utf-8")
+            start = time.perf_counter()
             all_sockets = self.channels[channel]
-            for socket in all_sockets:
-                await socket.send_text(data)
-            await asyncio.sleep(0.01)
+            with tracer.start_trace("pubsub.deliver", channel=channel_kind):
+                for socket in list(all_sockets):
+                    with tracer.span("ws.send"):
+                        try:
+                            await socket.send_text(data)
+                        except (RuntimeError, OSError) as exc:
+                            # The shared reader must outlive any closed socket.
+                            logger.warning("Sending to %s failed: %s", channel, exc)
+            broadcast_fanout_duration.labels(channel_kind).observe(
+                time.perf_counter() - start
+            )
 
 
 socket_manager = WebSocketManager()
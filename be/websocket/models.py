@@ -1,8 +1,21 @@
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 from typing import Optional
-from pydantic import BaseModel
+import uuid
+
+from pydantic import BaseModel, Field
 
 from dependencies.enums import Currency
 
+# Amounts are kept in CZK with two decimal places, matching the NUMERIC columns.
+CZK_QUANTUM = Decimal("0.01")
+MAX_CZK_AMOUNT = Decimal("9999999999.99")
+
+
+def to_czk_amount(value: Decimal) -> Decimal:
+    """Rounds an amount to whole hellers."""
+    return value.quantize(CZK_QUANTUM, rounding=ROUND_HALF_UP)
+
 
 class Bet(BaseModel):
     """Data class for bets from redis."""
@@ -14,7 +27,7 @@ class Bet(BaseModel):
 class Price(BaseModel):
     """Data class for prices from redis."""
 
-    price: float
+    price: Decimal
     currency: str
     user_id: str
 
@@ -23,12 +36,23 @@ class ConvertedPrice(BaseModel):
     """Data class for converted prices."""
 
     user_id: str
-    original_price: float
+    original_price: Decimal
     original_currency: Currency
-    conversion_rate: Optional[float] = None
-    price_in_czk: float
+    conversion_rate: Optional[Decimal] = None
+    price_in_czk: Decimal
 
     @staticmethod
-    async def calculate_totals(converted_prices: list["ConvertedPrice"]) -> float:
+    async def calculate_totals(converted_prices: list["ConvertedPrice"]) -> Decimal:
         """Calculates the total sum of all prices in CZK."""
-        return sum(price.price_in_czk for price in converted_prices)
+        return sum((price.price_in_czk for price in converted_prices), Decimal(0))
+
+
+class GameRecord(BaseModel):
+    """Data class for an evaluated game waiting to be stored."""
+
+    game_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    room_id: str
+    loser_id: str
+    prices: list[ConvertedPrice]
+    total_in_czk: Decimal
+    created_at: datetime
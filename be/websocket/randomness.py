@@ -0,0 +1,104 @@
+import hashlib
+import random
+import secrets
+from typing import Optional
+
+from settings import settings
+
+# pylint: disable=too-few-public-methods
+
+
+class RandomSource:
+    """Source of the randomness deciding the loser of a game.
+
+    A source may hand out a seed at game start. The seed is kept in the game
+    state and the generator of the evaluation is derived from it.
+    """
+
+    name = ""
+
+    def new_seed(self) -> Optional[str]:
+        """Returns the seed of a new game, if the source uses one."""
+        raise NotImplementedError
+
+    def commitment(self, seed: Optional[str]) -> Optional[str]:
+        """Returns the SHA-256 of the seed published at game start."""
+        if seed is None:
+            return None
+        return hashlib.sha256(seed.encode("utf-8")).hexdigest()
+
+    def generator(self, seed: Optional[str]) -> random.Random:
+        """Returns the generator used to evaluate a game."""
+        raise NotImplementedError
+
+
+class SystemRandomSource(RandomSource):
+    """Randomness of the operating system, the default."""
+
+    name = "system"
+
+    def __init__(self) -> None:
+        self.random = random.SystemRandom()
+
+    def new_seed(self) -> Optional[str]:
+        """System randomness has no seed."""
+        return None
+
+    def generator(self, seed: Optional[str]) -> random.Random:
+        """Returns the system generator."""
+        return self.random
+
+
+class SeededRandomSource(RandomSource):
+    """One generator seeded once, so a sequence of games is reproducible."""
+
+    name = "seeded"
+
+    def __init__(self, seed: int) -> None:
+        self.random = random.Random(seed)
+
+    def new_seed(self) -> Optional[str]:
+        """Games share the generator seeded at startup."""
+        return None
+
+    def generator(self, seed: Optional[str]) -> random.Random:
+        """Returns the seeded generator."""
+        return self.random
+
+
+class CommitRevealRandomSource(RandomSource):
+    """A secret seed per game whose SHA-256 is published at game start.
+
+    The seed is revealed with the result, so players can check it against the
+    commitment and replay the evaluation with ``random.Random(int(seed, 16))``:
+    its ``randint(1, 10000)`` is the drawn number and, when several players
+    are furthest from it, the following ``randrange`` indexes their user ids
+    in sorted order.
+    """
+
+    name = "commit_reveal"
+
+    def new_seed(self) -> Optional[str]:
+        """Returns a new secret seed."""
+        return secrets.token_hex(32)
+
+    def generator(self, seed: Optional[str]) -> random.Random:
+        """Returns a generator derived from the seed of the game."""
+        if seed is None:
+            # Games started before the source was switched have no seed.
+            return random.SystemRandom()
+        return random.Random(int(seed, 16))
+
+
+def get_random_source() -> RandomSource:
+    """Returns the source configured by ``RANDOM_SOURCE``."""
+    match settings.RANDOM_SOURCE:
+        case "seeded":
+            return SeededRandomSource(settings.RANDOM_SEED)
+        case "commit_reveal":
+            return CommitRevealRandomSource()
+        case _:
+            return SystemRandomSource()
+
+
+random_source = get_random_source()
@@ -0,0 +1,152 @@
+import json
+import time
+from typing import Optional
+
+from redis.asyncio import Redis
+from sqlalchemy import select
+
+from database import get_redis, get_session
+from dependencies.cache import CacheKeyGenerator
+from dependencies.dependencies import find_cached_room_users, parse_actions
+from dependencies.enums import RoomEventTypes, UserType
+from dependencies.projections import (
+    ROOM_USERS_ADAPTER,
+    build_game_history_query,
+    build_room_users_query,
+    default_history_start,
+)
+from exceptions.custom_exceptions import UserNotInARoomError
+from observability import RedisCommand
+from observability.metrics import cache_requests, ws_snapshot_duration
+from schemas import RoomUserResponse
+from settings import settings
+from websocket.state import GameState, game_states
+
+
+def describe_game(state: GameState) -> dict:
+    """Returns the public part of a game state, bets stay hidden."""
+    return {
+        "phase": state.phase.value,
+        "prices": [
+            {
+                "user_id": price.user_id,
+                "price": str(price.price),
+                "currency": price.currency,
+            }
+            for price in state.prices.values()
+        ],
+        "bets": list(state.bets),
+    }
+
+
+def visible_members(
+    user_id: str, cached_users: dict[UserType, Optional[str]]
+) -> Optional[list[RoomUserResponse]]:
+    """Returns the members of a room the way the user may see them.
+
+    Users who are not approved members get an empty list, as ``/users`` would
+    refuse them. None means the cache can not tell.
+    """
+    try:
+        return find_cached_room_users(user_id, cached_users)
+    except UserNotInARoomError:
+        return []
+
+
+async def read_cached(
+    redis: Redis, room_id: str
+) -> tuple[list[bytes], dict[str, Optional[str]], GameState]:
+    """Reads the actions, cached lists and game state of a room in one round trip."""
+    keys = [
+        CacheKeyGenerator.generate_room_user_cache_key(room_id, UserType.ADMIN),
+        CacheKeyGenerator.generate_room_user_cache_key(room_id, UserType.NON_ADMIN),
+        CacheKeyGenerator.generate_recent_games_cache_key(room_id),
+    ]
+    pipeline = redis.pipeline(transaction=False)
+    pipeline.lrange(f"room:{room_id}:actions", 0, -1)
+    pipeline.mget(keys)
+    pipeline.hgetall(game_states.key(room_id))
+    with RedisCommand("pipeline"):
+        actions, values, fields = await pipeline.execute()
+
+    cached = {}
+    for key, value in zip(keys, values):
+        kind = CacheKeyGenerator.get_key_kind(key)
+        cache_requests.labels(kind, "hit" if value else "miss").inc()
+        cached[key] = value.decode("utf-8") if value else None
+    return actions, cached, GameState.from_snapshot(room_id, fields)
+
+
+async def query_missing(
+    redis: Redis, room_id: str, users_key: Optional[str], games_key: Optional[str]
+) -> list[str]:
+    """Reads the users and the last games of a room with one query and caches them.
+
+    Only the lists whose cache keys are given are read, in that order.
+    """
+    columns = []
+    if users_key is not None:
+        columns.append(build_room_users_query(room_id, False).scalar_subquery())
+    if games_key is not None:
+        columns.append(
+            build_game_history_query(
+                room_id, default_history_start(), None, settings.WS_SNAPSHOT_GAMES
+            ).scalar_subquery()
+        )
+    async for session in get_session():
+        values = list((await session.execute(select(*columns))).one())
+
+    pipeline = redis.pipeline(transaction=False)
+    for key, value in zip((k for k in (users_key, games_key) if k), values):
+        pipeline.set(key, value, ex=settings.REDIS_CACHE_TTL_SECONDS)
+    with RedisCommand("set"):
+        await pipeline.execute()
+    return values
+
+
+async def build_room_snapshot(room_id: str, user_id: str) -> str:
+    """Builds the snapshot frame sent to a socket joining a room.
+
+    The game phase, the public actions, the members and the last
+    ``WS_SNAPSHOT_GAMES`` games are read with one pipelined Redis round trip.
+    Members and games missing from the cache are read with one query.
+    """
+    start = time.perf_counter()
+    admin_key = CacheKeyGenerator.generate_room_user_cache_key(room_id, UserType.ADMIN)
+    non_admin_key = CacheKeyGenerator.generate_room_user_cache_key(
+        room_id, UserType.NON_ADMIN
+    )
+    games_key = CacheKeyGenerator.generate_recent_games_cache_key(room_id)
+
+    async for redis in get_redis():
+        actions, cached, state = await read_cached(redis, room_id)
+        members = visible_members(
+            user_id,
+            {
+                UserType.ADMIN: cached[admin_key],
+                UserType.NON_ADMIN: cached[non_admin_key],
+            },
+        )
+        games = cached[games_key]
+        if members is None or games is None:
+            values = await query_missing(
+                redis,
+                room_id,
+                admin_key if members is None else None,
+                games_key if games is None else None,
+            )
+            if members is None:
+                # The list for admins holds every user, so it serves anybody.
+                members = visible_members(user_id, {UserType.ADMIN: values.pop(0)})
+            if games is None:
+                games = values.pop(0)
+
+    frame = (
+        f'{{"type":{json.dumps(RoomEventTypes.SNAPSHOT.value)},'
+        f'"game":{json.dumps(describe_game(state))},'
+        f'"actions":{json.dumps(parse_actions(actions))},'
+        f'"members":{ROOM_USERS_ADAPTER.dump_json(members or []).decode("utf-8")},'
+        f'"games":{games}}}'
+    )
+    ws_snapshot_duration.labels().observe(time.perf_counter() - start)
+    return frame
@@ -0,0 +1,250 @@
+from decimal import Decimal, InvalidOperation
+import time
+from typing import Callable, Optional
+import uuid
+
+from redis.exceptions import WatchError
+
+from database import get_redis
+from dependencies.enums import Currency, GamePhase
+from observability import RedisCommand, get_logger
+from settings import settings
+from websocket.models import MAX_CZK_AMOUNT, Bet, Price, to_czk_amount
+
+logger = get_logger("events")
+
+MIN_BET = 1
+MAX_BET = 10000
+# An evaluation not finished by then is taken over by the next evaluate.
+EVALUATION_TIMEOUT_SECONDS = 60
+# Transitions retried this often when other workers keep changing the room.
+MAX_TRANSITION_ATTEMPTS = 20
+
+
+class GameStateError(ValueError):
+    """Raised when an event is not valid in the current phase of a game."""
+
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class GameState:
+    """Phase and per-user price and bet slots of the game played in a room.
+
+    Every transition is validated and applied synchronously and returns the
+    hash fields it changed, which the store writes only when nobody changed
+    the hash since it was read.
+    """
+
+    def __init__(
+        self, room_id: str, phase: GamePhase = GamePhase.IDLE, version: int = 0
+    ) -> None:
+        self.room_id = room_id
+        self.phase = phase
+        self.version = version
+        self.prices: dict[str, Price] = {}
+        self.bets: dict[str, Bet] = {}
+        self.seed: Optional[str] = None
+        self.game_id = ""
+
+    @classmethod
+    def from_snapshot(cls, room_id: str, fields: dict[bytes, bytes]) -> "GameState":
+        """Restores the state from the fields of its Redis hash."""
+        snapshot = {
+            key.decode("utf-8"): value.decode("utf-8") for key, value in fields.items()
+        }
+        state = cls(
+            room_id,
+            GamePhase(snapshot.get("phase", GamePhase.IDLE.value)),
+            int(snapshot.get("version", 0)),
+        )
+        state.seed = snapshot.get("seed")
+        state.game_id = snapshot.get("game_id", "")
+        for key, value in snapshot.items():
+            kind, _, user_id = key.partition(":")
+            if kind == "price":
+                price, _, currency = value.partition("|")
+                state.prices[user_id] = Price(
+                    price=Decimal(price), currency=currency, user_id=user_id
+                )
+            elif kind == "bet":
+                state.bets[user_id] = Bet(bet=int(value), user_id=user_id)
+        # A worker that died while evaluating leaves the bets and the game id
+        # in place, so the game it may have queued is stored only once.
+        if (
+            state.phase == GamePhase.EVALUATING
+            and float(snapshot.get("evaluating_until", 0)) < time.time()
+        ):
+            state.phase = GamePhase.BETTING
+        return state
+
+    def start(self, seed: Optional[str] = None) -> dict[str, str]:
+        """Starts a new game, with the seed of its random source if it has one."""
+        self._expect(GamePhase.IDLE, "A game is already running.")
+        self.prices.clear()
+        self.bets.clear()
+        self.seed = seed
+        fields = self._move(GamePhase.COLLECTING_PRICES)
+        if seed is not None:
+            fields["seed"] = seed
+        return fields
+
+    def end(self) -> dict[str, str]:
+        """Ends the running game without evaluating it."""
+        if self.phase == GamePhase.IDLE:
+            raise GameStateError("No game is running.")
+        self._expect_not_evaluating()
+        return self.reset()
+
+    def set_price(
+        self,
+        user_id: str,
+        price: str,
+        currency: Currency,
+        rate: Optional[Decimal] = None,
+    ) -> dict[str, str]:
+        """Fills the price slot of a user.
+
+        ``rate`` converts the currency to CZK, the price has to fit the
+        columns both as it was given and converted.
+        """
+        self._expect(GamePhase.COLLECTING_PRICES, "Prices can not be set now.")
+        if user_id in self.prices:
+            raise GameStateError("Price is already set.")
+        try:
+            amount = Decimal(str(price))
+        except InvalidOperation as exc:
+            raise GameStateError(f"Invalid price: {price}") from exc
+        if not amount.is_finite() or amount <= 0:
+            raise GameStateError(f"Invalid price: {price}")
+        if amount != to_czk_amount(amount):
+            raise GameStateError("Price can have at most two decimal places.")
+        in_czk = amount if rate is None else to_czk_amount(amount * rate)
+        if max(amount, in_czk) > MAX_CZK_AMOUNT:
+            raise GameStateError(f"Price is too high: {price}")
+        self.prices[user_id] = Price(
+            price=amount, currency=currency.value, user_id=user_id
+        )
+        return {
+            **self._move(self.phase),
+            f"price:{user_id}": f"{amount}|{currency.value}",
+        }
+
+    def set_bet(self, user_id: str, bet: int) -> dict[str, str]:
+        """Fills the bet slot of a user, the first bet closes the prices."""
+        if self.phase not in (GamePhase.COLLECTING_PRICES, GamePhase.BETTING):
+            raise GameStateError("Bets can not be set now.")
+        if user_id not in self.prices:
+            raise GameStateError("Price has to be set before betting.")
+        if user_id in self.bets:
+            raise GameStateError("Bet is already set.")
+        if (
+            isinstance(bet, bool)
+            or not isinstance(bet, int)
+            or not MIN_BET <= bet <= MAX_BET
+        ):
+            raise GameStateError(f"Bet has to be between {MIN_BET} and {MAX_BET}.")
+        self.bets[user_id] = Bet(bet=bet, user_id=user_id)
+        return {**self._move(GamePhase.BETTING), f"bet:{user_id}": str(bet)}
+
+    def begin_evaluation(self) -> dict[str, str]:
+        """Locks the slots while the game is evaluated.
+
+        The game keeps the id of an evaluation that was taken over.
+        """
+        self._expect(GamePhase.BETTING, "Nothing to evaluate yet.")
+        self.game_id = self.game_id or str(uuid.uuid4())
+        return {
+            **self._move(GamePhase.EVALUATING),
+            "evaluating_until": str(time.time() + EVALUATION_TIMEOUT_SECONDS),
+            "game_id": self.game_id,
+        }
+
+    def abort_evaluation(self) -> dict[str, str]:
+        """Returns a game whose evaluation failed to betting."""
+        if self.phase != GamePhase.EVALUATING:
+            return {}
+        return self._move(GamePhase.BETTING)
+
+    def finish_evaluation(self) -> dict[str, str]:
+        """Clears an evaluated game, unless its evaluation was taken over."""
+        if self.phase != GamePhase.EVALUATING:
+            return {}
+        return self.reset()
+
+    def reset(self) -> dict[str, str]:
+        """Clears the slots and returns to idle."""
+        self.prices.clear()
+        self.bets.clear()
+        self.seed = None
+        self.game_id = ""
+        return self._move(GamePhase.IDLE)
+
+    def _move(self, phase: GamePhase) -> dict[str, str]:
+        self.phase = phase
+        self.version += 1
+        return {"phase": phase.value, "version": str(self.version)}
+
+    def _expect(self, phase: GamePhase, detail: str) -> None:
+        self._expect_not_evaluating()
+        if self.phase != phase:
+            raise GameStateError(detail)
+
+    def _expect_not_evaluating(self) -> None:
+        if self.phase == GamePhase.EVALUATING:
+            raise GameStateError("The game is being evaluated.")
+
+
+class GameStateStore:
+    """Game states of rooms kept in the Redis hashes ``room:{id}:game``.
+
+    The hash is the only copy of a state, so every worker serving a room
+    sees the same game. A transition is applied to a state read under WATCH
+    and written in a transaction, which is retried when another event of the
+    room changed the hash in between.
+    """
+
+    async def apply(
+        self,
+        room_id: str,
+        transition: Callable[[GameState], dict[str, str]],
+        replace: bool = False,
+    ) -> GameState:
+        """Applies a transition to the current state of a room and returns it.
+
+        Changed fields are written, or the whole snapshot when ``replace`` is
+        set. A GameStateError of the transition leaves the hash untouched.
+        """
+        key = self.key(room_id)
+        async for redis in get_redis():
+            for _ in range(MAX_TRANSITION_ATTEMPTS):
+                async with redis.pipeline(transaction=True) as pipeline:
+                    with RedisCommand("hgetall"):
+                        await pipeline.watch(key)
+                        fields = await pipeline.hgetall(key)  # type: ignore
+                    state = GameState.from_snapshot(room_id, fields)
+                    changed = transition(state)
+                    if not changed:
+                        return state
+                    pipeline.multi()
+                    if replace:
+                        pipeline.delete(key)
+                    pipeline.hset(key, mapping=changed)  # type: ignore
+                    pipeline.expire(key, settings.REDIS_ACTIONS_TTL_SECONDS)
+                    try:
+                        with RedisCommand("hset"):
+                            await pipeline.execute()
+                    except WatchError:
+                        logger.debug("Game state of room %s changed, retrying", room_id)
+                        continue
+                return state
+        raise GameStateError("The game is busy, try again.")
+
+    @staticmethod
+    def key(room_id: str) -> str:
+        """Returns the key of the snapshot of a room."""
+        return f"room:{room_id}:game"
+
+
+game_states = GameStateStore()
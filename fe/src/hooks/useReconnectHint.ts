@@ -0,0 +1,39 @@
+import { useRef } from 'react'
+
+import { RoomEventTypes } from '@/types'
+
+const MIN_BACKOFF_MS = 500
+const MAX_BACKOFF_MS = 30000
+
+// Remembers the delay a restarting server asked for, otherwise reconnects with
+// a jittered exponential backoff, so clients do not all come back at once.
+const useReconnectHint = () => {
+  const hintMs = useRef<number | null>(null)
+
+  const isReconnectFrame = (data: string) => {
+    if (!data.includes(RoomEventTypes.RECONNECT)) return false
+    try {
+      const frame = JSON.parse(data)
+      if (frame.type !== RoomEventTypes.RECONNECT) return false
+      hintMs.current = frame.after_ms
+      return true
+    } catch {
+      return false
+    }
+  }
+
+  const reconnectInterval = (attempt: number) => {
+    const hint = hintMs.current
+    hintMs.current = null
+    if (hint !== null) return hint
+    const backoff = Math.min(MIN_BACKOFF_MS * 2 ** attempt, MAX_BACKOFF_MS)
+    return backoff / 2 + Math.random() * (backoff / 2)
+  }
+
+  return {
+    isReconnectFrame,
+    reconnectOptions: { shouldReconnect: () => true, reconnectInterval },
+  }
+}
+
+export default useReconnectHint
@@ -1,27 +1,24 @@
 import { useEffect, useState } from 'react'
 
 import useUUIDContext from '@/hooks/useUUIDContext'
+import parseSnapshotData from '@/utils/parseSnapshotData'
 import useFetchRoomData from './useFetchRoomData'
 import useGameState from './useGameState'
 import useRoomEventHandler from './useRoomEventHandler'
 
 import type { RoomEventMessage } from './useRoomEventHandler'
-import { RoomEventTypes } from '@/types'
+import { RoomEventTypes, RoomSnapshot } from '@/types'
 
 const useRoom = (room_id: string) => {
   const { uuid } = useUUIDContext()
 
   const [users, setUsers] = useState<string[]>([])
+  const [snapshot, setSnapshot] = useState<RoomSnapshot | null>(null)
 
-  const {
-    actionsData,
-    actionsLoading,
-    actionsError,
-    historyData,
-    historyLoading,
-    historyError,
-    refetchHistory,
-  } = useFetchRoomData(room_id)
+  const { actionsData, historyData, refetchHistory } = useFetchRoomData(
+    room_id,
+    snapshot
+  )
 
   const {
     betSet,
@@ -44,7 +41,6 @@ const useRoom = (room_id: string) => {
   const handleResult = (message: string) => {
     resetGame()
     setResult(message)
-    refetchHistory()
   }
 
   const handleMessage = useRoomEventHandler(
@@ -63,6 +59,19 @@ const useRoom = (room_id: string) => {
   const messageHandler = (message: string) => {
     try {
       const data = JSON.parse(message)
+      // Every (re)connect starts with a snapshot replacing what was seen before.
+      if (data.type === RoomEventTypes.SNAPSHOT) {
+        resetGame()
+        setEventHistory([])
+        setUsers([])
+        setSnapshot(parseSnapshotData(data))
+        return
+      }
+      // Games are stored after the result is sent, this follows once they are.
+      if (data.type === RoomEventTypes.HISTORY) {
+        refetchHistory()
+        return
+      }
       handleMessage(data)
     } catch (error) {
       console.error('Failed to parse message:', error)
@@ -1,34 +1,26 @@
 import { useQuery } from '@tanstack/react-query'
-import { fetchActions, fetchHistory } from '@/api/api'
-import type { Action, GameHistory } from '@/types'
+import { fetchHistory } from '@/api/api'
+import type { GameHistory, RoomSnapshot } from '@/types'
 
-const useFetchRoomData = (room_id: string) => {
+// Actions and the last games arrive in the snapshot frame of the room socket,
+// the full history is loaded once the room is usable.
+const useFetchRoomData = (room_id: string, snapshot: RoomSnapshot | null) => {
   const {
-    data: actionsData,
-    isLoading: actionsLoading,
-    isError: actionsError,
-  } = useQuery<Action[]>({
-    queryKey: ['room', room_id],
-    queryFn: () => fetchActions(room_id),
-    staleTime: 5000,
-  })
-
-  const {
-    data: historyData,
+    data: fetchedHistory,
     isLoading: historyLoading,
     isError: historyError,
     refetch: refetchHistory,
   } = useQuery<GameHistory[]>({
     queryKey: ['room_history', room_id],
     queryFn: () => fetchHistory(room_id),
+    enabled: snapshot !== null,
     staleTime: 5000,
   })
 
   return {
-    actionsData,
-    actionsLoading,
-    actionsError,
-    historyData,
+    actionsData: snapshot?.actions,
+    actionsLoading: snapshot === null,
+    historyData: fetchedHistory ?? snapshot?.games,
     historyLoading,
     historyError,
     refetchHistory,
@@ -22,6 +22,13 @@ const useRoomEventHandler = (
   uuid: string | null
 ) => {
   const handleMessage = (data: RoomEventMessage, timestamp?: Date) => {
+    // Rejected events are reported only to their sender and are not history.
+    if (data.type === RoomEventTypes.ERROR) {
+      toast('Action Rejected', {
+        description: data.message,
+      })
+      return
+    }
     // This check is needed as sometimes happened that WS connection got established before the data was fetched
     // and logged new event into redis and then rest fetched events including this one.
     if (
@@ -102,6 +109,11 @@ const useRoomEventHandler = (
       case RoomEventTypes.RESULT:
         handleResult(data.message)
         break
+      case RoomEventTypes.MEMBERSHIP:
+        toast('Members Updated', {
+          description: data.message,
+        })
+        break
       default:
         console.error('Unknown message type:', data)
     }
@@ -1,6 +1,10 @@
 import { useState } from 'react'
 import useWebSocket from 'react-use-websocket'
 
+import isPing from '@/utils/isPing'
+import { RoomEventTypes } from '@/types'
+
+import useReconnectHint from './useReconnectHint'
 import useUUIDContext from './useUUIDContext'
 
 const URL = 'ws://127.0.0.1:8000/ws/room'
@@ -11,12 +15,19 @@ const useWebSocketRoom = (
 ) => {
   const { uuid } = useUUIDContext()
   const [error, setError] = useState<boolean>(false)
+  const { isReconnectFrame, reconnectOptions } = useReconnectHint()
 
   const { sendJsonMessage } = useWebSocket(`${URL}/${room_id}/${uuid}`, {
     onMessage: (event) => {
+      if (isReconnectFrame(event.data)) return
+      if (isPing(event.data)) {
+        sendJsonMessage({ type: RoomEventTypes.PONG })
+        return
+      }
       onMessageHandler(event.data)
     },
     onError: () => setError(true),
+    ...reconnectOptions,
   })
 
   return { error, sendJsonMessage }
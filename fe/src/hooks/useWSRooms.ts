@@ -1,9 +1,12 @@
 import { useState } from 'react'
+import { toast } from 'sonner'
 import useWebSocket from 'react-use-websocket'
 
+import isPing from '@/utils/isPing'
 import parseRoomData from '@/utils/parseRoomData'
 
-import { Room } from '@/types'
+import { Room, RoomEventTypes } from '@/types'
+import useReconnectHint from './useReconnectHint'
 import useUUIDContext from './useUUIDContext'
 
 const URL = 'ws://127.0.0.1:8000/ws/rooms'
@@ -13,15 +16,27 @@ const useWebSocketRooms = (
 ) => {
   const { uuid } = useUUIDContext()
   const [error, setError] = useState<boolean>(false)
+  const { isReconnectFrame, reconnectOptions } = useReconnectHint()
 
-  const _ = useWebSocket(`${URL}/${uuid}`, {
+  const { sendJsonMessage } = useWebSocket(`${URL}/${uuid}`, {
     onMessage: (event) => {
+      if (isReconnectFrame(event.data)) return
+      if (isPing(event.data)) {
+        sendJsonMessage({ type: RoomEventTypes.PONG })
+        return
+      }
       const roomUpdates = JSON.parse(event.data.replace(/'/g, '"'))
+      // Membership changes of the user arrive on the same socket as new rooms.
+      if (roomUpdates.type === RoomEventTypes.MEMBERSHIP) {
+        toast('Membership Updated', { description: roomUpdates.message })
+        return
+      }
 
       const newRoom = parseRoomData([roomUpdates])
       setData((prevData) => [...newRoom, ...prevData])
     },
     onError: () => setError(true),
+    ...reconnectOptions,
   })
 
   return error
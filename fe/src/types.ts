@@ -7,7 +7,13 @@ export enum RoomEventTypes {
   SET_BET = 'set_bet',
   EVALUATE = 'evaluate',
   RESULT = 'result',
+  MEMBERSHIP = 'membership',
   ERROR = 'error',
+  RECONNECT = 'reconnect',
+  SNAPSHOT = 'snapshot',
+  PING = 'ping',
+  PONG = 'pong',
+  HISTORY = 'history',
 }
 
 export enum Currency {
@@ -79,6 +85,31 @@ export type GameHistoryResponse = {
   prices: GamePriceHistoryResponse[]
 }
 
+export type RoomMemberResponse = {
+  user_id: string
+  is_admin: boolean
+  status: string
+  created_at: string
+}
+
+export type RoomSnapshotResponse = {
+  type: RoomEventTypes.SNAPSHOT
+  game: {
+    phase: string
+    prices: Price[]
+    bets: string[]
+  }
+  actions: ActionResponse[]
+  members: RoomMemberResponse[]
+  games: GameHistoryResponse[]
+}
+
+export type RoomSnapshot = {
+  actions: Action[]
+  members: string[]
+  games: GameHistory[]
+}
+
 export type Room = {
   id: string
   name: string
@@ -1,3 +1,5 @@
+export { default as isPing } from './isPing'
 export { default as parseActionData } from './parseActionData'
 export { default as parseHistoryData } from './parseHistoryData'
 export { default as parseRoomData } from './parseRoomData'
+export { default as parseSnapshotData } from './parseSnapshotData'
@@ -0,0 +1,13 @@
+import { RoomEventTypes } from '@/types'
+
+// Keepalive pings of the server have to be answered with a pong.
+const isPing = (data: string): boolean => {
+  if (!data.includes(RoomEventTypes.PING)) return false
+  try {
+    return JSON.parse(data).type === RoomEventTypes.PING
+  } catch {
+    return false
+  }
+}
+
+export default isPing
@@ -0,0 +1,14 @@
+import parseActionData from './parseActionData'
+import parseHistoryData from './parseHistoryData'
+
+import type { RoomSnapshot, RoomSnapshotResponse } from '@/types'
+
+const parseSnapshotData = (snapshot: RoomSnapshotResponse): RoomSnapshot => {
+  return {
+    actions: parseActionData(snapshot.actions),
+    members: snapshot.members.map((member) => member.user_id),
+    games: parseHistoryData(snapshot.games),
+  }
+}
+
+export default parseSnapshotData